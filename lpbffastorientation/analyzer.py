@@ -1,30 +1,117 @@
 # analyzer.py
 import trimesh
 import numpy as np
-from scipy.spatial.transform import Rotation as R
+from meshkernel import CompactMesh, direction_matrix
 
-def generate_orientations(n=100):
-    """Uniform sphere sampling"""
-    phi = np.random.uniform(0, 2*np.pi, n)
-    costheta = np.random.uniform(-1, 1, n)
+SAMPLING_METHODS = ("fibonacci", "sobol", "random")
+
+
+def generate_orientations(n=100, method="fibonacci", seed=0, symmetry=None):
+    """Sample n build directions on the unit sphere.
+
+    method: "fibonacci" (deterministic equal-area spiral), "sobol" (scrambled
+    low-discrepancy, seeded) or "random" (seeded uniform). Rotations about the
+    build axis never change overhang metrics, so only directions are sampled.
+    If symmetry (from symmetry_group) is given, directions equivalent under
+    the mesh's symmetries are dropped and roughly n / len(symmetry) remain.
+    """
+    if method == "fibonacci":
+        i = np.arange(n) + 0.5
+        costheta = 1 - 2 * i / n
+        phi = np.pi * (3 - np.sqrt(5)) * i
+    elif method == "sobol":
+        from scipy.stats import qmc
+        m = max(int(np.ceil(np.log2(max(n, 1)))), 0)
+        u = qmc.Sobol(d=2, scramble=True, seed=seed).random_base2(m)[:n]
+        costheta = 1 - 2 * u[:, 0]
+        phi = 2 * np.pi * u[:, 1]
+    elif method == "random":
+        rng = np.random.default_rng(seed)
+        phi = rng.uniform(0, 2*np.pi, n)
+        costheta = rng.uniform(-1, 1, n)
+    else:
+        raise ValueError(f"Unknown sampling method: {method}")
     theta = np.arccos(costheta)
     x = np.sin(theta) * np.cos(phi)
     y = np.sin(theta) * np.sin(phi)
     z = np.cos(theta)
-    return np.vstack([x, y, z]).T
+    directions = np.vstack([x, y, z]).T
+    if symmetry is not None and len(symmetry) > 1:
+        directions = directions[canonical_mask(directions, symmetry)]
+    return directions
+
+
+def symmetry_group(mesh, tol=1e-3, max_probe=2000):
+    """Orthogonal symmetries of the mesh, as 3x3 matrices acting on directions.
+
+    Candidates are the sign flips and 3/4/6/8-fold rotations about the
+    principal axes of the area-weighted face centroids. A candidate is kept
+    when every (sampled) face centroid maps onto a centroid within tol times
+    the part size. The result is closed under composition and always starts
+    with the identity.
+    """
+    from scipy.spatial import cKDTree
+
+    centroids = np.asarray(mesh.triangles_center, dtype=np.float64)
+    areas = np.asarray(mesh.area_faces, dtype=np.float64)
+    identity = np.eye(3)
+    if len(centroids) < 2 or areas.sum() <= 0:
+        return [identity]
+    center = np.average(centroids, axis=0, weights=areas)
+    local = centroids - center
+    _, axes = np.linalg.eigh((local * areas[:, None]).T @ local)
+
+    candidates = [np.diag(s) for s in
+                  [(1, 1, -1), (1, -1, 1), (-1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1), (-1, -1, -1)]]
+    for axis in range(3):
+        for k in (3, 4, 6, 8):
+            a = 2 * np.pi / k
+            c, s = np.cos(a), np.sin(a)
+            i, j = [x for x in range(3) if x != axis]
+            rot = np.eye(3)
+            rot[i, i], rot[i, j], rot[j, i], rot[j, j] = c, -s, s, c
+            candidates.append(rot)
+
+    tree = cKDTree(local)
+    size = np.ptp(local, axis=0).max()
+    probe = local[np.linspace(0, len(local) - 1, min(len(local), max_probe)).astype(int)]
+    found = [identity]
+    for op in candidates:
+        op = axes @ op @ axes.T
+        dist, _ = tree.query(probe @ op.T, distance_upper_bound=tol * size)
+        if np.all(np.isfinite(dist)):
+            found.append(op)
+
+    # Close the set under composition
+    group = found
+    while True:
+        products = [a @ b for a in group for b in found]
+        new = [p for p in products if not any(np.allclose(p, g, atol=1e-6) for g in group)]
+        if not new or len(group) > 48:
+            return group
+        group = group + new[:1]
+
+
+# Orbit representatives are the members most aligned with this fixed,
+# generic unit vector (not on any symmetry plane or axis)
+CANONICAL_REF = np.array([0.2113, 0.5774, 0.7887]) / np.linalg.norm([0.2113, 0.5774, 0.7887])
+
+
+def canonical_mask(directions, symmetry, eps=1e-9):
+    """Keep one representative per orbit of directions under the symmetry group"""
+    key = directions @ CANONICAL_REF
+    best = np.max([directions @ (op.T @ CANONICAL_REF) for op in symmetry], axis=0)
+    return key >= best - eps
+
 
 def rotate_mesh(mesh, direction):
     """Rotate mesh to align Z axis with the given direction"""
-    z_axis = np.array([0, 0, 1])
-    direction = direction / np.linalg.norm(direction)
-    rot_axis = np.cross(direction, z_axis)
-    
-    if np.linalg.norm(rot_axis) < 1e-6:
-        return mesh.copy()
-    
-    rot_angle = np.arccos(np.dot(direction, z_axis))
-    rot = R.from_rotvec(rot_axis / np.linalg.norm(rot_axis) * rot_angle)
-    rot_matrix_3x3 = rot.as_matrix()
+    rot_matrix_3x3 = direction_matrix(direction)
+
+    if isinstance(mesh, CompactMesh):
+        # Rotate into the kernel's reusable buffers instead of copying
+        mesh.rotate(rot_matrix_3x3)
+        return mesh
 
     # Convert 3x3 to 4x4 homogeneous transform
     rot_matrix_4x4 = np.eye(4)
@@ -38,7 +125,341 @@ def rotate_mesh(mesh, direction):
 def compute_support_metric(mesh):
     """Approximate support volume using lowest-facing triangles"""
     z_threshold = 0.5  # overhang threshold
-    normals = mesh.face_normals
+    normals = mesh.rotated_normals if isinstance(mesh, CompactMesh) else mesh.face_normals
     overhang_faces = normals[:, 2] < z_threshold
     overhang_area = mesh.area_faces[overhang_faces].sum()
     return overhang_area
+
+
+# Structured result of the batch scorer, one record per candidate direction
+SCORE_DTYPE = np.dtype([
+    ("direction", np.float64, (3,)),
+    ("overhang_area", np.float64),
+    ("support_volume", np.float64),
+    ("contact_area", np.float64),
+    ("build_height", np.float64),
+    ("downskin_area", np.float64),
+])
+
+# Objectives minimized by the multi-objective API, in SCORE_DTYPE fields
+OBJECTIVES = ("support_volume", "build_height", "downskin_area", "contact_area")
+
+
+def face_features(mesh, decimals=6):
+    """Collapse the mesh into per-normal moment features for batch scoring.
+
+    For every face with area a, unit normal n and centroid c the scorer only
+    needs a, a*n and a*outer(n, c). These are linear in the face, so faces
+    sharing a normal (flat CAD regions) are summed into a single row.
+    Returns (normals, features, extremes) where features is (13, K) float32.
+    """
+    # The lowest point along any direction is a convex hull vertex
+    try:
+        extremes = np.asarray(mesh.convex_hull.vertices, dtype=np.float64)
+    except Exception:
+        extremes = np.asarray(mesh.vertices, dtype=np.float64)
+    # Center coordinates so float32 moments keep their precision
+    center = extremes.mean(axis=0) if len(extremes) else np.zeros(3)
+    normals = np.asarray(mesh.face_normals, dtype=np.float64)
+    centroids = np.asarray(mesh.triangles_center, dtype=np.float64) - center
+    areas = np.asarray(mesh.area_faces, dtype=np.float64)
+
+    rows = np.empty((len(areas), 13))
+    rows[:, 0] = areas
+    rows[:, 1:4] = areas[:, None] * normals
+    rows[:, 4:13] = (rows[:, 1:4, None] * centroids[:, None, :]).reshape(-1, 9)
+
+    # Pack the quantized normal into one int64 key (21 bits per component)
+    scale = min(10.0 ** decimals, float((1 << 20) - 1))
+    q = np.rint(normals * scale).astype(np.int64) + (1 << 20)
+    keys = (q[:, 0] << 42) | (q[:, 1] << 21) | q[:, 2]
+    _, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    features = np.add.reduceat(rows[order], starts, axis=0) if len(order) else rows
+    unique_normals = features[:, 1:4] / np.maximum(features[:, :1], 1e-30)
+    unique_normals /= np.maximum(np.linalg.norm(unique_normals, axis=1, keepdims=True), 1e-30)
+    return (unique_normals.astype(np.float32),
+            np.ascontiguousarray(features.T, dtype=np.float32),
+            (extremes - center).astype(np.float32))
+
+
+def score_orientations(mesh, directions, overhang_angle=45.0, features=None,
+                       face_chunk=4096, direction_chunk=4096):
+    """Score many build directions at once without copying the mesh.
+
+    Each direction is the axis that becomes +Z when the part is placed on the
+    plate (same convention as rotate_mesh). A downward face needs support when
+    its inclination from the plate is below overhang_angle, i.e. when its
+    build-space normal Z is below -cos(overhang_angle).
+
+    Returns a SCORE_DTYPE array with, per direction:
+      overhang_area  - total area of faces needing support
+      contact_area   - overhang area projected onto the plate
+      support_volume - projected area times height above the lowest point
+      build_height   - part height along the direction (layer count)
+      downskin_area  - total area of downward-facing faces
+    All fields come from the same masked pass over the faces.
+    Pass features=face_features(mesh) to reuse the preprocessing.
+    """
+    directions = np.atleast_2d(np.asarray(directions, dtype=np.float64))
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    normals, moments, extremes = features if features is not None else face_features(mesh)
+
+    result = np.zeros(len(directions), dtype=SCORE_DTYPE)
+    result["direction"] = directions
+    if len(normals) == 0:
+        return result
+
+    threshold = np.float32(-np.cos(np.radians(overhang_angle)))
+    dirs_t = np.ascontiguousarray(directions.T, dtype=np.float32)
+    # Masked moment sums, accumulated tile by tile so temporaries stay in cache
+    sums = np.zeros((13, len(directions)))
+    downskin = np.zeros(len(directions))
+    for d0 in range(0, len(directions), direction_chunk):
+        d = dirs_t[:, d0:d0 + direction_chunk]
+        acc = sums[:, d0:d0 + d.shape[1]]
+        acc_down = downskin[d0:d0 + d.shape[1]]
+        for f0 in range(0, len(normals), face_chunk):
+            nz = normals[f0:f0 + face_chunk] @ d
+            overhang = nz < threshold
+            acc += moments[:, f0:f0 + face_chunk] @ overhang.astype(np.float32)
+            # Reuse nz as the 0/1 downward mask for the downskin sum
+            np.signbit(nz, out=nz)
+            acc_down += moments[0, f0:f0 + face_chunk] @ nz
+
+    d = directions.T
+    contact = -np.einsum("jn,jn->n", sums[1:4], d)
+    # sum(a * (n.d) * (c.d)) is the quadratic form d^T (sum a n c^T) d
+    moment = np.einsum("jkn,jn,kn->n", sums[4:13].reshape(3, 3, -1), d, d)
+    heights = extremes @ dirs_t
+    z_min = heights.min(axis=0)
+    result["overhang_area"] = sums[0]
+    result["build_height"] = heights.max(axis=0) - z_min
+    result["downskin_area"] = downskin
+    result["contact_area"] = contact
+    result["support_volume"] = -moment - z_min * contact
+    return result
+
+
+def pareto_front(scores, objectives=OBJECTIVES):
+    """Indices of the non-dominated scores (all objectives minimized).
+
+    Sorted by the first objective, so a candidate can only be dominated by
+    one earlier in the order; the front is built in one pass against the
+    candidates kept so far.
+    """
+    values = np.column_stack([np.asarray(scores[name], dtype=np.float64) for name in objectives])
+    order = np.lexsort(values.T[::-1])
+    front = []
+    for i in order:
+        kept = values[front]
+        if len(front) and np.any(np.all(kept <= values[i], axis=1)):
+            continue
+        front.append(i)
+    return np.array(front, dtype=np.int64)
+
+
+def rank_weighted(scores, weights, objectives=OBJECTIVES):
+    """Indices ordered by a weighted sum of min-max normalized objectives.
+
+    weights maps objective names to weights; missing objectives weigh 0.
+    """
+    total = np.zeros(len(scores))
+    for name in objectives:
+        weight = weights.get(name, 0.0)
+        if not weight:
+            continue
+        values = np.asarray(scores[name], dtype=np.float64)
+        span = np.ptp(values) if len(values) else 0.0
+        total += weight * ((values - values.min()) / span if span > 0 else 0.0)
+    return np.argsort(total, kind="stable")
+
+
+def _merge_directions(directions, min_angle, limit=None):
+    """Drop directions within min_angle (radians) of an earlier one, keeping order"""
+    limit = len(directions) if limit is None else min(limit, len(directions))
+    kept = np.empty((limit, 3))
+    count = 0
+    max_cos = np.cos(min_angle)
+    for d in directions:
+        if count == limit:
+            break
+        if not count or np.max(kept[:count] @ d) < max_cos:
+            kept[count] = d
+            count += 1
+    return kept[:count]
+
+
+def pose_candidates(mesh, features=None, max_candidates=64, min_angle=np.radians(2.0)):
+    """Structural build directions worth scoring before any sphere sampling.
+
+    In priority order: stable resting poses (convex hull facets, coplanar
+    hull faces merged, whose plane contains the projected center of mass),
+    large flat faces of the part turned onto the plate, and the remaining
+    hull facets by area. Each is the direction that puts the face's outward
+    normal straight down. Directions within min_angle of an earlier one
+    are dropped.
+    """
+    hull = mesh.convex_hull
+    vertices = np.asarray(hull.vertices, dtype=np.float64)
+    tri = vertices[np.asarray(hull.faces)]
+    normals = np.asarray(hull.face_normals, dtype=np.float64)
+    areas = np.asarray(hull.area_faces, dtype=np.float64)
+
+    # Merge coplanar hull faces into facets by their quantized normal
+    q = np.rint(normals * 1e4).astype(np.int64)
+    _, facet = np.unique(q, axis=0, return_inverse=True)
+    facet = facet.ravel()
+    facet_area = np.bincount(facet, weights=areas)
+    facet_normal = np.column_stack([np.bincount(facet, weights=areas * normals[:, k]) for k in range(3)])
+    facet_normal /= np.maximum(np.linalg.norm(facet_normal, axis=1, keepdims=True), 1e-30)
+
+    try:
+        center = np.asarray(mesh.center_mass, dtype=np.float64) if mesh.volume > 0 else None
+    except Exception:
+        center = None
+    if center is None:
+        centroids = np.asarray(mesh.triangles_center, dtype=np.float64)
+        center = np.average(centroids, axis=0, weights=np.asarray(mesh.area_faces, dtype=np.float64))
+
+    # A facet is a stable pose when the center of mass projects inside it
+    p = center - np.einsum("ij,ij->i", center - tri[:, 0], normals)[:, None] * normals
+    e0, e1, e2 = tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0], p - tri[:, 0]
+    d00, d01, d11 = (e0 * e0).sum(1), (e0 * e1).sum(1), (e1 * e1).sum(1)
+    d20, d21 = (e2 * e0).sum(1), (e2 * e1).sum(1)
+    denom = np.maximum(d00 * d11 - d01 * d01, 1e-30)
+    v = (d11 * d20 - d01 * d21) / denom
+    w = (d00 * d21 - d01 * d20) / denom
+    inside = (v >= -1e-9) & (w >= -1e-9) & (v + w <= 1 + 1e-9)
+    stable = np.bincount(facet[inside], minlength=len(facet_area)) > 0
+
+    by_area = np.argsort(-facet_area, kind="stable")
+    stable_poses = -facet_normal[by_area[stable[by_area]]]
+    other_facets = -facet_normal[by_area[~stable[by_area]]]
+
+    # Large flat regions of the part itself (they need not lie on the hull)
+    if features is None:
+        features = face_features(mesh)
+    flat_normals, moments = features[0], features[1]
+    flat = np.argsort(-moments[0], kind="stable")[:max_candidates]
+    flat = flat[moments[0][flat] >= 0.01 * moments[0].sum()]
+    flat_faces = -np.asarray(flat_normals[flat], dtype=np.float64)
+
+    return _merge_directions(np.vstack([stable_poses, flat_faces, other_facets]), min_angle, max_candidates)
+
+
+def shortlist(mesh, overhang_angle=45.0, keep=16, global_samples=16, bound_samples=256,
+              features=None, symmetry=None):
+    """Directions worth an expensive support metric (e.g. SupportRaycaster.score).
+
+    The pose_candidates, together with bound_samples sphere directions, are
+    ranked by the cheap moment-based support volume of score_orientations
+    and the keep best are returned, followed by a sparse Fibonacci sample
+    of global_samples directions so that minima the cheap bound misjudges
+    are still covered. Symmetric duplicates are dropped.
+    """
+    if features is None:
+        features = face_features(mesh)
+    candidates = pose_candidates(mesh, features)
+    if symmetry is not None and len(symmetry) > 1:
+        # Replace each candidate by its orbit's representative (see canonical_mask)
+        images = np.stack([candidates @ np.asarray(op).T for op in symmetry])
+        candidates = images[np.argmax(images @ CANONICAL_REF, axis=0), np.arange(len(candidates))]
+        candidates = _merge_directions(candidates, np.radians(2.0))
+    candidates = np.vstack([candidates, generate_orientations(bound_samples, symmetry=symmetry)])
+    bound = score_orientations(None, candidates, overhang_angle, features=features)["support_volume"]
+    best = candidates[np.argsort(bound, kind="stable")[:keep]]
+    sample = generate_orientations(global_samples, symmetry=symmetry)
+    return _merge_directions(np.vstack([best, sample]), np.radians(2.0))
+
+
+def coarsen_features(features, rows):
+    """Merge face_features rows into about rows bins of nearby normals.
+
+    Moments are sums, so every bin's moments are exact and the area-weighted
+    normal distribution is kept at the bin resolution; only the bin's
+    overhang classification (by its mean normal) is approximate. Returns
+    (features, cos_radius) where cos_radius[k] is the cosine of the largest
+    angle between bin k's mean normal and its members (see score_bounds).
+    """
+    normals, moments, extremes = features
+    # About 4 pi s^2 lattice points lie within rounding of a sphere of radius s
+    scale = np.sqrt(rows / (4 * np.pi))
+    q = np.rint(normals * scale).astype(np.int64) + (1 << 20)
+    keys = (q[:, 0] << 42) | (q[:, 1] << 21) | q[:, 2]
+    _, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    merged = np.add.reduceat(moments.T[order].astype(np.float64), starts, axis=0)
+    mean = merged[:, 1:4] / np.maximum(merged[:, :1], 1e-30)
+    mean /= np.maximum(np.linalg.norm(mean, axis=1, keepdims=True), 1e-30)
+    alignment = np.einsum("ij,ij->i", normals[order], mean[inverse[order]])
+    cos_radius = np.minimum.reduceat(alignment, starts)
+    level = (mean.astype(np.float32), np.ascontiguousarray(merged.T, dtype=np.float32), extremes)
+    return level, np.clip(cos_radius, -1.0, 1.0).astype(np.float32)
+
+
+def feature_levels(features, min_rows=20000, factor=8):
+    """coarsen_features levels of about min_rows, min_rows * factor, ... rows.
+
+    Only levels at least factor times smaller than features itself are
+    built, so CAD parts with few distinct normals get none; scanned parts
+    with a normal per face get a ~min_rows proxy. Coarsest first.
+    """
+    levels = []
+    rows = min_rows
+    while rows * factor <= len(features[0]):
+        levels.append(coarsen_features(features, rows))
+        rows *= factor
+    return levels
+
+
+def pack_levels(levels):
+    """feature_levels as a flat tuple of arrays (for DiskCache.cached_arrays)"""
+    return tuple(array for level, cos_radius in levels for array in (*level, cos_radius))
+
+
+def unpack_levels(flat):
+    return [(tuple(flat[i:i + 3]), flat[i + 3]) for i in range(0, len(flat), 4)]
+
+
+def score_bounds(level, cos_radius, directions, overhang_angle=45.0, direction_chunk=4096):
+    """Per-direction bounds on the error of scoring coarsened features.
+
+    Returns a SCORE_DTYPE array whose fields bound |coarse - exact| for
+    score_orientations on level. A bin can only be misclassified when its
+    normal cone (cos_radius) straddles the overhang (or, for downskin, the
+    horizontal) threshold; such a bin changes areas by at most its area
+    and the support volume by at most its area times the build height.
+    """
+    directions = np.atleast_2d(np.asarray(directions, dtype=np.float64))
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    normals, moments, extremes = level
+    result = np.zeros(len(directions), dtype=SCORE_DTYPE)
+    result["direction"] = directions
+    radius = np.arccos(np.asarray(cos_radius, dtype=np.float64))
+
+    def straddles(threshold_angle):
+        # nz lies within cos(angle -/+ radius) of the mean normal's nz
+        low = np.cos(np.minimum(threshold_angle + radius, np.pi)).astype(np.float32)
+        high = np.cos(np.maximum(threshold_angle - radius, 0.0)).astype(np.float32)
+        return low[:, None], high[:, None]
+
+    overhang_low, overhang_high = straddles(np.pi - np.radians(overhang_angle))
+    down_low, down_high = straddles(np.pi / 2)
+    dirs_t = np.ascontiguousarray(directions.T, dtype=np.float32)
+    for d0 in range(0, len(directions), direction_chunk):
+        d = dirs_t[:, d0:d0 + direction_chunk]
+        nz = normals @ d
+        uncertain = (nz > overhang_low) & (nz < overhang_high)
+        area = moments[0] @ uncertain.astype(np.float32)
+        down = moments[0] @ ((nz > down_low) & (nz < down_high)).astype(np.float32)
+        heights = extremes @ d
+        rows = slice(d0, d0 + d.shape[1])
+        result["overhang_area"][rows] = area
+        result["contact_area"][rows] = area
+        result["support_volume"][rows] = area * (heights.max(axis=0) - heights.min(axis=0))
+        result["downskin_area"][rows] = down
+    return result
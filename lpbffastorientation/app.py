@@ -1,12 +1,42 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import numpy as np
-import trimesh
-import uuid
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from meshstore import MeshStore
+from analyzer import face_features, feature_levels, pack_levels, shortlist, symmetry_group, unpack_levels
+from overhang import OverhangIndex, encode_faces
+from meshkernel import direction_matrix, euler_matrix
+from optimizer import OrientationSearch, get_scheduler, optimization_params, run_search
+from batch import ResultCache, as_completed, result_key
+from raster import RASTER_MIN_FACES, RASTER_RESCORE_TOP, HeightMapScorer
+from supports import SUPPORT_DTYPE, SupportRaycaster, column_volume, write_supports
+import diskcache
+import ingest
+import materials
+import meshcodec
+import metrics
 
 app = FastAPI()
 
+# Uploads larger than this are rejected while streaming
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 512 << 20))
+# Whole /optimize_batch request bodies (every part of a plate) are capped here
+MAX_BATCH_BYTES = int(os.environ.get("MAX_BATCH_BYTES", 4 << 30))
+# Room for multipart boundaries and headers around a MAX_UPLOAD_BYTES file
+MULTIPART_OVERHEAD = 64 << 10
+
+# Oversized bodies are refused before the form parser receives them
+# (added first, so the 413 still passes through CORS)
+app.add_middleware(ingest.BodyLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+                   limits={"/optimize_batch": MAX_BATCH_BYTES})
+
 # Allow CORS for local frontend development
 app.add_middleware(
     CORSMiddleware,
@@ -14,56 +44,588 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Range", "Content-Encoding", "X-Vertex-Count", "X-Face-Count",
+                    "Server-Timing", "X-Profile-Id", "X-Column-Count", "X-Support-Volume",
+                    "X-Support-Mass"],
+)
+# Request latency and opt-in ?profile=1 traces (see metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Parsed meshes keyed by STL content hash, bounded by a byte budget
+meshes = MeshStore(
+    max_bytes=int(os.environ.get("MESH_STORE_MAX_BYTES", 1 << 30)),
+    ttl=float(os.environ["MESH_STORE_TTL"]) if os.environ.get("MESH_STORE_TTL") else None,
 )
 
-# In-memory mesh storage (for demo)
-meshes = {}
+# Geometry, derived arrays and results survive restarts here (DISK_CACHE=0 disables)
+disk = diskcache.open_default()
+
+
+# STL parsing and preprocessing run here, never on the event loop. Threads
+# (not processes) so the parsed mesh lands in the store without pickling;
+# the heavy numpy/qhull work releases the GIL.
+parse_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("INGEST_WORKERS", 2)),
+                                thread_name_prefix="stl-ingest")
+
+# Finished optimizations keyed by (mesh hash, parameters), so re-running a plate is instant
+results = ResultCache(max_entries=int(os.environ.get("RESULT_CACHE_ENTRIES", 4096)), disk=disk)
+
+# Parts of one /optimize_batch request optimized concurrently; every batch and
+# websocket gets its own lane of the shared optimizer pool
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4))
+
+metrics.Gauge("thinkadd_mesh_store_bytes", "Bytes held by the mesh store", function=lambda: meshes.total_bytes)
+metrics.Gauge("thinkadd_mesh_store_entries", "Meshes held by the mesh store", function=lambda: len(meshes))
+metrics.Counter("thinkadd_mesh_store_hits", "Mesh store hits", function=lambda: meshes.hits)
+metrics.Counter("thinkadd_mesh_store_misses", "Mesh store misses", function=lambda: meshes.misses)
+metrics.Counter("thinkadd_mesh_store_evictions", "Mesh store evictions", function=lambda: meshes.evictions)
+metrics.Gauge("thinkadd_result_cache_entries", "Cached optimization results", function=lambda: len(results))
+metrics.Counter("thinkadd_result_cache_hits", "Optimization result cache hits", function=lambda: results.hits)
+metrics.Counter("thinkadd_result_cache_misses", "Optimization result cache misses",
+                function=lambda: results.misses)
+metrics.Gauge("thinkadd_optimizer_queued_tasks", "Scoring chunks waiting for a pool worker",
+              function=lambda: get_scheduler().queued)
+
+
+def parse_upload(upload):
+    """Parse a spooled upload into the store (runs in parse_pool)"""
+    mesh = ingest.load_geometry(disk, upload.mesh_id)
+    if mesh is not None:
+        return meshes.put(upload.mesh_id, mesh)
+    with metrics.span("parse"):
+        started = time.perf_counter()
+        entry = meshes.put(upload.mesh_id, ingest.parse_stl_file(upload.path))
+        seconds = time.perf_counter() - started
+    if seconds > 0:
+        metrics.PARSE_TRIANGLES_PER_SECOND.observe(len(entry.mesh.faces) / seconds)
+    if disk is not None:
+        parse_pool.submit(disk.save_arrays, entry.mesh_id, "geometry", ingest.geometry_arrays(entry.mesh))
+    return entry
+
+
+async def lookup(mesh_id):
+    """Stored entry for mesh_id, loading previously seen meshes from the disk cache"""
+    entry = meshes.get(mesh_id)
+    if entry is None and disk is not None:
+        loop = asyncio.get_running_loop()
+        mesh = await loop.run_in_executor(parse_pool, ingest.load_geometry, disk, mesh_id)
+        if mesh is not None:
+            entry = meshes.put(mesh_id, mesh)
+    return entry
+
+
+def persisted(entry, name, factory):
+    """factory(entry.mesh) (arrays), kept in the disk cache when there is one"""
+    if disk is None:
+        return factory(entry.mesh)
+    return disk.cached_arrays(entry.mesh_id, name, lambda: factory(entry.mesh))
+
+
+# Derived data kept on disk (the raycaster keeps its own samples, see support_raycaster)
+PERSISTED = {"face_features", "symmetry", "feature_levels"}
+
+
+def derived(entry, name, factory):
+    """factory(entry.mesh), computed once per mesh in a worker thread"""
+    def build():
+        with metrics.span(name):
+            if name in PERSISTED:
+                return persisted(entry, name, factory)
+            return factory(entry.mesh)
+    return run_in_threadpool(entry.cached, name, build)
+
+
+async def coarse_levels(entry, features):
+    """analyzer.feature_levels of a mesh with many distinct normals (else empty), stored flat"""
+    flat = await derived(entry, "feature_levels", lambda mesh: pack_levels(feature_levels(features)))
+    return unpack_levels(flat)
+
+
+def support_raycaster(entry):
+    """SupportRaycaster of a stored mesh (awaitable)"""
+    # Ray samples come from the disk cache; trimesh rebuilds the BVH lazily
+    return derived(entry, "raycaster", lambda mesh: SupportRaycaster.cached(mesh, disk, entry.mesh_id))
+
+
+async def support_rescorer(entry):
+    """(rescore, rescore_top) for run_search: ray casts, or height maps above RASTER_MIN_FACES faces"""
+    if len(entry.mesh.faces) > RASTER_MIN_FACES:
+        scorer = await derived(entry, "height_maps", HeightMapScorer)
+        return scorer.rescore, RASTER_RESCORE_TOP
+    raycaster = await support_raycaster(entry)
+    return raycaster.score, 8
+
+
+async def optimize_entry(entry, params, executor, report=None):
+    """Full orientation search of one stored mesh; returns the final progress"""
+    metrics.ACTIVE_OPTIMIZATIONS.inc()
+    try:
+        features = await derived(entry, "face_features", face_features)
+        symmetry = await derived(entry, "symmetry", symmetry_group)
+        levels = None
+        if params["lod"]:
+            levels = await coarse_levels(entry, features)
+        rescore, rescore_top = await support_rescorer(entry)
+        candidates = None
+        if params["prune"]:
+            # Hull poses and flat faces ranked by the cheap bound, plus a sparse sphere sample
+            candidates = await run_in_threadpool(shortlist, entry.mesh, params["overhang_angle"],
+                                                 features=features, symmetry=symmetry)
+        search = OrientationSearch(objective=params["objective"], coarse_samples=params["samples"],
+                                   method=params["sampling"], symmetry=symmetry, candidates=candidates)
+        return await run_search(search, features, params["overhang_angle"], executor=executor,
+                                report=report, rescore=rescore, rescore_top=rescore_top,
+                                weights=params["weights"], levels=levels)
+    finally:
+        metrics.ACTIVE_OPTIMIZATIONS.dec()
+
+
+_materials = None
+
+
+def material_table():
+    """materials.MaterialTable, parsed (or loaded from the disk cache) on first use"""
+    global _materials
+    if _materials is None:
+        _materials = materials.load(disk=disk)
+    return _materials
+
+
+def mesh_buffers(entry):
+    """float32 vertices and uint32 faces, converted once per mesh"""
+    vertices = entry.cached("vertices_f32", lambda: np.ascontiguousarray(entry.mesh.vertices, dtype=np.float32))
+    faces = entry.cached("faces_u32", lambda: np.ascontiguousarray(entry.mesh.faces, dtype=np.uint32))
+    return vertices, faces
+
 
 @app.post("/upload_stl")
-async def upload_stl(file: UploadFile = File(...)):
+async def upload_stl(file: UploadFile = File(...), format: str = "binary"):
+    """Parse an STL; geometry is fetched from /mesh/{mesh_id} unless format=json"""
     try:
-        mesh_data = await file.read()
-        import io
-        mesh = trimesh.load_mesh(io.BytesIO(mesh_data), file_type='stl')
-        mesh_id = str(uuid.uuid4())
-        meshes[mesh_id] = mesh
+        try:
+            with metrics.span("upload_spool"):
+                upload = await ingest.spool_upload(file, MAX_UPLOAD_BYTES)
+        except ingest.UploadTooLarge as e:
+            return JSONResponse(status_code=413, content={"error": str(e)})
+        metrics.UPLOAD_BYTES.observe(upload.size)
+        try:
+            entry = meshes.get(upload.mesh_id)
+            cached = entry is not None
+            if entry is None:
+                loop = asyncio.get_running_loop()
+                entry = await loop.run_in_executor(parse_pool, metrics.traced(parse_upload, upload))
+        finally:
+            upload.close()
+        mesh = entry.mesh
+        if format == "json":
+            with metrics.span("serialize"):
+                return {
+                    "mesh_id": entry.mesh_id,
+                    "cached": cached,
+                    "vertices": mesh.vertices.tolist(),
+                    "faces": mesh.faces.tolist()
+                }
         return {
-            "mesh_id": mesh_id,
-            "vertices": mesh.vertices.tolist(),
-            "faces": mesh.faces.tolist()
+            "mesh_id": entry.mesh_id,
+            "cached": cached,
+            "vertex_count": len(mesh.vertices),
+            "face_count": len(mesh.faces),
+            "mesh_url": f"/mesh/{entry.mesh_id}"
         }
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/mesh/{mesh_id}")
+async def get_mesh(mesh_id: str, request: Request, quantize: bool = False):
+    """Binary mesh (see meshcodec) with optional compression and byte ranges"""
+    entry = await lookup(mesh_id)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"error": "Mesh not found"})
+    vertices, faces = mesh_buffers(entry)
+    encoding = meshcodec.choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        # Stream straight out of the numpy buffers
+        parts = meshcodec.encode_mesh(vertices, faces, quantize=quantize)
+    else:
+        key = f"mesh_{encoding}_{int(quantize)}"
+        def compress():
+            with metrics.span("compress"):
+                return meshcodec.compress(meshcodec.encode_mesh(vertices, faces, quantize=quantize), encoding)
+        body = await run_in_threadpool(entry.cached, key, compress)
+        parts = [body]
+
+    size = sum(len(p) for p in parts)
+    try:
+        byte_range = meshcodec.parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return JSONResponse(status_code=416, content={"error": "Range not satisfiable"},
+                            headers={"Content-Range": f"bytes */{size}"})
+    start, stop = byte_range or (0, size)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(stop - start),
+        "ETag": f'"{mesh_id}-{int(quantize)}-{encoding or "identity"}"',
+        "X-Vertex-Count": str(len(vertices)),
+        "X-Face-Count": str(len(faces)),
+        "Vary": "Accept-Encoding",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    return StreamingResponse(meshcodec.iter_chunks(parts, start, stop),
+                             status_code=206 if byte_range else 200,
+                             media_type=meshcodec.CONTENT_TYPE, headers=headers)
+
+def parse_rotation(rx, ry, rz, direction):
+    """Build rotation (points @ rotation) from "x,y,z" or GUI Euler angles; ValueError if invalid"""
+    if not direction:
+        return euler_matrix(rx, ry, rz)
+    build = np.array([float(v) for v in direction.split(",")])
+    if build.shape != (3,) or not np.linalg.norm(build) > 0:
+        raise ValueError
+    return direction_matrix(build).T
+
+
 @app.post("/analyze_overhang")
-async def analyze_overhang(mesh_id: str, overhang_angle: float):
-    mesh = meshes.get(mesh_id)
-    if mesh is None:
+async def analyze_overhang(mesh_id: str, overhang_angle: float = 45.0, rx: float = 0.0, ry: float = 0.0,
+                           rz: float = 0.0, direction: str = "", encoding: str = "indices",
+                           anchor_spacing: float = 2.0):
+    """Overhang faces, connected overhang regions and support anchor points.
+
+    The orientation is either GUI Euler angles (rx, ry, rz in degrees) or a
+    build direction "x,y,z". Overhang faces are returned as ascending face
+    indices or, with encoding=bitset, as a base64 little-endian bitset;
+    region labels follow the same ascending face order.
+    """
+    entry = await lookup(mesh_id)
+    if entry is None:
         return JSONResponse(status_code=404, content={"error": "Mesh not found"})
-    # Placeholder: Compute overhangs and supports
-    return {"supports": []}
+    if encoding not in ("indices", "bitset"):
+        return JSONResponse(status_code=400, content={"error": f"Unknown encoding: {encoding}"})
+    try:
+        rotation = parse_rotation(rx, ry, rz, direction)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "direction must be \"x,y,z\""})
+    if anchor_spacing <= 0:
+        return JSONResponse(status_code=400, content={"error": "anchor_spacing must be positive"})
+
+    def analyze():
+        with metrics.span("overhang"):
+            index = entry.cached("overhang_index", lambda: OverhangIndex(
+                entry.mesh, adjacency=persisted(entry, "face_adjacency", lambda mesh: mesh.face_adjacency)))
+            faces, labels = index.classify(rotation[:, 2], overhang_angle)
+            points, point_regions = index.anchors(rotation, faces, labels, anchor_spacing)
+            region_count = int(labels.max()) + 1 if len(labels) else 0
+            region_area = np.bincount(labels, weights=index.areas[faces], minlength=region_count)
+            return {
+                "mesh_id": mesh_id,
+                "overhang_angle": overhang_angle,
+                "direction": rotation[:, 2].tolist(),
+                "face_count": len(index.faces),
+                "overhang": {
+                    "encoding": encoding,
+                    "faces": encode_faces(faces, len(index.faces), encoding),
+                    "count": len(faces),
+                    "area": float(region_area.sum()),
+                },
+                "regions": {
+                    "count": region_count,
+                    "labels": labels.tolist(),
+                    "face_count": np.bincount(labels, minlength=region_count).tolist(),
+                    "area": region_area.tolist(),
+                },
+                "anchors": {
+                    "points": points.tolist(),
+                    "region": point_regions.tolist(),
+                },
+            }
+
+    return await run_in_threadpool(analyze)
+
+
+# Support export formats and their media types
+SUPPORT_FORMATS = {"stl": "model/stl", "3mf": "model/3mf"}
+
+
+@app.post("/supports")
+async def generate_supports(mesh_id: str, overhang_angle: float = 45.0, rx: float = 0.0, ry: float = 0.0,
+                            rz: float = 0.0, direction: str = "", spacing: float = 1.0, radius: float = 0.0,
+                            format: str = "binary", material: str = ""):
+    """Support columns on an XY grid of the given spacing (see SupportRaycaster.columns).
+
+    format=binary returns the packed little-endian supports.SUPPORT_DTYPE
+    records (x, y, z_bottom, z_top, radius as float32) with X-Column-Count
+    and X-Support-Volume headers; json returns the same as lists; stl and
+    3mf return the columns as a printable mesh. Coordinates are build
+    coordinates with the plate at z=0; radius 0 means half the spacing.
+    With a material (see /materials) the support mass in grams is added
+    (X-Support-Mass, "mass").
+    """
+    entry = await lookup(mesh_id)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"error": "Mesh not found"})
+    if format not in ("binary", "json", *SUPPORT_FORMATS):
+        return JSONResponse(status_code=400, content={"error": f"Unknown format: {format}"})
+    try:
+        rotation = parse_rotation(rx, ry, rz, direction)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "direction must be \"x,y,z\""})
+    if spacing <= 0 or radius < 0:
+        return JSONResponse(status_code=400, content={"error": "spacing must be positive, radius non-negative"})
+    density = None
+    if material:
+        density = (await run_in_threadpool(material_table)).density(material)
+        if density is None:
+            return JSONResponse(status_code=400, content={"error": f"No density for material: {material}"})
+    raycaster = await support_raycaster(entry)
+
+    def build():
+        with metrics.span("supports"):
+            columns = raycaster.columns(rotation, overhang_angle, spacing, radius or None)
+        if format not in SUPPORT_FORMATS:
+            return columns, None
+        fd, path = tempfile.mkstemp(suffix="." + format)
+        os.close(fd)
+        try:
+            with metrics.span("serialize"):
+                write_supports(path, columns)
+            with open(path, "rb") as f:
+                return columns, f.read()
+        finally:
+            os.unlink(path)
+
+    columns, body = await run_in_threadpool(build)
+    volume = column_volume(columns)
+    headers = {"X-Column-Count": str(len(columns)), "X-Support-Volume": repr(volume)}
+    # mm³ times g/cm³ is mg
+    mass = volume * density / 1000.0 if density is not None else None
+    if mass is not None:
+        headers["X-Support-Mass"] = repr(mass)
+    if format == "json":
+        return {
+            "mesh_id": mesh_id,
+            "direction": rotation[:, 2].tolist(),
+            "count": len(columns),
+            "volume": volume,
+            "mass": mass,
+            "columns": {name: columns[name].tolist() for name in SUPPORT_DTYPE.names},
+        }
+    if format == "binary":
+        return Response(content=columns.tobytes(), media_type="application/octet-stream", headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="supports_{mesh_id[:12]}.{format}"'
+    return Response(content=body, media_type=SUPPORT_FORMATS[format], headers=headers)
+
+# /materials parameters that are not range filters
+MATERIAL_QUERY_PARAMS = {"alloy_type", "commercial", "limit"}
+
+
+@app.get("/materials")
+async def list_materials(request: Request, alloy_type: str = None, commercial: bool = None, limit: int = 0):
+    """Materials matching every range filter, e.g. ?density=2,5&yield_strength=300,&Ni=10,
+
+    Filters name a property (see materials.PROPERTIES) or an element symbol
+    (wt%) and give "low,high" with either end empty for open; a material
+    matches when its range overlaps the filter.
+    """
+    ranges = {}
+    for column, value in request.query_params.items():
+        if column in MATERIAL_QUERY_PARAMS:
+            continue
+        if column not in materials.PROPERTIES and column not in materials.ELEMENTS:
+            return JSONResponse(status_code=400, content={"error": f"Unknown property or element: {column}"})
+        try:
+            low, high = (float(v) if v.strip() else None for v in value.split(","))
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": f"{column} must be \"low,high\""})
+        ranges[column] = (low, high)
+    table = await run_in_threadpool(material_table)
+    rows = table.query(ranges, alloy_type, commercial)
+    if limit > 0:
+        rows = rows[:limit]
+    return {
+        "count": len(rows),
+        "units": {column: unit for column, (_, unit) in materials.PROPERTIES.items()},
+        "materials": [table.record(row) for row in rows],
+    }
+
+
+@app.get("/materials/{name}")
+async def get_material(name: str):
+    table = await run_in_threadpool(material_table)
+    row = table.row(name)
+    if row is None:
+        return JSONResponse(status_code=404, content={"error": "Material not found"})
+    return table.record(row)
+
+
+@app.get("/materials/{name}/similar")
+async def similar_materials(name: str, k: int = 5, by: str = "composition"):
+    """The k nearest materials by nominal composition or standardized properties"""
+    table = await run_in_threadpool(material_table)
+    try:
+        similar = table.similar(name, k, by)
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": "Material not found"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {
+        "name": table.names[table.row(name)],
+        "by": by,
+        "similar": [{"name": table.names[row], "distance": distance} for row, distance in similar],
+    }
+
+
+@app.get("/mesh_store")
+async def mesh_store_stats():
+    return meshes.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profile/{report_id}")
+async def profile_report(report_id: str):
+    """Stage timings and cProfile breakdown of a request made with ?profile=1"""
+    report = metrics.get_report(report_id)
+    if report is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return report
+
 
 @app.websocket("/ws/optimize_orientation/{mesh_id}")
-async def optimize_orientation(websocket: WebSocket, mesh_id: str):
+async def optimize_orientation(websocket: WebSocket, mesh_id: str, overhang_angle: float = 45.0,
+                               objective: str = "support_volume", samples: int = 1024,
+                               sampling: str = "fibonacci", weights: str = "", prune: bool = False,
+                               lod: bool = True, profile: bool = False):
     await websocket.accept()
-    mesh = meshes.get(mesh_id)
-    if mesh is None:
+    entry = await lookup(mesh_id)
+    if entry is None:
         await websocket.send_json({"error": "Mesh not found"})
         await websocket.close()
         return
-    # Placeholder: Sample orientations, compute support volumes, send updates
     try:
-        for i in range(100):
-            orientation = np.random.uniform(-180, 180, size=3).tolist()
-            support_volume = np.random.uniform(0, 1000)  # Dummy value
-            await websocket.send_json({
-                "orientation": orientation,
-                "support_volume": support_volume,
-                "iteration": i + 1
-            })
+        params = optimization_params(overhang_angle, objective, samples, sampling, weights, prune, lod)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
         await websocket.close()
+        return
+
+    async def report(progress):
+        if progress.get("done") and trace is not None:
+            progress = {**progress, "profile": trace.report()}
+        with metrics.span("serialize"):
+            text = json.dumps(progress)
+        with metrics.span("ws_send"):
+            await websocket.send_text(text)
+
+    async def run():
+        try:
+            await optimize_entry(entry, params, get_scheduler().lane(), report=report)
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            # A failed search still answers the client
+            await websocket.send_json({"error": str(e)})
+        await websocket.close()
+
+    async def disconnected():
+        # Anything else the client sends is ignored
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # The task copies the current context, so its spans land in this trace
+    trace = token = None
+    if profile and metrics.PROFILING_ENABLED:
+        trace, token = metrics.start_trace(profile=True)
+    # Only a disconnect cancels the search
+    task = asyncio.create_task(run())
+    if token is not None:
+        metrics.end_trace(token)
+    receiver = asyncio.create_task(disconnected())
+    try:
+        done, _ = await asyncio.wait({task, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            task.result()
     except WebSocketDisconnect:
         pass
+    finally:
+        task.cancel()
+        receiver.cancel()
+
+
+@app.post("/optimize_batch")
+async def optimize_batch(files: list[UploadFile] = File(default=[]), mesh_ids: str = "",
+                         overhang_angle: float = 45.0, objective: str = "support_volume",
+                         samples: int = 1024, sampling: str = "fibonacci", weights: str = "",
+                         prune: bool = False, lod: bool = True):
+    """Optimize a build plate: uploaded STLs and/or comma-separated stored mesh_ids.
+
+    Streams NDJSON, one line per part in completion order ({"index", "name",
+    "mesh_id", "cached", "result"} or {..., "error"}), then a summary line
+    with "done": true. Parts already optimized with the same parameters
+    come straight from the result cache.
+    """
+    try:
+        params = optimization_params(overhang_angle, objective, samples, sampling, weights, prune, lod)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    # (name, mesh_id, spooled upload or None)
+    parts = [(mesh_id, mesh_id, None) for mesh_id in filter(None, (m.strip() for m in mesh_ids.split(",")))]
+    try:
+        for file in files:
+            upload = await ingest.spool_upload(file, MAX_UPLOAD_BYTES)
+            metrics.UPLOAD_BYTES.observe(upload.size)
+            parts.append((file.filename, upload.mesh_id, upload))
+    except ingest.UploadTooLarge as e:
+        for _, _, upload in parts:
+            if upload is not None:
+                upload.close()
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    if not parts:
+        return JSONResponse(status_code=400, content={"error": "No parts given"})
+
+    lane = get_scheduler().lane()
+    running = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def compute(mesh_id, upload):
+        # Owns the upload: the computation keeps running after a client disconnects
+        try:
+            entry = await lookup(mesh_id)
+            if entry is None:
+                if upload is None:
+                    raise LookupError("Mesh not found")
+                loop = asyncio.get_running_loop()
+                entry = await loop.run_in_executor(parse_pool, metrics.traced(parse_upload, upload))
+        finally:
+            if upload is not None:
+                upload.close()
+        async with running:
+            return await optimize_entry(entry, params, lane)
+
+    async def run_part(index, name, mesh_id, upload):
+        record = {"index": index, "name": name, "mesh_id": mesh_id}
+        try:
+            # Cached or shared results never hand the upload to a computation
+            result, cached = await results.get_or_compute(
+                result_key(mesh_id, params), lambda: compute(mesh_id, upload),
+                release=upload.close if upload is not None else None)
+            record.update(cached=cached, result=result)
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+
+    async def lines():
+        started = time.perf_counter()
+        cached = failed = 0
+        async for record in as_completed(run_part(i, *part) for i, part in enumerate(parts)):
+            cached += bool(record.get("cached"))
+            failed += "error" in record
+            yield json.dumps(record) + "\n"
+        yield json.dumps({"done": True, "parts": len(parts), "cached": cached, "failed": failed,
+                          "elapsed": time.perf_counter() - started}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
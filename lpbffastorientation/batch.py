@@ -0,0 +1,128 @@
+# batch.py
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+
+
+def result_key(mesh_id, params):
+    """Cache key of one optimization: (mesh content hash, canonical parameters)"""
+    return mesh_id, json.dumps(params, sort_keys=True)
+
+
+class ResultCache:
+    """LRU of finished optimization results keyed by result_key.
+
+    Requests for a key that is still being computed share that computation,
+    so a plate listing the same part several times optimizes it once. The
+    computation runs as its own task: a client that disconnects does not
+    cancel it, and its result is cached for the next run of the plate.
+    With a DiskCache, results are also stored next to the mesh's geometry
+    and survive restarts.
+    """
+
+    def __init__(self, max_entries=4096, disk=None):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._results)
+
+    @staticmethod
+    def _disk_name(key):
+        return "result-" + hashlib.blake2b(key[1].encode(), digest_size=8).hexdigest()
+
+    def get(self, key):
+        """Cached result or None; blocks on the disk cache (see get_or_compute)"""
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        elif self.disk is not None:
+            result = self._load(key)
+            if result is not None:
+                self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """Cache a result; blocks on the disk cache (see get_or_compute)"""
+        self._remember(key, result)
+        if self.disk is not None:
+            self._save(key, result)
+
+    def _load(self, key):
+        return self.disk.load_json(key[0], self._disk_name(key))
+
+    def _save(self, key, result):
+        self.disk.save_json(key[0], self._disk_name(key), result)
+
+    def _remember(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def get_or_compute(self, key, compute, release=None):
+        """(result, cached); compute() runs at most once per key at a time.
+
+        Results not in memory are looked up on disk, and stored there, in a
+        worker thread, so the event loop never waits on the disk. The lookup
+        and the computation run as one task that outlives a cancelled
+        caller. Exactly one of compute() (on a miss) and release() (if
+        given, when the result is cached or already being computed) is
+        called, so whatever compute would own, e.g. an upload, is released
+        once even when the caller is gone.
+        """
+        result = self._results.get(key)
+        task = self._inflight.get(key)
+        if result is not None or task is not None:
+            self.hits += 1
+            if release is not None:
+                release()
+            if result is not None:
+                self._results.move_to_end(key)
+                return result, True
+            result, _ = await asyncio.shield(task)
+            return result, True
+        task = self._inflight[key] = asyncio.ensure_future(self._load_or_compute(key, compute, release))
+        # Nobody may be left to await a failure
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _load_or_compute(self, key, compute, release):
+        loop = asyncio.get_running_loop()
+        computation = None
+        try:
+            result = await loop.run_in_executor(None, self._load, key) if self.disk is not None else None
+            if result is None:
+                self.misses += 1
+                computation = compute()
+                result = await computation
+        finally:
+            del self._inflight[key]
+            if computation is None and release is not None:
+                release()
+        self._remember(key, result)
+        if computation is None:
+            self.hits += 1
+            return result, True
+        if self.disk is not None:
+            await loop.run_in_executor(None, self._save, key, result)
+        return result, False
+
+async def as_completed(coroutines):
+    """Async iterator over coroutine results in completion order.
+
+    Closing the iterator early (e.g. the client of a streamed response went
+    away) cancels whatever is still running.
+    """
+    tasks = [asyncio.ensure_future(c) for c in coroutines]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
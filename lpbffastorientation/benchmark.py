@@ -0,0 +1,226 @@
+# benchmark.py
+"""Benchmarks for the orientation and support pipeline on synthetic meshes.
+
+    python benchmark.py --sizes 1000,10000,100000 --candidates 100,1000 \
+        --out results.json --baseline previous.json
+
+Every result records wall time (best of --repeat runs) and peak traced
+memory of one extra run. Scaling exponents are fitted per benchmark over
+triangle and candidate counts. With --baseline, results slower (or larger)
+than the ratios in benchmark_thresholds.json fail the run (exit code 1).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+import synthetic
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_thresholds.json")
+
+
+def measure(fn, repeat):
+    """(best seconds, peak traced bytes) of fn()"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    # Peak memory from a separate run so tracing does not skew the timings
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def mesh_cases(vertices, faces, path, candidates, websocket):
+    """(name, candidates, fn) benchmarks for one synthetic mesh"""
+    import trimesh
+
+    from analyzer import compute_support_metric, face_features, rotate_mesh, score_orientations
+    from analyzer import generate_orientations
+    from ingest import parse_stl_file
+    from meshkernel import CompactMesh
+    from supports import SupportRaycaster
+
+    kernel = CompactMesh(vertices, faces)
+    mesh = trimesh.Trimesh(vertices, faces, process=False)
+    direction = np.array([0.3, -0.4, 0.866])
+    yield "stl_parse", 0, lambda: parse_stl_file(path)
+    yield "rotate_mesh", 0, lambda: rotate_mesh(kernel, direction)
+    yield "compute_support_metric", 0, lambda: compute_support_metric(kernel)
+
+    features = face_features(mesh)
+    # The GUI's calculate_support_volume: one ray per face sample and direction
+    raycaster = SupportRaycaster(mesh, max_points=len(faces))
+    for n in candidates:
+        directions = generate_orientations(n)
+        yield "score_orientations", n, lambda: score_orientations(None, directions, features=features)
+        yield "calculate_support_volume", n, lambda: raycaster.score(directions)
+        if websocket:
+            yield "websocket_optimize", n, lambda: optimize_over_websocket(path, n)
+
+
+def optimize_over_websocket(path, samples):
+    """Upload and run /ws/optimize_orientation in-process; returns the final message"""
+    from fastapi.testclient import TestClient
+
+    import app
+
+    client = TestClient(app.app)
+    with open(path, "rb") as f:
+        mesh_id = client.post("/upload_stl", files={"file": ("part.stl", f)}).json()["mesh_id"]
+    with client.websocket_connect(f"/ws/optimize_orientation/{mesh_id}?samples={samples}") as ws:
+        while True:
+            message = ws.receive_json()
+            if message.get("done") or "error" in message:
+                return message
+
+
+def fit_exponent(x, y):
+    """Slope of log(y) against log(x): 1.0 means linear scaling"""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    keep = (x > 0) & (y > 0)
+    if np.count_nonzero(keep) < 2 or np.ptp(x[keep]) == 0:
+        return None
+    return float(np.polyfit(np.log(x[keep]), np.log(y[keep]), 1)[0])
+
+
+def scaling(results):
+    """Time and memory exponents vs triangles (per candidate count) and vs candidates"""
+    curves = []
+    for axis, fixed in (("triangles", "candidates"), ("candidates", "triangles")):
+        groups = {}
+        for r in results:
+            groups.setdefault((r["benchmark"], r["kind"], r[fixed]), []).append(r)
+        for (benchmark, kind, value), group in sorted(groups.items()):
+            if len({r[axis] for r in group}) < 2:
+                continue
+            x = [r[axis] for r in group]
+            curves.append({
+                "benchmark": benchmark,
+                "kind": kind,
+                "versus": axis,
+                fixed: value,
+                "time_exponent": fit_exponent(x, [r["seconds"] for r in group]),
+                "memory_exponent": fit_exponent(x, [r["peak_bytes"] for r in group]),
+            })
+    return curves
+
+
+def regressions(results, baseline, thresholds):
+    """Results slower or larger than the baseline by more than the allowed ratio"""
+    key = lambda r: (r["benchmark"], r["kind"], r["triangles"], r["candidates"])
+    previous = {key(r): r for r in baseline.get("results", [])}
+    default = thresholds.get("default", {})
+    found = []
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        limits = {**default, **thresholds.get(r["benchmark"], {})}
+        # Very short timings are mostly noise
+        if r["seconds"] >= limits.get("min_seconds", 0.0):
+            ratio = r["seconds"] / max(old["seconds"], 1e-12)
+            if ratio > limits.get("max_time_ratio", float("inf")):
+                found.append({**r, "metric": "seconds", "baseline": old["seconds"], "ratio": ratio})
+        ratio = r["peak_bytes"] / max(old["peak_bytes"], 1)
+        if ratio > limits.get("max_memory_ratio", float("inf")):
+            found.append({**r, "metric": "peak_bytes", "baseline": old["peak_bytes"], "ratio": ratio})
+    return found
+
+
+def run(kinds, sizes, candidates, repeat, websocket_max, log=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in kinds:
+            for size in sizes:
+                vertices, faces = synthetic.generate(kind, size)
+                path = os.path.join(tmp, f"{kind}_{size}.stl")
+                synthetic.write_stl(path, vertices, faces)
+                for name, n, fn in mesh_cases(vertices, faces, path, candidates,
+                                              websocket=len(faces) <= websocket_max):
+                    seconds, peak = measure(fn, repeat)
+                    work = len(faces) * max(n, 1)
+                    result = {
+                        "benchmark": name,
+                        "kind": kind,
+                        "triangles": int(len(faces)),
+                        "candidates": n,
+                        "seconds": seconds,
+                        "peak_bytes": int(peak),
+                        "triangles_per_second": work / seconds if seconds > 0 else None,
+                        "candidates_per_second": n / seconds if n and seconds > 0 else None,
+                    }
+                    results.append(result)
+                    if log is not None:
+                        log(f"{name:26s} {kind:8s} {len(faces):>9d} tri {n:>6d} cand "
+                            f"{seconds * 1e3:10.2f} ms {peak / 2 ** 20:9.1f} MiB")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Orientation/support pipeline benchmarks")
+    parser.add_argument("--kinds", default="tube,lattice,bracket")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="target triangle counts, up to 5000000")
+    parser.add_argument("--candidates", default="100,1000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--websocket-max", type=int, default=100000,
+                        help="largest mesh (triangles) for the websocket benchmark")
+    parser.add_argument("--out", help="write results JSON here (default stdout)")
+    parser.add_argument("--baseline", help="previous results JSON to check for regressions")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    args = parser.parse_args(argv)
+
+    kinds = [k for k in args.kinds.split(",") if k]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    candidates = [int(c) for c in args.candidates.split(",") if c]
+    log = lambda line: print(line, file=sys.stderr)
+    results = run(kinds, sizes, candidates, args.repeat, args.websocket_max, log)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "scaling": scaling(results),
+    }
+    failed = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        failed = regressions(results, baseline, thresholds)
+        report["regressions"] = failed
+        for r in failed:
+            log(f"REGRESSION {r['benchmark']} {r['kind']} {r['triangles']} tri {r['candidates']} cand: "
+                f"{r['metric']} {r['ratio']:.2f}x baseline")
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
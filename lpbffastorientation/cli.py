@@ -0,0 +1,238 @@
+# cli.py
+"""Headless batch orientation optimization.
+
+    python cli.py parts/ "plates/*.stl" --out results.jsonl --jobs 8
+
+Every STL is optimized in a process pool (one part per worker, --jobs
+defaults to the CPU count) and one JSON line is written per part as soon as
+it finishes: {"path", "mesh_id", "cached", "result", "timings"}, where
+result is the API's final progress record, or {"path", "error"}. With
+--resume, parts that already have a result line in --out are skipped and
+new lines are appended, so an interrupted run continues where it stopped
+(failed parts are retried).
+
+This process only uses the standard library; numpy, trimesh and scipy are
+imported by the workers. Parts share the on-disk cache with the API, so
+parsed geometry, derived arrays and results are reused across runs.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_disk = None
+
+
+def log(line):
+    print(line, file=sys.stderr, flush=True)
+
+
+def find_stl_files(inputs):
+    """Absolute STL paths from files, directories (searched recursively) and glob patterns"""
+    paths = []
+    for pattern in inputs:
+        matches = glob.glob(pattern, recursive=True) or [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                paths.extend(path for path in glob.glob(os.path.join(match, "**", "*"), recursive=True)
+                             if path.lower().endswith(".stl") and os.path.isfile(path))
+            else:
+                paths.append(match)
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def finished_paths(out):
+    """Paths with a result line in an earlier (possibly truncated) output file"""
+    done = set()
+    try:
+        with open(out) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "result" in record:
+                    done.add(record["path"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def open_output(out, resume):
+    if out is None:
+        return sys.stdout
+    if not resume:
+        return open(out, "w")
+    f = open(out, "a+")
+    # A run killed mid-write leaves a partial last line; start on a fresh one
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != "\n":
+            f.write("\n")
+    return f
+
+
+def init_worker(threads, cache):
+    """Pool initializer: cap BLAS threads before numpy loads, open the disk cache"""
+    global _disk
+    for name in THREAD_VARIABLES:
+        os.environ.setdefault(name, str(threads))
+    if cache:
+        import diskcache
+        _disk = diskcache.open_default()
+
+
+def check_params(overhang_angle, objective, samples, sampling, weights, prune, lod):
+    """optimizer.optimization_params, run in a worker to keep this process light"""
+    from optimizer import optimization_params
+    return optimization_params(overhang_angle, objective, samples, sampling, weights, prune=prune, lod=lod)
+
+
+def optimize_file(path, params):
+    """Pool task: optimize one STL file; returns its output record"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import diskcache
+    import ingest
+    import metrics
+    from analyzer import face_features, feature_levels, pack_levels, shortlist, symmetry_group, unpack_levels
+    from batch import ResultCache, result_key
+    from optimizer import OrientationSearch, run_search
+    from raster import RASTER_MIN_FACES, RASTER_RESCORE_TOP, HeightMapScorer
+    from supports import SupportRaycaster
+
+    disk = _disk
+    started = time.perf_counter()
+    trace, token = metrics.start_trace()
+    try:
+        with metrics.span("hash"):
+            mesh_id = disk.file_key(path) if disk is not None else diskcache.file_hash(path)
+        results = ResultCache(max_entries=1, disk=disk)
+        key = result_key(mesh_id, params)
+        result = results.get(key)
+        cached = result is not None
+        if not cached:
+            with metrics.span("parse"):
+                mesh = ingest.load_geometry(disk, mesh_id) if disk is not None else None
+                if mesh is None:
+                    mesh = ingest.parse_stl_file(path)
+                    if disk is not None:
+                        disk.save_arrays(mesh_id, "geometry", ingest.geometry_arrays(mesh))
+
+            def derived(name, factory):
+                # Same names as the API, so either can reuse the other's arrays
+                with metrics.span(name):
+                    if disk is None:
+                        return factory()
+                    return disk.cached_arrays(mesh_id, name, factory)
+
+            features = derived("face_features", lambda: face_features(mesh))
+            symmetry = derived("symmetry", lambda: symmetry_group(mesh))
+            levels = None
+            if params["lod"]:
+                levels = unpack_levels(derived("feature_levels", lambda: pack_levels(feature_levels(features))))
+            # Same support rescoring as the API (see app.support_rescorer)
+            if len(mesh.faces) > RASTER_MIN_FACES:
+                with metrics.span("height_maps"):
+                    rescore, rescore_top = HeightMapScorer(mesh).rescore, RASTER_RESCORE_TOP
+            else:
+                with metrics.span("raycaster"):
+                    rescore, rescore_top = SupportRaycaster.cached(mesh, disk, mesh_id).score, 8
+            candidates = None
+            if params["prune"]:
+                with metrics.span("shortlist"):
+                    candidates = shortlist(mesh, params["overhang_angle"], features=features, symmetry=symmetry)
+            search = OrientationSearch(objective=params["objective"], coarse_samples=params["samples"],
+                                       method=params["sampling"], symmetry=symmetry, candidates=candidates)
+            # Parallelism comes from the process pool; score in one thread per worker
+            with ThreadPoolExecutor(1) as executor, metrics.span("search"):
+                result = asyncio.run(run_search(search, features, params["overhang_angle"], executor=executor,
+                                                rescore=rescore, rescore_top=rescore_top,
+                                                weights=params["weights"], levels=levels))
+            results.put(key, result)
+    finally:
+        metrics.end_trace(token)
+    timings = {}
+    for stage, seconds in trace.spans:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
+    timings["total"] = round(time.perf_counter() - started, 4)
+    return {"path": path, "mesh_id": mesh_id, "cached": cached, "result": result, "timings": timings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Optimize the build orientation of STL files")
+    parser.add_argument("inputs", nargs="+", help="STL files, directories or glob patterns")
+    parser.add_argument("--out", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip parts that already have a result in --out and append to it")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--overhang-angle", type=float, default=45.0)
+    parser.add_argument("--objective", default="support_volume")
+    parser.add_argument("--samples", type=int, default=1024)
+    parser.add_argument("--sampling", default="fibonacci")
+    parser.add_argument("--weights", default="", help="e.g. support_volume=1,build_height=0.5")
+    parser.add_argument("--prune", action="store_true", help="search a shortlist of candidate poses")
+    parser.add_argument("--no-lod", action="store_true", help="score every face of large meshes")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk cache")
+    args = parser.parse_args(argv)
+    if args.resume and args.out is None:
+        parser.error("--resume requires --out")
+    if args.jobs < 1:
+        parser.error("--jobs must be positive")
+
+    paths = find_stl_files(args.inputs)
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        parser.error("no such file: " + ", ".join(missing))
+    if args.resume:
+        done = finished_paths(args.out)
+        paths = [path for path in paths if path not in done]
+        log(f"resuming: {len(done)} parts done, {len(paths)} left")
+    if not paths:
+        return 0
+
+    workers = min(args.jobs, len(paths))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_worker, initargs=(threads, not args.no_cache))
+    out = open_output(args.out, args.resume)
+    failed = 0
+    started = time.perf_counter()
+    try:
+        try:
+            params = pool.submit(check_params, args.overhang_angle, args.objective, args.samples, args.sampling,
+                                 args.weights, args.prune, not args.no_lod).result()
+        except ValueError as e:
+            parser.error(str(e))
+        futures = {pool.submit(optimize_file, path, params): path for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"path": path, "error": f"{type(e).__name__}: {e}"}
+                failed += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            status = record.get("error") or f"{record['timings']['total']:.2f} s"
+            log(f"[{done}/{len(paths)}] {path}: {status}")
+    except KeyboardInterrupt:
+        log("interrupted; rerun with --resume to continue")
+        return 130
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+    log(f"{len(paths) - failed} parts optimized, {failed} failed in {time.perf_counter() - started:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
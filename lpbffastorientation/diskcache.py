@@ -0,0 +1,233 @@
+# diskcache.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from meshstore import content_hasher
+
+# Bump whenever a stored layout or an algorithm producing cached data
+# changes; entries written by other versions are deleted on open
+CACHE_VERSION = 1
+
+
+def default_root():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.environ.get("DISK_CACHE_DIR") or os.path.join(base, "lpbffastorientation")
+
+
+def open_default():
+    """DiskCache configured from the environment, or None when disabled or unusable"""
+    if os.environ.get("DISK_CACHE", "1") == "0":
+        return None
+    try:
+        return DiskCache(max_bytes=int(os.environ.get("DISK_CACHE_MAX_BYTES", 4 << 30)))
+    except OSError:
+        return None
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """content_hash of a file, read in chunks"""
+    hasher = content_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _file_size(path):
+    """Size of a file, 0 when it does not exist"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _tree_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+class DiskCache:
+    """Size-bounded on-disk cache of per-mesh arrays and JSON results.
+
+    Everything is keyed by the STL content hash (the API's mesh_id):
+    root/v{version}/{key[:2]}/{key}/{name}/{array}.npy and {name}.json.
+    Arrays load memory-mapped, so a warm open costs a few page faults
+    instead of a parse. Writes go to a temp path and are renamed into place,
+    so the API and the GUI can share one cache without seeing partial
+    entries. Once the total size exceeds max_bytes, the least recently used
+    meshes (and paths/ index files, see file_key) are deleted.
+
+    The tree is walked once on open; after that an in-memory LRU of entry
+    sizes is kept, so saves and evictions never rescan it. Entries another
+    process adds are counted when this one first uses them.
+    """
+
+    def __init__(self, root=None, max_bytes=4 << 30, version=CACHE_VERSION):
+        base = root or default_root()
+        self.root = os.path.join(base, f"v{version}")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "paths"), exist_ok=True)
+        for name in os.listdir(base):
+            if re.fullmatch(r"v\d+", name) and name != f"v{version}":
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+        # Entry (path relative to root) -> bytes, least recently used first
+        self._lru = OrderedDict((entry, size) for _, entry, size in sorted(self._entries()))
+        self.total_bytes = sum(self._lru.values())
+
+    def _entries(self):
+        """(last access, entry, bytes) of every cached mesh and path index file"""
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_path) or (len(shard) != 2 and shard != "paths"):
+                continue
+            for name in os.listdir(shard_path):
+                path = os.path.join(shard_path, name)
+                if name.startswith(".tmp-"):
+                    continue
+                try:
+                    size = _tree_size(path) if os.path.isdir(path) else os.path.getsize(path)
+                    yield os.stat(path).st_mtime, os.path.join(shard, name), size
+                except OSError:
+                    pass
+
+    def _path(self, key, *parts):
+        return os.path.join(self.root, key[:2], key, *parts)
+
+    def _touch(self, entry):
+        """Mark entry (see _entries) as just used, on disk and in the LRU"""
+        path = os.path.join(self.root, entry)
+        try:
+            os.utime(path)
+        except OSError:
+            return
+        with self._lock:
+            if entry in self._lru:
+                self._lru.move_to_end(entry)
+                return
+        # Written by another process since this one opened the cache
+        self._added(entry, _tree_size(path) if os.path.isdir(path) else os.path.getsize(path))
+
+    def _added(self, entry, nbytes):
+        """Count nbytes more for entry (the net change when a file was replaced), then evict"""
+        victims = []
+        with self._lock:
+            self._lru[entry] = self._lru.get(entry, 0) + nbytes
+            self._lru.move_to_end(entry)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and len(self._lru) > 1:
+                oldest, size = self._lru.popitem(last=False)
+                victims.append(oldest)
+                self.total_bytes -= size
+        # Delete after releasing the lock, so other threads never wait on an rmtree
+        for victim in victims:
+            path = os.path.join(self.root, victim)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def load_arrays(self, key, name):
+        """{array name: read-only memmap} stored under name, or None"""
+        path = self._path(key, name)
+        try:
+            arrays = {f[:-4]: np.load(os.path.join(path, f), mmap_mode="r")
+                      for f in os.listdir(path) if f.endswith(".npy")}
+        except (OSError, ValueError):
+            return None
+        self._touch(os.path.join(key[:2], key))
+        return arrays
+
+    def save_arrays(self, key, name, arrays):
+        target = self._path(key, name)
+        tmp = None
+        try:
+            os.makedirs(self._path(key), exist_ok=True)
+            tmp = tempfile.mkdtemp(dir=self._path(key), prefix=".tmp-")
+            for array_name, array in arrays.items():
+                np.save(os.path.join(tmp, array_name + ".npy"), np.ascontiguousarray(array))
+            size = _tree_size(tmp)
+            os.rename(tmp, target)
+        except OSError:
+            # Another process stored it first (or the disk is full)
+            if tmp is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._added(os.path.join(key[:2], key), size)
+
+    def load_json(self, key, name):
+        try:
+            with open(self._path(key, name + ".json")) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(os.path.join(key[:2], key))
+        return value
+
+    def save_json(self, key, name, value):
+        tmp = None
+        try:
+            os.makedirs(self._path(key), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._path(key), prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp)
+            # A result saved again replaces the old file, whose size no longer counts
+            target = self._path(key, name + ".json")
+            replaced = _file_size(target)
+            os.replace(tmp, target)
+        except OSError:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+            return
+        self._added(os.path.join(key[:2], key), size - replaced)
+
+    def cached_arrays(self, key, name, factory):
+        """factory() (an array or a tuple of arrays), from disk when stored"""
+        arrays = self.load_arrays(key, name)
+        if arrays is not None:
+            if "value" in arrays:
+                return arrays["value"]
+            return tuple(arrays[str(i)] for i in range(len(arrays)))
+        value = factory()
+        if isinstance(value, np.ndarray):
+            self.save_arrays(key, name, {"value": value})
+        else:
+            self.save_arrays(key, name, {str(i): v for i, v in enumerate(value)})
+        return value
+
+    def file_key(self, path):
+        """Content hash of a file; rehashed only when its path, size or mtime change"""
+        stat = os.stat(path)
+        fingerprint = f"{os.path.realpath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()
+        entry = os.path.join("paths", hashlib.blake2b(fingerprint, digest_size=16).hexdigest())
+        index = os.path.join(self.root, entry)
+        try:
+            with open(index) as f:
+                key = f.read()
+            self._touch(entry)
+            return key
+        except OSError:
+            pass
+        key = file_hash(path)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index), prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                f.write(key)
+            # Another process may have written the same index meanwhile
+            replaced = _file_size(index)
+            os.replace(tmp, index)
+        except OSError:
+            return key
+        self._added(entry, len(key) - replaced)
+        return key
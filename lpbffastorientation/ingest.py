@@ -0,0 +1,240 @@
+# ingest.py
+import asyncio
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import trimesh
+
+from meshkernel import merge_triangles
+from meshstore import content_hasher
+
+# One binary STL triangle record: normal, three vertices, attribute byte count
+STL_RECORD = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+STL_HEADER_SIZE = 84
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SpooledUpload:
+    """An upload written to a temp file, with its size and content hash"""
+
+    def __init__(self, path, size, mesh_id):
+        self.path = path
+        self.size = size
+        self.mesh_id = mesh_id
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(upload, max_bytes, chunk_size=1 << 20):
+    """Copy an UploadFile to disk in chunks, hashing as it goes.
+
+    Never holds more than one chunk in memory and stops as soon as the
+    upload exceeds max_bytes (raises UploadTooLarge). Hashing and writing
+    run in the default executor, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    hasher = content_hasher()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".stl")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            def store(chunk):
+                hasher.update(chunk)
+                out.write(chunk)
+
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                await loop.run_in_executor(None, store, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledUpload(path, size, hasher.hexdigest())
+
+
+class BodyLimitMiddleware:
+    """ASGI middleware rejecting request bodies over a byte limit with 413.
+
+    The form parser receives and spools a whole multipart body before an
+    endpoint runs, so spool_upload alone would only reject an oversized
+    upload after receiving it. This checks Content-Length before anything
+    is read and, for bodies without one, stops receiving at the limit.
+    limits maps paths to their own limit (e.g. multi-file batches).
+    """
+
+    def __init__(self, app, max_bytes, limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limits = limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        max_bytes = self.limits.get(scope["path"], self.max_bytes)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > max_bytes:
+            return await self.reject(send, max_bytes)
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise UploadTooLarge(f"Request body exceeds {max_bytes} bytes")
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            # The endpoint's own error for the aborted body is replaced by a 413
+            if exceeded and not started:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self.reject(send, max_bytes)
+
+    @staticmethod
+    async def reject(send, max_bytes):
+        body = json.dumps({"error": f"Request body exceeds {max_bytes} bytes"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def read_binary_stl(path):
+    """Triangles (F, 3, 3) of a binary STL via a memory map, or None if ASCII"""
+    size = os.path.getsize(path)
+    if size < STL_HEADER_SIZE:
+        return None
+    with open(path, "rb") as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    # ASCII files ("solid ...") will not match the record count exactly
+    if size != STL_HEADER_SIZE + count * STL_RECORD.itemsize:
+        return None
+    if count == 0:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    records = np.memmap(path, dtype=STL_RECORD, mode="r", offset=STL_HEADER_SIZE, shape=(count,))
+    return records["vertices"]
+
+
+def write_stl(path, vertices, faces):
+    """Write a binary STL with face normals"""
+    triangles = np.asarray(vertices, dtype=np.float32)[faces]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-30)
+    records = np.zeros(len(triangles), dtype=STL_RECORD)
+    records["normal"] = normals
+    records["vertices"] = triangles
+    with open(path, "wb") as f:
+        f.write(b"lpbffastorientation".ljust(STL_HEADER_SIZE - 4, b" "))
+        f.write(np.uint32(len(records)).tobytes())
+        f.write(records.tobytes())
+
+
+THREEMF_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+THREEMF_RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0"
+ Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+
+
+def write_3mf(path, vertices, faces):
+    """Write a single-object 3MF package (millimetres)"""
+    model = io.StringIO()
+    model.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<model unit="millimeter" xml:lang="en-US" '
+                'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n'
+                '<resources><object id="1" type="model"><mesh><vertices>\n')
+    np.savetxt(model, np.asarray(vertices, dtype=np.float64), fmt='<vertex x="%.9g" y="%.9g" z="%.9g"/>')
+    model.write("</vertices><triangles>\n")
+    np.savetxt(model, np.asarray(faces, dtype=np.int64), fmt='<triangle v1="%d" v2="%d" v3="%d"/>')
+    model.write('</triangles></mesh></object></resources>\n'
+                '<build><item objectid="1"/></build></model>\n')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", THREEMF_CONTENT_TYPES)
+        package.writestr("_rels/.rels", THREEMF_RELS)
+        package.writestr("3D/3dmodel.model", model.getvalue())
+
+
+# Per-face data stored with the geometry so a cached mesh needs no recomputation
+GEOMETRY_CACHED = ("face_normals", "area_faces", "triangles_center")
+
+
+def geometry_arrays(mesh):
+    """Arrays describing a parsed mesh, for DiskCache.save_arrays"""
+    arrays = {"vertices": mesh.vertices, "faces": mesh.faces}
+    arrays.update((name, getattr(mesh, name)) for name in GEOMETRY_CACHED)
+    try:
+        arrays["hull_vertices"] = mesh.convex_hull.vertices
+        arrays["hull_faces"] = mesh.convex_hull.faces
+    except Exception:
+        pass
+    return {name: np.asarray(array) for name, array in arrays.items()}
+
+
+def mesh_from_geometry(arrays):
+    """Trimesh over (memory-mapped) geometry_arrays, with the per-face data pre-cached"""
+    mesh = trimesh.Trimesh(vertices=arrays["vertices"], faces=arrays["faces"], process=False)
+    for name in GEOMETRY_CACHED:
+        mesh._cache[name] = arrays[name]
+    if "hull_vertices" in arrays:
+        mesh._cache["convex_hull"] = trimesh.Trimesh(vertices=arrays["hull_vertices"],
+                                                     faces=arrays["hull_faces"], process=False)
+    return mesh
+
+
+def load_geometry(disk, key):
+    """Mesh stored in a DiskCache (or None) under a content hash, or None"""
+    arrays = disk.load_arrays(key, "geometry") if disk is not None else None
+    return mesh_from_geometry(arrays) if arrays is not None else None
+
+
+def parse_stl_file(path):
+    """Load an STL from disk, using the memory-mapped fast path when binary"""
+    triangles = read_binary_stl(path)
+    if triangles is None:
+        return trimesh.load_mesh(path, file_type="stl")
+    vertices, faces = merge_triangles(triangles)
+    # Vertices are already merged, so skip trimesh's processing
+    return trimesh.Trimesh(vertices=vertices.astype(np.float64),
+                           faces=faces.astype(np.int64), process=False)
@@ -9,22 +9,90 @@ import PyQt5.QtWidgets as qtw
 import PyQt5.QtCore as qtc
 import PyQt5.QtGui as qtg
 from stl import mesh
+from meshkernel import CompactMesh, euler_matrix, direction_euler
+from analyzer import face_features, pareto_front, score_orientations, shortlist, symmetry_group
+from supports import SUPPORT_DTYPE, SupportRaycaster, column_mesh, column_volume, write_supports
+from ingest import geometry_arrays, load_geometry
+import diskcache
+# OpenGL görüntüleyici PyOpenGL ister; yoksa matplotlib ile çizilir
+try:
+    from viewer import MeshViewer
+except ImportError:
+    MeshViewer = None
+import trimesh
 import math
+import os
 import threading
-import time
+
+# Arayüz güncellemeleri bu aralıkla (ms) toplu yapılır, yaklaşık 15 FPS
+FRAME_INTERVAL_MS = 66
+# Bir iş havuzu görevinde puanlanan yön sayısı
+OPTIMIZATION_CHUNK = 16
+
+
+class JobSignals(qtc.QObject):
+    done = qtc.pyqtSignal(object)
+    failed = qtc.pyqtSignal(str)
+
+
+class Job(qtc.QRunnable):
+    """İş havuzunda çalışan görev; sonuç ana thread'e sinyal ile döner.
+
+    İptal edilen ya da hata veren işler de done(None) yayar, böylece
+    bekleyen iş sayısı her zaman doğru kalır.
+    """
+    
+    def __init__(self, fn, *args, cancel=None):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.cancel = cancel
+        self.signals = JobSignals()
+    
+    def run(self):
+        if self.cancel is not None and self.cancel.is_set():
+            self.signals.done.emit(None)
+            return
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            result = None
+        self.signals.done.emit(result)
 
 class STLSupportOptimizer(qtw.QMainWindow):
     def __init__(self):
         super().__init__()
-        self.stl_mesh = None
+        self.mesh_kernel = None
+        # STL içerik özetiyle anahtarlanan disk önbelleği (API ile ortak)
+        self.disk_cache = diskcache.open_default()
+        self.mesh_key = None
+        self.raycaster = None
         self.vertices = None
         self.faces = None
-        self.support_structures = []
+        # Destek kolonları plaka çerçevesinde (z=0 plaka); support_lift döndürülmüş çerçeveye taşır
+        self.support_structures = np.zeros(0, dtype=SUPPORT_DTYPE)
+        self.support_lift = 0.0
         self.current_orientation = [0, 0, 0]  # x, y, z rotations
         self.best_orientation = [0, 0, 0]
         self.min_support_volume = float('inf')
+        self.pareto_scores = None
         self.optimization_running = False
         
+        # Puanlama ve destek hesapları bu havuzda, arayüz thread'i dışında çalışır
+        self.job_pool = qtc.QThreadPool()
+        self.job_pool.setMaxThreadCount(os.cpu_count() or 1)
+        self.jobs = set()
+        self.closing = False
+        self.cancel_event = None
+        self.opt_directions = None
+        self.opt_volumes = None
+        self.opt_pending = 0
+        self.best_changed = False
+        self.view_dirty = False
+        self.support_job_running = False
+        self.support_pending = False
+        
         self.initUI()
         
     def initUI(self):
@@ -107,6 +175,13 @@ class STLSupportOptimizer(qtw.QMainWindow):
         self.optimization_info.setFixedHeight(150)
         optimization_layout.addWidget(self.optimization_info)
         
+        # Destek hacmi, yükseklik, alt yüzey ve temas alanı için baskın olmayan çözümler
+        optimization_layout.addWidget(qtw.QLabel("Pareto Cephesi:"))
+        self.pareto_list = qtw.QListWidget()
+        self.pareto_list.setFixedHeight(120)
+        self.pareto_list.itemClicked.connect(self.apply_pareto_item)
+        optimization_layout.addWidget(self.pareto_list)
+        
         # Destek ayarları
         support_group = qtw.QGroupBox("Destek Ayarları")
         support_layout = qtw.QVBoxLayout(support_group)
@@ -117,13 +192,31 @@ class STLSupportOptimizer(qtw.QMainWindow):
         self.overhang_spin.setRange(0, 90)
         self.overhang_spin.setValue(45)
         self.overhang_spin.setSuffix("°")
+        # Destek hesabı (supports, analyzer) ile aynı tanım: normal_z < -cos(açı)
+        self.overhang_spin.setToolTip("Normali aşağı yönle bu açıdan daha küçük açı yapan yüzler desteklenir")
         overhang_layout.addWidget(self.overhang_spin)
         support_layout.addLayout(overhang_layout)
         
+        # Çıkıntılar bu aralıktaki XY ızgarasında örneklenir; hücredeki her çıkıntı katmanına bir kolon
+        spacing_layout = qtw.QHBoxLayout()
+        spacing_layout.addWidget(qtw.QLabel("Destek Aralığı:"))
+        self.support_spacing_spin = qtw.QDoubleSpinBox()
+        self.support_spacing_spin.setRange(0.1, 10.0)
+        self.support_spacing_spin.setSingleStep(0.1)
+        self.support_spacing_spin.setValue(1.0)
+        self.support_spacing_spin.setSuffix(" mm")
+        self.support_spacing_spin.valueChanged.connect(self.generate_supports)
+        spacing_layout.addWidget(self.support_spacing_spin)
+        support_layout.addLayout(spacing_layout)
+        
         self.auto_support_btn = qtw.QPushButton("Destek Yapıları Oluştur")
         self.auto_support_btn.clicked.connect(self.generate_supports)
         support_layout.addWidget(self.auto_support_btn)
         
+        self.export_support_btn = qtw.QPushButton("Destekleri Dışa Aktar")
+        self.export_support_btn.clicked.connect(self.export_supports)
+        support_layout.addWidget(self.export_support_btn)
+        
         self.support_info_label = qtw.QLabel("Destek hacmi: 0 mm³")
         support_layout.addWidget(self.support_info_label)
         
@@ -134,29 +227,61 @@ class STLSupportOptimizer(qtw.QMainWindow):
         control_layout.addWidget(support_group)
         control_layout.addStretch()
         
-        # Sağ panel - 3D görüntü
-        self.figure = Figure(figsize=(10, 8))
-        self.canvas = FigureCanvas(self.figure)
-        self.ax = self.figure.add_subplot(111, projection='3d')
+        # Sağ panel - 3D görüntü: mesh GPU'ya bir kez yüklenir, dönüş sadece model matrisidir
+        self.viewer = MeshViewer() if MeshViewer is not None else None
+        if self.viewer is None:
+            self.figure = Figure(figsize=(10, 8))
+            self.canvas = FigureCanvas(self.figure)
+            self.ax = self.figure.add_subplot(111, projection='3d')
         
         # Layout'a ekle
         layout.addWidget(control_panel)
-        layout.addWidget(self.canvas)
+        layout.addWidget(self.viewer if self.viewer is not None else self.canvas, 1)
         
-        # Timer for live updates
+        # Timer for live updates: sonuçlar sabit kare hızında arayüze yansır
         self.update_timer = qtc.QTimer()
-        self.update_timer.timeout.connect(self.update_visualization)
+        self.update_timer.timeout.connect(self.on_frame)
+        self.update_timer.start(FRAME_INTERVAL_MS)
         
     def load_stl_file(self):
         file_path, _ = qtw.QFileDialog.getOpenFileName(self, "STL Dosyası Seç", "", "STL Files (*.stl)")
         if file_path:
             try:
-                self.stl_mesh = mesh.Mesh.from_file(file_path)
-                self.vertices = self.stl_mesh.vectors
-                self.faces = np.arange(len(self.vertices))
+                # Daha önce açılan dosyalar disk önbelleğinden ayrıştırılmadan yüklenir
+                self.mesh_key = self.disk_cache.file_key(file_path) if self.disk_cache else None
+                cached = load_geometry(self.disk_cache, self.mesh_key)
+                if cached is not None:
+                    self.mesh_kernel = CompactMesh(cached.vertices, cached.faces,
+                                                   face_normals=cached.face_normals,
+                                                   area_faces=cached.area_faces)
+                    tri_mesh = cached
+                else:
+                    stl_mesh = mesh.Mesh.from_file(file_path)
+                    # Üçgen çorbası yerine tekilleştirilmiş vertex + indeks sakla
+                    self.mesh_kernel = CompactMesh.from_triangles(stl_mesh.vectors)
+                    del stl_mesh
+                    tri_mesh = trimesh.Trimesh(self.mesh_kernel.vertices, self.mesh_kernel.faces, process=False)
+                    if self.disk_cache is not None:
+                        self.disk_cache.save_arrays(self.mesh_key, "geometry", geometry_arrays(tri_mesh))
+                self.vertices = self.mesh_kernel.vertices
+                self.faces = self.mesh_kernel.faces
+                # Işın izleme için BVH bir kez kurulur, tüm oryantasyonlarda kullanılır
+                self.raycaster = SupportRaycaster.cached(tri_mesh, self.disk_cache, self.mesh_key,
+                                                         max_points=len(self.faces))
+                self.support_structures = np.zeros(0, dtype=SUPPORT_DTYPE)
+                if self.viewer is not None:
+                    coarse = None
+                    if self.disk_cache is not None:
+                        # Düşük çözünürlüklü görüntü seviyeleri de önbellekten gelir
+                        name = f"display_levels_{self.viewer.lod_faces}_{self.viewer.interactive_faces}"
+                        flat = self.disk_cache.cached_arrays(self.mesh_key, name, lambda: tuple(
+                            a for level in self.viewer.coarse_levels(self.vertices, self.faces) for a in level))
+                        coarse = list(zip(flat[0::2], flat[1::2]))
+                    self.viewer.set_mesh(self.vertices, self.faces, extremes=self.raycaster.extremes,
+                                         coarse=coarse)
                 
                 # Mesh bilgilerini göster
-                num_faces = len(self.stl_mesh.vectors)
+                num_faces = len(self.faces)
                 self.file_info_label.setText(f"Yüklendi: {num_faces} üçgen")
                 
                 # İlk görselleştirme
@@ -165,34 +290,10 @@ class STLSupportOptimizer(qtw.QMainWindow):
             except Exception as e:
                 qtw.QMessageBox.critical(self, "Hata", f"STL dosyası yüklenirken hata: {str(e)}")
     
-    def rotate_mesh(self, vertices, rx, ry, rz):
-        """Mesh'i verilen açılarla döndür"""
-        # Açıları radyana çevir
-        rx, ry, rz = np.radians(rx), np.radians(ry), np.radians(rz)
-        
-        # Rotasyon matrisleri
-        Rx = np.array([[1, 0, 0],
-                       [0, np.cos(rx), -np.sin(rx)],
-                       [0, np.sin(rx), np.cos(rx)]])
-        
-        Ry = np.array([[np.cos(ry), 0, np.sin(ry)],
-                       [0, 1, 0],
-                       [-np.sin(ry), 0, np.cos(ry)]])
-        
-        Rz = np.array([[np.cos(rz), -np.sin(rz), 0],
-                       [np.sin(rz), np.cos(rz), 0],
-                       [0, 0, 1]])
-        
-        # Toplam rotasyon matrisi
-        R = Rz @ Ry @ Rx
-        
-        # Tüm vertexleri döndür
-        rotated_vertices = np.zeros_like(vertices)
-        for i in range(len(vertices)):
-            for j in range(3):
-                rotated_vertices[i, j] = vertices[i, j] @ R
-        
-        return rotated_vertices
+    def rotate_mesh(self, rx, ry, rz):
+        """Mesh'i verilen açılarla paylaşılan tampona döndür; (vertexler, normaller) döner"""
+        # GUI vertexlere her zaman v @ R uyguladı; çekirdek M @ v uyguladığı için R.T veriyoruz
+        return self.mesh_kernel.rotate(euler_matrix(rx, ry, rz).T)
     
     def calculate_face_normal(self, triangle):
         """Üçgen yüzün normal vektörünü hesapla"""
@@ -207,56 +308,67 @@ class STLSupportOptimizer(qtw.QMainWindow):
     def needs_support(self, triangle, overhang_angle=45):
         """Üçgenin destek gerekip gerekmediğini kontrol et"""
         normal = self.calculate_face_normal(triangle)
-        # Z ekseni ile açıyı hesapla
-        z_axis = np.array([0, 0, 1])
-        angle = np.arccos(np.clip(np.dot(normal, z_axis), -1, 1))
-        angle_degrees = np.degrees(angle)
-        
-        # Eğer yüzey aşağı bakıyorsa ve açı overhang açısından büyükse destek gerekir
-        return angle_degrees > (90 - overhang_angle) and normal[2] < 0
+        # Normal aşağı yönle (-Z) overhang açısından küçük açı yapıyorsa destek gerekir;
+        # SupportRaycaster ve analyzer ile aynı eşik (yalnızca aşağı bakmak yetmez)
+        return normal[2] < -np.cos(np.radians(overhang_angle))
+    
+    def build_direction(self, orientation):
+        """Açılar uygulandığında +Z'ye gelen (orijinal çerçevedeki) yön"""
+        return euler_matrix(*orientation)[:, 2]
     
     def generate_supports(self):
-        """Destek yapılarını oluştur"""
+        """Destek yapılarını arka planda oluştur; en son istek kazanır"""
         if self.vertices is None:
             return
-        
-        # Mevcut oryantasyonla mesh'i döndür
-        rotated_vertices = self.rotate_mesh(self.vertices, *self.current_orientation)
-        
-        self.support_structures = []
-        overhang_angle = self.overhang_spin.value()
-        
-        total_support_volume = 0
-        
-        for triangle in rotated_vertices:
-            if self.needs_support(triangle, overhang_angle):
-                # Destek yapısı oluştur
-                center = np.mean(triangle, axis=0)
-                
-                # Build platform'a kadar destek
-                if center[2] > 0:  # Sadece platform üstündeki noktalar için
-                    support_height = center[2]
-                    support_volume = 0.5 * 0.5 * support_height  # Basit dikdörtgen destek
-                    total_support_volume += support_volume
-                    
-                    # Destek çubuğu
-                    support_points = np.array([
-                        [center[0]-0.25, center[1]-0.25, 0],
-                        [center[0]+0.25, center[1]-0.25, 0],
-                        [center[0]+0.25, center[1]+0.25, 0],
-                        [center[0]-0.25, center[1]+0.25, 0],
-                        [center[0]-0.25, center[1]-0.25, center[2]],
-                        [center[0]+0.25, center[1]-0.25, center[2]],
-                        [center[0]+0.25, center[1]+0.25, center[2]],
-                        [center[0]-0.25, center[1]+0.25, center[2]]
-                    ])
-                    
-                    self.support_structures.append(support_points)
-        
+        if self.support_job_running:
+            self.support_pending = True
+            return
+        self.support_job_running = True
+        self.support_pending = False
+        self.submit(self.supports_ready, self.cast_supports, list(self.current_orientation),
+                    self.overhang_spin.value(), self.support_spacing_spin.value())
+    
+    def cast_supports(self, orientation, overhang_angle, spacing):
+        """İşçi thread'de: ızgara hücrelerindeki çıkıntı katmanlarına destek kolonları kur"""
+        # Her kolon, bulunduğu çıkıntı katmanından ilk çarptığı yüzeye (parça ya da platform) iner
+        rotation = euler_matrix(*orientation)
+        columns = self.raycaster.columns(rotation, overhang_angle, spacing)
+        lift = float((self.raycaster.extremes @ self.build_direction(orientation)).min())
+        return columns, lift, column_volume(columns)
+    
+    @qtc.pyqtSlot(object)
+    def supports_ready(self, result):
+        """Destek işi bittiğinde çağrılır; eskimiş sonuç çizilmez"""
+        self.support_job_running = False
+        if self.support_pending:
+            self.generate_supports()
+            return
+        if result is None:
+            return
+        self.support_structures, self.support_lift, total_support_volume = result
         self.support_info_label.setText(f"Destek hacmi: {total_support_volume:.2f} mm³")
-        self.update_visualization()
-        
-        return total_support_volume
+        self.view_dirty = True
+    
+    def displayed_supports(self):
+        """Destek kolonları döndürülmüş çerçevede (görüntüleyici ve matplotlib için)"""
+        columns = self.support_structures.copy()
+        columns["z_bottom"] += self.support_lift
+        columns["z_top"] += self.support_lift
+        return columns
+    
+    def export_supports(self):
+        """Destek kolonlarını STL ya da 3MF olarak kaydet (plaka çerçevesinde, z=0 plaka)"""
+        if len(self.support_structures) == 0:
+            qtw.QMessageBox.information(self, "Bilgi", "Dışa aktarılacak destek yapısı yok.")
+            return
+        file_path, _ = qtw.QFileDialog.getSaveFileName(self, "Destekleri Kaydet", "supports.stl",
+                                                       "STL Files (*.stl);;3MF Files (*.3mf)")
+        if not file_path:
+            return
+        try:
+            write_supports(file_path, self.support_structures)
+        except Exception as e:
+            qtw.QMessageBox.critical(self, "Hata", f"Destekler kaydedilirken hata: {str(e)}")
     
     def update_orientation(self):
         """Oryantasyon slider'ları değiştiğinde çağrılır"""
@@ -271,9 +383,9 @@ class STLSupportOptimizer(qtw.QMainWindow):
         self.y_value_label.setText(f"{self.current_orientation[1]}°")
         self.z_value_label.setText(f"{self.current_orientation[2]}°")
         
-        # Canlı güncelleme
-        if hasattr(self, 'stl_mesh') and self.stl_mesh is not None:
-            self.update_visualization()
+        # Canlı güncelleme: çizim bir sonraki karede, destekler arka planda
+        if self.mesh_kernel is not None:
+            self.view_dirty = True
             # Otomatik destek oluştur
             self.generate_supports()
     
@@ -282,35 +394,30 @@ class STLSupportOptimizer(qtw.QMainWindow):
         if self.vertices is None:
             return
         
+        if self.viewer is not None:
+            # Sadece model matrisi ve destek örnekleri güncellenir
+            self.viewer.set_orientation(euler_matrix(*self.current_orientation))
+            self.viewer.set_supports(self.displayed_supports())
+            return
+        
         self.ax.clear()
         
         # Mesh'i döndür
-        rotated_vertices = self.rotate_mesh(self.vertices, *self.current_orientation)
+        rotated_vertices, _ = self.rotate_mesh(*self.current_orientation)
         
         # Ana mesh'i çiz
-        collection = Poly3DCollection(rotated_vertices, alpha=0.7, facecolor='lightblue', edgecolor='black')
+        collection = Poly3DCollection(self.mesh_kernel.rotated_triangles(), alpha=0.7, facecolor='lightblue', edgecolor='black')
         self.ax.add_collection3d(collection)
         
-        # Destek yapılarını çiz
-        for support in self.support_structures:
-            # Destek çubuğu yüzleri
-            faces = [
-                [support[0], support[1], support[2], support[3]],  # alt yüz
-                [support[4], support[5], support[6], support[7]],  # üst yüz
-                [support[0], support[1], support[5], support[4]],  # yan yüz 1
-                [support[1], support[2], support[6], support[5]],  # yan yüz 2
-                [support[2], support[3], support[7], support[6]],  # yan yüz 3
-                [support[3], support[0], support[4], support[7]]   # yan yüz 4
-            ]
-            
-            support_collection = Poly3DCollection(faces, alpha=0.5, facecolor='red', edgecolor='darkred')
-            self.ax.add_collection3d(support_collection)
-        
-        # Eksenleri ayarla
-        all_points = rotated_vertices.reshape(-1, 3)
+        # Destek yapılarını çiz: tüm çubukların yüzleri tek koleksiyonda
+        all_points = rotated_vertices
         if len(self.support_structures) > 0:
-            support_points = np.array(self.support_structures).reshape(-1, 3)
-            all_points = np.vstack([all_points, support_points])
+            support_vertices, support_faces = column_mesh(self.displayed_supports())
+            support_collection = Poly3DCollection(support_vertices[support_faces], alpha=0.5,
+                                                  facecolor='red', edgecolor='darkred')
+            self.ax.add_collection3d(support_collection)
+            # Eksenler desteklerin köşelerini de kapsasın
+            all_points = np.vstack([all_points, support_vertices])
         
         self.ax.set_xlabel('X')
         self.ax.set_ylabel('Y')
@@ -329,98 +436,161 @@ class STLSupportOptimizer(qtw.QMainWindow):
         self.ax.set_ylim(mid_y - max_range, mid_y + max_range)
         self.ax.set_zlim(mid_z - max_range, mid_z + max_range)
         
-        # Build platform'u göster
+        # Build platform'u göster: destekler parçanın en alt noktasında biter, plaka da orada
         platform_size = max_range * 2
         xx, yy = np.meshgrid(np.linspace(mid_x - platform_size/2, mid_x + platform_size/2, 2),
                            np.linspace(mid_y - platform_size/2, mid_y + platform_size/2, 2))
-        zz = np.zeros_like(xx)
+        zz = np.full_like(xx, rotated_vertices[:, 2].min())
         self.ax.plot_surface(xx, yy, zz, alpha=0.3, color='gray')
         
         self.canvas.draw()
     
+    def submit(self, slot, fn, *args, cancel=None):
+        """fn(*args) işini havuza gönder; sonuç slot'a ana thread'de gelir"""
+        if self.closing:
+            return
+        job = Job(fn, *args, cancel=cancel)
+        # Sinyaller teslim edilene kadar iş nesnesi canlı tutulur
+        job.setAutoDelete(False)
+        self.jobs.add(job)
+        job.signals.done.connect(slot)
+        job.signals.done.connect(lambda _: self.jobs.discard(job))
+        job.signals.failed.connect(self.job_failed)
+        self.job_pool.start(job)
+    
+    @qtc.pyqtSlot(str)
+    def job_failed(self, message):
+        """Arka plan işindeki hatayı göster"""
+        self.update_optimization_info(f"Hata: {message}")
+    
+    def closeEvent(self, event):
+        """Pencere kapanırken bekleyen işleri iptal et ve bitmelerini bekle"""
+        self.closing = True
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.update_timer.stop()
+        self.job_pool.waitForDone()
+        super().closeEvent(event)
+    
+    def on_frame(self):
+        """Sabit kare hızında çağrılır: biriken sonuçları arayüze yansıt"""
+        if self.optimization_running:
+            if self.opt_directions is not None:
+                done = int(np.count_nonzero(~np.isnan(self.opt_volumes)))
+                total = len(self.opt_directions)
+                self.progress_bar.setValue(int(done / max(total, 1) * 100))
+                info_text = f"Optimizasyon: {done}/{total}\n"
+                info_text += f"En iyi destek hacmi: {self.min_support_volume:.2f} mm³\n"
+                info_text += f"En iyi oryantasyon: X={self.best_orientation[0]:.1f}°, Y={self.best_orientation[1]:.1f}°, Z={self.best_orientation[2]:.1f}°"
+                self.update_optimization_info(info_text)
+            # Her örnek yerine sadece en iyi oryantasyon değiştiğinde önizle
+            if self.best_changed:
+                self.best_changed = False
+                self.current_orientation = self.best_orientation.copy()
+                self.update_orientation_ui()
+            if self.opt_pending == 0:
+                self.opt_pending = -1
+                self.submit(self.optimization_finished, self.compute_pareto, self.opt_directions,
+                            self.opt_volumes, self.overhang_spin.value())
+        if self.view_dirty:
+            self.view_dirty = False
+            self.update_visualization()
+    
     def start_optimization(self):
-        """Optimizasyon işlemini başlat"""
+        """Optimizasyonu başlat; çalışıyorsa durdur"""
         if self.vertices is None:
             qtw.QMessageBox.warning(self, "Uyarı", "Önce bir STL dosyası yükleyin!")
             return
         
         if self.optimization_running:
-            qtw.QMessageBox.warning(self, "Uyarı", "Optimizasyon zaten çalışıyor!")
+            # Başlamamış işler hesap yapmadan döner
+            self.cancel_event.set()
+            self.optimize_btn.setText("Optimizasyon Durduruluyor...")
+            self.optimize_btn.setEnabled(False)
             return
         
         self.optimization_running = True
-        self.optimize_btn.setText("Optimizasyon Durduruluyor...")
-        self.optimize_btn.setEnabled(False)
-        
-        # Threading ile optimizasyon çalıştır
-        self.optimization_thread = threading.Thread(target=self.run_optimization)
-        self.optimization_thread.start()
-    
-    def run_optimization(self):
-        """Optimizasyon algoritmasını çalıştır"""
+        self.cancel_event = threading.Event()
         self.min_support_volume = float('inf')
         self.best_orientation = [0, 0, 0]
-        
-        orientations = []
-        # 100 farklı oryantasyon oluştur
-        for i in range(100):
-            rx = np.random.uniform(-180, 180)
-            ry = np.random.uniform(-180, 180)
-            rz = np.random.uniform(-180, 180)
-            orientations.append([rx, ry, rz])
-        
-        for i, orientation in enumerate(orientations):
-            if not self.optimization_running:
-                break
-                
-            # Oryantasyonu ayarla
-            self.current_orientation = orientation
-            
-            # UI'yi güncelle (ana thread'de)
-            qtc.QMetaObject.invokeMethod(self, "update_orientation_ui", qtc.Qt.QueuedConnection)
-            
-            # Destek hacmini hesapla
-            support_volume = self.calculate_support_volume(orientation)
-            
-            # En iyi oryantasyonu güncelle
-            if support_volume < self.min_support_volume:
-                self.min_support_volume = support_volume
-                self.best_orientation = orientation.copy()
-            
-            # Progress bar'ı güncelle
-            progress = int((i + 1) / 100 * 100)
-            qtc.QMetaObject.invokeMethod(self.progress_bar, "setValue", qtc.Qt.QueuedConnection, qtc.Q_ARG(int, progress))
-            
-            # Bilgi güncellemesi
-            info_text = f"Optimizasyon: {i+1}/100\n"
-            info_text += f"Mevcut destek hacmi: {support_volume:.2f} mm³\n"
-            info_text += f"En iyi destek hacmi: {self.min_support_volume:.2f} mm³\n"
-            info_text += f"En iyi oryantasyon: X={self.best_orientation[0]:.1f}°, Y={self.best_orientation[1]:.1f}°, Z={self.best_orientation[2]:.1f}°"
-            
-            qtc.QMetaObject.invokeMethod(self, "update_optimization_info", qtc.Qt.QueuedConnection, qtc.Q_ARG(str, info_text))
-            
-            time.sleep(0.1)  # Görselleştirme için kısa bekleme
-        
-        # Optimizasyon tamamlandı
-        self.optimization_running = False
-        qtc.QMetaObject.invokeMethod(self, "optimization_finished", qtc.Qt.QueuedConnection)
+        self.best_changed = False
+        self.pareto_scores = None
+        self.pareto_list.clear()
+        self.opt_directions = None
+        self.opt_volumes = None
+        self.progress_bar.setValue(0)
+        self.optimize_btn.setText("Optimizasyonu Durdur")
+        
+        # Önce aday yönler, sonra parçalar halinde puanlama
+        self.opt_pending = 1
+        self.submit(self.optimization_prepared, self.prepare_optimization, self.overhang_spin.value(),
+                    cancel=self.cancel_event)
+    
+    def cached(self, name, factory):
+        """factory() dizileri; disk önbelleği varsa oradan"""
+        if self.disk_cache is None:
+            return factory()
+        return self.disk_cache.cached_arrays(self.mesh_key, name, factory)
+    
+    def prepare_optimization(self, overhang_angle):
+        """İşçi thread'de: aday yönleri üret"""
+        # Z etrafındaki dönüş destek hacmini değiştirmediği için sadece yön seçilir.
+        # Pahalı ışın izleme yalnızca kısa listeye uygulanır: kararlı duruşlar ve
+        # geniş düz yüzeyler ucuz moment sınırıyla sıralanır, seyrek bir küre
+        # örneği eklenir; simetrik yönler atlanır
+        symmetry = self.cached("symmetry", lambda: symmetry_group(self.mesh_kernel))
+        features = self.cached("face_features", lambda: face_features(self.raycaster.mesh))
+        return shortlist(self.raycaster.mesh, overhang_angle, features=features, symmetry=symmetry)
+    
+    @qtc.pyqtSlot(object)
+    def optimization_prepared(self, directions):
+        """Aday yönleri parçalara bölüp havuza gönder"""
+        self.opt_pending -= 1
+        if directions is None:
+            return
+        self.opt_directions = directions
+        self.opt_volumes = np.full(len(directions), np.nan)
+        overhang_angle = self.overhang_spin.value()
+        for start in range(0, len(directions), OPTIMIZATION_CHUNK):
+            self.opt_pending += 1
+            self.submit(self.chunk_finished, self.score_chunk, start,
+                        directions[start:start + OPTIMIZATION_CHUNK], overhang_angle,
+                        cancel=self.cancel_event)
+    
+    def score_chunk(self, start, directions, overhang_angle):
+        """İşçi thread'de: bir grup yönü ışın izleme ile puanla"""
+        return start, self.raycaster.score(directions, overhang_angle)["support_volume"]
+    
+    @qtc.pyqtSlot(object)
+    def chunk_finished(self, result):
+        """Puanlanan parçayı kaydet; arayüz bir sonraki karede güncellenir"""
+        self.opt_pending -= 1
+        if result is None:
+            return
+        start, volumes = result
+        self.opt_volumes[start:start + len(volumes)] = volumes
+        i = int(np.argmin(volumes))
+        if volumes[i] < self.min_support_volume:
+            self.min_support_volume = float(volumes[i])
+            self.best_orientation = list(direction_euler(self.opt_directions[start + i]))
+            self.best_changed = True
+    
+    def compute_pareto(self, directions, volumes, overhang_angle):
+        """İşçi thread'de: değerlendirilen yönlerin Pareto cephesi"""
+        if directions is None or np.all(np.isnan(volumes)):
+            return None
+        evaluated = ~np.isnan(volumes)
+        # Diğer hedefler tek geçişte hesaplanır; destek hacmi ışın izlemeden gelen değerdir
+        scores = score_orientations(self.raycaster.mesh, directions[evaluated], overhang_angle)
+        scores["support_volume"] = volumes[evaluated]
+        front = scores[pareto_front(scores)]
+        return front[np.argsort(front["support_volume"], kind="stable")]
     
     def calculate_support_volume(self, orientation):
         """Verilen oryantasyon için destek hacmini hesapla"""
-        rotated_vertices = self.rotate_mesh(self.vertices, *orientation)
-        
-        total_support_volume = 0
         overhang_angle = self.overhang_spin.value()
-        
-        for triangle in rotated_vertices:
-            if self.needs_support(triangle, overhang_angle):
-                center = np.mean(triangle, axis=0)
-                if center[2] > 0:
-                    support_height = center[2]
-                    support_volume = 0.5 * 0.5 * support_height
-                    total_support_volume += support_volume
-        
-        return total_support_volume
+        scores = self.raycaster.score([self.build_direction(orientation)], overhang_angle)
+        return float(scores[0]["support_volume"])
     
     @qtc.pyqtSlot()
     def update_orientation_ui(self):
@@ -434,23 +604,50 @@ class STLSupportOptimizer(qtw.QMainWindow):
         """Optimizasyon bilgilerini güncelle"""
         self.optimization_info.setText(text)
     
-    @qtc.pyqtSlot()
-    def optimization_finished(self):
-        """Optimizasyon tamamlandığında çağrılır"""
+    @qtc.pyqtSlot(object)
+    def optimization_finished(self, pareto_scores):
+        """Optimizasyon tamamlandığında ya da durdurulduğunda çağrılır"""
+        self.optimization_running = False
+        self.opt_pending = 0
+        self.pareto_scores = pareto_scores
         self.optimize_btn.setText("Optimizasyonu Başlat")
         self.optimize_btn.setEnabled(True)
+        self.update_pareto_list()
+        if pareto_scores is None:
+            self.update_optimization_info("Optimizasyon durduruldu")
+            return
         
         # En iyi oryantasyona geç
         self.current_orientation = self.best_orientation.copy()
         self.update_orientation_ui()
         
-        qtw.QMessageBox.information(self, "Optimizasyon Tamamlandı", 
+        title = "Optimizasyon Durduruldu" if self.cancel_event.is_set() else "Optimizasyon Tamamlandı"
+        qtw.QMessageBox.information(self, title, 
                                    f"En iyi oryantasyon bulundu!\n"
                                    f"Destek hacmi: {self.min_support_volume:.2f} mm³\n"
                                    f"X: {self.best_orientation[0]:.1f}°\n"
                                    f"Y: {self.best_orientation[1]:.1f}°\n"
                                    f"Z: {self.best_orientation[2]:.1f}°")
 
+    def update_pareto_list(self):
+        """Pareto cephesini listeye yaz"""
+        self.pareto_list.clear()
+        if self.pareto_scores is None:
+            return
+        for score in self.pareto_scores:
+            rx, ry, rz = direction_euler(score["direction"])
+            self.pareto_list.addItem(f"X={rx:.1f}° Y={ry:.1f}° Z={rz:.1f}° | "
+                                     f"Hacim: {score['support_volume']:.1f} mm³, "
+                                     f"Yükseklik: {score['build_height']:.1f} mm, "
+                                     f"Alt yüzey: {score['downskin_area']:.1f} mm², "
+                                     f"Temas: {score['contact_area']:.1f} mm²")
+    
+    def apply_pareto_item(self, item):
+        """Listeden seçilen Pareto çözümüne geç"""
+        score = self.pareto_scores[self.pareto_list.row(item)]
+        self.current_orientation = list(direction_euler(score["direction"]))
+        self.update_orientation_ui()
+
 if __name__ == '__main__':
     app = qtw.QApplication(sys.argv)
     window = STLSupportOptimizer()
@@ -0,0 +1,346 @@
+# materials.py
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from meshstore import content_hasher
+
+# Bump when parsing changes, so cached tables are rebuilt
+PARSER_VERSION = 2
+
+DEFAULT_DIR = os.environ.get("MATERIALS_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lpbfmaterialuniverse")
+
+# Numeric columns: (materialDatabase.json field, unit); every value becomes a min/max pair
+PROPERTIES = {
+    "density": ("Density (g/cm³)", "g/cm³"),
+    "yield_strength": ("Yield Strength (MPa)", "MPa"),
+    "tensile_strength": ("Ultimate Tensile Strength (MPa)", "MPa"),
+    "elongation": ("Elongation at Break (%)", "%"),
+    "hardness": ("Hardness (HV)", "HV"),
+    "elastic_modulus": ("Modulus of Elasticity (GPa)", "GPa"),
+    "thermal_conductivity": ("Thermal Conductivity (W/m·K @25 °C)", "W/m·K"),
+    "electrical_conductivity": ("Electrical Conductivity (MS/m or %IACS)", "MS/m"),
+}
+# Free-text fields kept as-is
+TEXT_FIELDS = {
+    "composition_text": "Chemical Composition",
+    "definition": "Definition",
+    "key_features": "Key Features",
+    "applications": "Industries & Applications",
+}
+
+ELEMENTS = frozenset("""
+H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se Br Kr
+Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm
+Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn Fr Ra Ac Th Pa U Np Pu
+""".split())
+
+# Electrical conductivity of 100% IACS
+IACS_MS_PER_M = 58.0
+
+_NUMBER = r"(?P<qualifier>[~≈≥≤<>]?)\s*(?P<low>\d+(?:\.\d+)?)(?:\s*[-–]\s*(?P<high>\d+(?:\.\d+)?))?"
+_SPACES = re.compile(r"[\s  ]+")
+# A bare continuation of an "each of" list: symbols only, e.g. " Cr" or " Mo and W"
+_LIST_ITEM = re.compile(r"(?:\s|&|\band\b|\b[A-Z][a-z]?\b)*")
+
+
+def clean(text):
+    """Text with non-breaking and repeated spaces collapsed"""
+    return _SPACES.sub(" ", str(text)).strip()
+
+
+def name_key(name):
+    """Lookup key for material names: case, spacing and punctuation ignored"""
+    return re.sub(r"[^0-9a-z]", "", clean(name).lower())
+
+
+def _bounds(match):
+    """(min, max) of a _NUMBER match; the quantities here are non-negative"""
+    low = float(match["low"])
+    high = float(match["high"]) if match["high"] else low
+    if match["qualifier"] in ("≥", ">"):
+        return low, np.inf
+    if match["qualifier"] in ("≤", "<"):
+        return 0.0, high
+    return min(low, high), max(low, high)
+
+
+def parse_range(text, unit=None):
+    """(min, max) of a free-text value such as "270 MPa", "6-10" or "≥14.6 MS/m".
+
+    "~" is dropped, "≥x" is open above and "≤x" starts at 0. With unit, only
+    a number directly followed by it counts (so "150 HB" is no HV value);
+    conductivity also accepts "% IACS". (nan, nan) when nothing matches.
+    """
+    if text is None:
+        return np.nan, np.nan
+    text = clean(text)
+    if unit is None:
+        match = re.search(_NUMBER, text)
+        return _bounds(match) if match else (np.nan, np.nan)
+    match = re.search(_NUMBER + r"\s*" + re.escape(unit), text)
+    if match:
+        return _bounds(match)
+    if unit == "MS/m":
+        match = re.search(_NUMBER + r"\s*%\s*IACS", text)
+        if match:
+            low, high = _bounds(match)
+            return low * IACS_MS_PER_M / 100, high * IACS_MS_PER_M / 100
+    return np.nan, np.nan
+
+
+def parse_composition(text):
+    """{element: (min wt%, max wt%)} of strings like "Al balance, 9–11% Si, ≤0.55% Fe".
+
+    Balance elements get what the others leave (shared equally if several),
+    a value given for "Nb+Ta" is split between them, "~25% each of Co, Cr"
+    applies to every bare element listed right after it. Non-elements
+    ("impurities", "Rare Earths") and elements without a value ("minor Cu")
+    are skipped, and end an "each of" list.
+    """
+    bounds, balance = {}, []
+    each = None
+    for part in clean(text).split(","):
+        part = re.sub(r"\([^)]*\)", "", part)
+        elements = [e for e in re.findall(r"\b([A-Z][a-z]?)\b", part) if e in ELEMENTS]
+        if "impurities" in part or not elements:
+            each = None
+            continue
+        if "balance" in part:
+            balance += elements
+            each = None
+            continue
+        match = re.search(_NUMBER, part)
+        if match:
+            low, high = _bounds(match)
+            high = min(high, 100.0)
+            each = (low, high) if "each" in part else None
+        elif each is not None and _LIST_ITEM.fullmatch(part):
+            low, high = each
+        else:
+            each = None
+            continue
+        share = 1 if each is not None else len(elements)
+        for element in elements:
+            bounds[element] = (low / share, high / share)
+    if balance:
+        rest_min = max(100.0 - sum(high for _, high in bounds.values()), 0.0)
+        rest_max = max(100.0 - sum(low for low, _ in bounds.values()), 0.0)
+        for element in balance:
+            bounds[element] = (rest_min / len(balance), rest_max / len(balance))
+    return bounds
+
+
+def source_hash(directory=DEFAULT_DIR):
+    """Content hash of the source JSON files and the parser version"""
+    hasher = content_hasher()
+    hasher.update(str(PARSER_VERSION).encode())
+    for name in ("materialDatabase.json", "compositionData.json"):
+        with open(os.path.join(directory, name), "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def build_arrays(directory=DEFAULT_DIR):
+    """Parse the material universe JSON into the named arrays of a MaterialTable.
+
+    Rows are the materialDatabase.json records followed by the
+    compositionData.json materials they do not name. Where both name a
+    material, compositionData.json gives the composition.
+    """
+    with open(os.path.join(directory, "materialDatabase.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    with open(os.path.join(directory, "compositionData.json"), encoding="utf-8") as f:
+        compositions = {name_key(name): (clean(name), clean(text)) for name, text in json.load(f).items()}
+
+    rows = []
+    for record in records:
+        record = {clean(k): v for k, v in record.items()}
+        name = clean(record["Material"])
+        _, composition = compositions.pop(name_key(name), (None, clean(record.get("Chemical Composition", ""))))
+        rows.append((name, record, composition))
+    rows += [(name, {}, composition) for name, composition in compositions.values()]
+
+    arrays = {
+        "name": np.array([name for name, _, _ in rows], dtype=str),
+        "alloy_type": np.array([clean(r.get("Alloy Type", "")) for _, r, _ in rows], dtype=str),
+        "commercial": np.array([bool(r.get("Commercially Available", 0)) for _, r, _ in rows]),
+    }
+    for column, (field, unit) in PROPERTIES.items():
+        # Hardness also appears in HB/HRC and conductivity in % IACS; the rest use the field's unit
+        match_unit = unit if column in ("hardness", "electrical_conductivity") else None
+        bounds = [parse_range(r.get(clean(field)), match_unit) for _, r, _ in rows]
+        arrays[column + "_min"], arrays[column + "_max"] = np.array(bounds, dtype=np.float64).reshape(-1, 2).T
+    for column, field in TEXT_FIELDS.items():
+        arrays[column] = np.array([clean(r.get(field) or "") for _, r, _ in rows], dtype=str)
+    arrays["composition_text"] = np.array([composition for _, _, composition in rows], dtype=str)
+
+    parsed = [parse_composition(composition) for _, _, composition in rows]
+    elements = sorted({e for p in parsed for e in p})
+    arrays["elements"] = np.array(elements, dtype=str)
+    column = {e: i for i, e in enumerate(elements)}
+    for name, side in (("composition_min", 0), ("composition_max", 1)):
+        matrix = np.zeros((len(rows), len(elements)))
+        for i, p in enumerate(parsed):
+            for element, values in p.items():
+                matrix[i, column[element]] = values[side]
+        arrays[name] = matrix
+    return arrays
+
+
+class MaterialTable:
+    """Columnar, indexed view of the material universe.
+
+    Numeric properties are min/max float64 columns (nan when unknown, inf
+    for open upper bounds), compositions are (materials, elements) wt%
+    matrices. Every property and element has sorted indexes for range
+    queries; similar() searches a KD-tree over nominal compositions or
+    standardized properties.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.names = [str(n) for n in arrays["name"]]
+        self.elements = [str(e) for e in arrays["elements"]]
+        self._rows = {name_key(n): i for i, n in reversed(list(enumerate(self.names)))}
+        self._element_column = {e: i for i, e in enumerate(self.elements)}
+        self._sorted = {}
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, name):
+        """Row index of a material name (spacing and case ignored), or None"""
+        return self._rows.get(name_key(name))
+
+    def bounds(self, column):
+        """(min, max) arrays of a property or an element's wt%; KeyError if unknown"""
+        if column in PROPERTIES:
+            return self.arrays[column + "_min"], self.arrays[column + "_max"]
+        if column in ELEMENTS and column not in self._element_column:
+            # No material lists it
+            return np.zeros(len(self)), np.zeros(len(self))
+        i = self._element_column[column]
+        return self.arrays["composition_min"][:, i], self.arrays["composition_max"][:, i]
+
+    def nominal(self, column):
+        """Representative values: range midpoints, the finite bound of open ranges"""
+        low, high = self.bounds(column)
+        high = np.where(np.isfinite(high), high, low)
+        return (low + high) / 2
+
+    def _index(self, column):
+        with self._lock:
+            index = self._sorted.get(column)
+            if index is None:
+                low, high = self.bounds(column)
+                # nan sorts last, so it is never inside a finite search range
+                by_low, by_high = np.argsort(low, kind="stable"), np.argsort(high, kind="stable")
+                index = self._sorted[column] = (by_low, low[by_low], by_high, high[by_high])
+            return index
+
+    def query(self, ranges=None, alloy_type=None, commercial=None):
+        """Row indices whose ranges overlap every (low, high) in ranges.
+
+        ranges maps properties or element symbols to (low, high), either end
+        None for open; each is two binary searches in sorted indexes. Rows
+        with an unknown value never match a range on it.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, (low, high) in (ranges or {}).items():
+            by_low, sorted_low, by_high, sorted_high = self._index(column)
+            low = -np.inf if low is None else low
+            high = np.inf if high is None else high
+            starts_below = np.zeros(len(self), dtype=bool)
+            starts_below[by_low[:np.searchsorted(sorted_low, high, side="right")]] = True
+            ends_above = np.zeros(len(self), dtype=bool)
+            ends_above[by_high[np.searchsorted(sorted_high, low, side="left"):]] = True
+            # nan maxima sort last as well; drop them explicitly
+            mask &= starts_below & ends_above & ~np.isnan(self.bounds(column)[1])
+        if alloy_type is not None:
+            mask &= self.arrays["alloy_type"] == alloy_type
+        if commercial is not None:
+            mask &= self.arrays["commercial"] == commercial
+        return np.flatnonzero(mask)
+
+    def _features(self, by):
+        if by == "composition":
+            return np.column_stack([self.nominal(e) for e in self.elements])
+        if by == "properties":
+            values = np.column_stack([self.nominal(c) for c in PROPERTIES])
+            # Standardize, unknown values sit at the mean
+            mean, std = np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+            values = (values - mean) / np.where(std > 0, std, 1.0)
+            return np.nan_to_num(values, nan=0.0)
+        raise ValueError(f"Unknown similarity: {by}")
+
+    def similar(self, name, k=5, by="composition"):
+        """(row, distance) of the k materials nearest to name, excluding itself.
+
+        by="composition" compares nominal wt% (Euclidean, in wt%);
+        by="properties" compares standardized property midpoints. KeyError
+        for an unknown material, ValueError for an unknown by.
+        """
+        row = self.row(name)
+        if row is None:
+            raise KeyError(name)
+        with self._lock:
+            if by not in self._trees:
+                features = self._features(by)
+                self._trees[by] = (features, cKDTree(features))
+            features, tree = self._trees[by]
+        distances, rows = tree.query(features[row], k=min(k + 1, len(self)))
+        return [(int(r), float(d)) for r, d in zip(np.atleast_1d(rows), np.atleast_1d(distances))
+                if r != row][:k]
+
+    def density(self, name):
+        """Nominal density in g/cm³, or None when the material or its density is unknown"""
+        row = self.row(name)
+        if row is None:
+            return None
+        value = self.nominal("density")[row]
+        return float(value) if np.isfinite(value) else None
+
+    def record(self, row):
+        """JSON-friendly dict of one material"""
+        a = self.arrays
+
+        def bound(value):
+            return float(value) if np.isfinite(value) else None
+
+        composition = {}
+        for i, element in enumerate(self.elements):
+            low, high = a["composition_min"][row, i], a["composition_max"][row, i]
+            if high > 0:
+                composition[element] = {"min": float(low), "max": float(high)}
+        return {
+            "name": self.names[row],
+            "alloy_type": str(a["alloy_type"][row]),
+            "commercial": bool(a["commercial"][row]),
+            "properties": {
+                column: {"min": bound(a[column + "_min"][row]), "max": bound(a[column + "_max"][row]),
+                         "unit": unit}
+                for column, (_, unit) in PROPERTIES.items() if not np.isnan(a[column + "_min"][row])
+            },
+            "composition": composition,
+            **{column: str(a[column][row]) for column in TEXT_FIELDS},
+        }
+
+
+def load(directory=DEFAULT_DIR, disk=None):
+    """MaterialTable of the JSON sources, via the binary arrays in a DiskCache when given"""
+    if disk is None:
+        return MaterialTable(build_arrays(directory))
+    key = source_hash(directory)
+    arrays = disk.load_arrays(key, "materials")
+    if arrays is None:
+        arrays = build_arrays(directory)
+        disk.save_arrays(key, "materials", arrays)
+    return MaterialTable(arrays)
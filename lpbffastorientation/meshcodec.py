@@ -0,0 +1,121 @@
+# meshcodec.py
+"""Compact binary mesh format for sending geometry to the browser.
+
+Layout (little endian):
+    header   magic b"TAMB", version u16, flags u16, vertex count u32, face count u32
+    [bounds] 3 x f32 origin, 3 x f32 scale          (only if FLAG_QUANTIZED)
+    faces    face count x 3 x u32
+    vertices vertex count x 3 x f32, or u16 if quantized (v = origin + q * scale)
+
+Every block starts on a 4 byte boundary so a client can wrap the buffer in
+typed arrays (Uint32Array / Float32Array / Uint16Array) without copying.
+"""
+import gzip
+import struct
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+MAGIC = b"TAMB"
+VERSION = 1
+FLAG_QUANTIZED = 1
+HEADER = struct.Struct("<4sHHII")
+BOUNDS = struct.Struct("<6f")
+CONTENT_TYPE = "application/vnd.thinkadd.mesh"
+
+
+def encode_mesh(vertices, faces, quantize=False):
+    """Return the binary payload as a list of buffers (no concatenation)"""
+    faces = np.ascontiguousarray(faces, dtype="<u4")
+    vertices = np.ascontiguousarray(vertices, dtype="<f4")
+    flags = FLAG_QUANTIZED if quantize else 0
+    parts = [HEADER.pack(MAGIC, VERSION, flags, len(vertices), len(faces))]
+    if quantize:
+        origin = vertices.min(axis=0) if len(vertices) else np.zeros(3, np.float32)
+        extent = (vertices.max(axis=0) - origin) if len(vertices) else np.ones(3, np.float32)
+        scale = np.where(extent > 0, extent / 65535.0, 1.0).astype(np.float32)
+        q = np.rint((vertices - origin) / scale).astype("<u2")
+        parts.append(BOUNDS.pack(*origin, *scale))
+        parts += [memoryview(faces).cast("B"), memoryview(q).cast("B")]
+    else:
+        parts += [memoryview(faces).cast("B"), memoryview(vertices).cast("B")]
+    return parts
+
+
+def decode_mesh(data):
+    """Inverse of encode_mesh; returns (vertices float32, faces uint32)"""
+    data = memoryview(data)
+    magic, version, flags, nv, nf = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a thinkadd binary mesh")
+    offset = HEADER.size
+    if flags & FLAG_QUANTIZED:
+        bounds = np.array(BOUNDS.unpack_from(data, offset), dtype=np.float32)
+        offset += BOUNDS.size
+    faces = np.frombuffer(data, dtype="<u4", count=nf * 3, offset=offset).reshape(-1, 3)
+    offset += faces.nbytes
+    if flags & FLAG_QUANTIZED:
+        q = np.frombuffer(data, dtype="<u2", count=nv * 3, offset=offset).reshape(-1, 3)
+        vertices = bounds[:3] + q.astype(np.float32) * bounds[3:]
+    else:
+        vertices = np.frombuffer(data, dtype="<f4", count=nv * 3, offset=offset).reshape(-1, 3)
+    return vertices, faces
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best content encoding the client accepts"""
+    accepted = {token.split(";")[0].strip().lower() for token in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(parts, encoding):
+    """Join the payload, compressing it if an encoding was chosen"""
+    data = b"".join(parts)
+    if encoding == "br":
+        return brotli.compress(data, quality=4)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=4)
+    return data
+
+
+def iter_chunks(parts, start=0, stop=None, chunk_size=1 << 20):
+    """Yield bytes[start:stop] of the concatenated parts in bounded chunks"""
+    stop = sum(len(p) for p in parts) if stop is None else stop
+    offset = 0
+    for part in parts:
+        part = memoryview(part)
+        lo, hi = max(start - offset, 0), min(stop - offset, len(part))
+        for i in range(lo, hi, chunk_size):
+            yield bytes(part[i:min(i + chunk_size, hi)])
+        offset += len(part)
+        if offset >= stop:
+            break
+
+
+def parse_range(header, size):
+    """(start, stop) for a single 'bytes=a-b' range, or None for the whole body.
+
+    Raises ValueError for ranges that cannot be satisfied.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        stop = min(int(last) + 1, size) if last else size
+    else:
+        start, stop = max(size - int(last), 0), size
+    if start >= size or start >= stop:
+        raise ValueError("Range not satisfiable")
+    return start, stop
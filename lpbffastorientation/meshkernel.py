@@ -0,0 +1,199 @@
+# meshkernel.py
+import numpy as np
+from functools import cached_property
+
+
+def euler_matrix(rx, ry, rz):
+    """Rotation matrix Rz @ Ry @ Rx for angles given in degrees"""
+    rx, ry, rz = np.radians([rx, ry, rz])
+    cx, sx = np.cos(rx), np.sin(rx)
+    cy, sy = np.cos(ry), np.sin(ry)
+    cz, sz = np.cos(rz), np.sin(rz)
+    Rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    Ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    Rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return Rz @ Ry @ Rx
+
+
+def euler_angles(matrix):
+    """Inverse of euler_matrix: (rx, ry, rz) in degrees"""
+    m = np.asarray(matrix, dtype=np.float64)
+    ry = -np.arcsin(np.clip(m[2, 0], -1.0, 1.0))
+    if abs(m[2, 0]) < 1 - 1e-9:
+        rx = np.arctan2(m[2, 1], m[2, 2])
+        rz = np.arctan2(m[1, 0], m[0, 0])
+    else:
+        # Gimbal lock: only rx - rz (or rx + rz) is defined, put it all in rx
+        rx = np.arctan2(-m[1, 2], m[1, 1])
+        rz = 0.0
+    return tuple(float(a) for a in np.degrees([rx, ry, rz]))
+
+
+def direction_euler(direction):
+    """GUI slider angles that place the given build direction on +Z.
+
+    The GUI applies v @ euler_matrix(...) to points, i.e. the transpose of
+    the matrix, so the angles come from direction_matrix(direction).T.
+    """
+    return euler_angles(direction_matrix(direction).T)
+
+
+def direction_matrix(direction):
+    """Rotation matrix that maps the given direction onto +Z"""
+    z_axis = np.array([0.0, 0.0, 1.0])
+    direction = np.asarray(direction, dtype=np.float64)
+    direction = direction / np.linalg.norm(direction)
+    axis = np.cross(direction, z_axis)
+    s = np.linalg.norm(axis)
+    c = np.dot(direction, z_axis)
+    if s < 1e-6:
+        # Already aligned, or pointing straight down (flip about X)
+        return np.eye(3) if c > 0 else np.diag([1.0, -1.0, -1.0])
+    # Rodrigues' formula
+    k = axis / s
+    K = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+    return np.eye(3) + s * K + (1 - c) * (K @ K)
+
+
+def merge_triangles(triangles):
+    """Indexed (vertices float32, faces int32) from an (F, 3, 3) triangle soup"""
+    corners = np.ascontiguousarray(triangles, dtype=np.float32).reshape(-1, 3)
+    # Deduplicate rows by their raw bytes; much faster than unique(axis=0)
+    keys = corners.view(np.dtype((np.void, corners.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return corners[first], inverse.reshape(-1, 3).astype(np.int32)
+
+
+def cluster_decimate(vertices, faces, cell):
+    """Vertex-clustering decimation on a grid of the given cell size.
+
+    Vertices in the same cell collapse to their mean and faces that become
+    degenerate (or duplicated) are dropped. Crude but linear-time, which is
+    what a display level of detail needs. Returns (vertices, faces).
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell).astype(np.int64)
+    # Pack the cell index into one key (21 bits per axis)
+    cells = np.minimum(cells, (1 << 21) - 1)
+    keys = (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+    _, cluster = np.unique(keys, return_inverse=True)
+    cluster = cluster.ravel()
+    counts = np.bincount(cluster)
+    merged = np.empty((len(counts), 3), dtype=np.float32)
+    for axis in range(3):
+        merged[:, axis] = np.bincount(cluster, weights=vertices[:, axis]) / counts
+
+    remapped = cluster[np.asarray(faces)]
+    keep = ((remapped[:, 0] != remapped[:, 1]) & (remapped[:, 1] != remapped[:, 2])
+            & (remapped[:, 2] != remapped[:, 0]))
+    remapped = remapped[keep]
+    # Drop duplicate faces regardless of winding start
+    canonical = np.sort(remapped, axis=1)
+    _, first = np.unique(canonical, axis=0, return_index=True)
+    return merged, remapped[np.sort(first)].astype(np.int32)
+
+
+def face_normals_areas(vertices, faces, chunk_size=1 << 16):
+    """float32 unit normals and areas, gathered chunk by chunk.
+
+    Only chunk_size triangles are materialized at a time, so peak memory
+    stays near the output instead of an (F, 3, 3) soup.
+    """
+    normals = np.empty((len(faces), 3), dtype=np.float32)
+    areas = np.empty(len(faces), dtype=np.float32)
+    for start in range(0, len(faces), chunk_size):
+        tri = vertices[faces[start:start + chunk_size]]
+        cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        norm = np.linalg.norm(cross, axis=1)
+        areas[start:start + len(tri)] = 0.5 * norm
+        valid = norm > 0
+        block = normals[start:start + len(tri)]
+        block[valid] = cross[valid] / norm[valid, None]
+        block[~valid] = [0.0, 0.0, 1.0]
+    return normals, areas
+
+
+class CompactMesh:
+    """Indexed float32 mesh with preallocated buffers for repeated rotation.
+
+    Vertices are stored once (deduplicated) with an int32 face index instead
+    of the triangle soup numpy-stl returns. Face normals and areas are
+    computed once; rotating a mesh only rotates vertices and normals into
+    reusable buffers, so slider moves and optimizer sweeps do not allocate.
+    Attribute names follow trimesh so analyzer functions accept either.
+    """
+
+    def __init__(self, vertices, faces, face_normals=None, area_faces=None):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32)
+
+        if face_normals is not None and area_faces is not None:
+            # Already known (e.g. from the disk cache)
+            self.face_normals = np.ascontiguousarray(face_normals, dtype=np.float32)
+            self.area_faces = np.ascontiguousarray(area_faces, dtype=np.float32)
+        else:
+            self.face_normals, self.area_faces = face_normals_areas(self.vertices, self.faces)
+
+        self.matrix = np.eye(3, dtype=np.float32)
+        self._rotated_vertices = np.empty_like(self.vertices)
+        self._rotated_normals = np.empty_like(self.face_normals)
+        self._triangles = None
+        self.rotate(self.matrix)
+
+    @classmethod
+    def from_triangles(cls, triangles):
+        """Build from an (F, 3, 3) triangle soup such as stl_mesh.vectors"""
+        return cls(*merge_triangles(triangles))
+
+    @classmethod
+    def from_trimesh(cls, mesh):
+        return cls(mesh.vertices, mesh.faces)
+
+    @cached_property
+    def triangles_center(self):
+        """Unrotated face centroids, computed on first use"""
+        return self.vertices[self.faces].mean(axis=1, dtype=np.float64).astype(np.float32)
+
+    @property
+    def nbytes(self):
+        arrays = [self.vertices, self.faces, self.face_normals, self.area_faces,
+                  self._rotated_vertices, self._rotated_normals]
+        arrays += [a for a in (self.__dict__.get("triangles_center"), self._triangles) if a is not None]
+        return sum(a.nbytes for a in arrays)
+
+    def rotate(self, matrix):
+        """Rotate into the shared buffers; returns (vertices, face_normals).
+
+        Points are transformed as matrix @ p. The returned arrays are views of
+        internal buffers and are overwritten by the next call.
+        """
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        rot_t = self.matrix.T
+        np.matmul(self.vertices, rot_t, out=self._rotated_vertices)
+        np.matmul(self.face_normals, rot_t, out=self._rotated_normals)
+        return self._rotated_vertices, self._rotated_normals
+
+    def rotated_z(self, matrix):
+        """Build-axis components (normal_z, centroid_z) for one rotation.
+
+        Only the third row of the matrix is needed, so this allocates two
+        length-F vectors and leaves the shared buffers untouched; safe to call
+        from a worker thread while the UI renders.
+        """
+        row = np.asarray(matrix, dtype=np.float32)[2]
+        return self.face_normals @ row, self.triangles_center @ row
+
+    @property
+    def rotated_vertices(self):
+        return self._rotated_vertices
+
+    @property
+    def rotated_normals(self):
+        return self._rotated_normals
+
+    def rotated_triangles(self):
+        """Triangle soup of the last rotation, gathered into a reused buffer"""
+        if self._triangles is None:
+            self._triangles = np.empty((len(self.faces), 3, 3), dtype=np.float32)
+        np.take(self._rotated_vertices, self.faces, axis=0, out=self._triangles)
+        return self._triangles
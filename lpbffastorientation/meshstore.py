@@ -0,0 +1,180 @@
+# meshstore.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hasher():
+    """Incremental hasher matching content_hash, for streamed uploads"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(data):
+    """Stable id for an uploaded STL: hash of its raw bytes"""
+    hasher = content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _nbytes(value):
+    """Best-effort size of a cached value in bytes"""
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "vertices") and hasattr(value, "faces"):
+        return np.asarray(value.vertices).nbytes + np.asarray(value.faces).nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 0
+
+
+class MeshEntry:
+    """A parsed mesh plus the per-face data every analysis needs"""
+
+    def __init__(self, mesh_id, mesh):
+        self.mesh_id = mesh_id
+        self.mesh = mesh
+        self.normals = np.asarray(mesh.face_normals, dtype=np.float32)
+        self.areas = np.asarray(mesh.area_faces, dtype=np.float32)
+        self.centroids = np.asarray(mesh.triangles_center, dtype=np.float32)
+        self.bounds = np.asarray(mesh.bounds, dtype=np.float64)
+        try:
+            self.hull = mesh.convex_hull
+        except Exception:
+            self.hull = None
+        self.derived = {}
+        self.created = self.last_access = time.monotonic()
+        self._lock = threading.Lock()
+        self._on_grow = None
+        self.nbytes = (_nbytes(mesh) + self.normals.nbytes + self.areas.nbytes
+                       + self.centroids.nbytes + _nbytes(self.hull))
+
+    def cached(self, name, factory):
+        """Return derived data by name, computing it once per mesh"""
+        try:
+            return self.derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self.derived:
+                value = factory()
+                self.derived[name] = value
+                grown = _nbytes(value)
+                self.nbytes += grown
+                if self._on_grow is not None:
+                    self._on_grow(self, grown)
+        return self.derived[name]
+
+
+class MeshStore:
+    """Content-addressed mesh cache with LRU/TTL eviction and a byte budget.
+
+    Meshes are keyed by the hash of their STL bytes, so re-uploading a file
+    reuses the parsed mesh and everything derived from it. Once the total
+    size exceeds max_bytes the least recently used entries are dropped;
+    entries idle for longer than ttl seconds are dropped on access.
+    """
+
+    def __init__(self, max_bytes=1 << 30, ttl=None, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, mesh_id):
+        return mesh_id in self._entries
+
+    def get(self, mesh_id):
+        """Entry for mesh_id or None; counts as a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(mesh_id)
+            if entry is not None and self._expired(entry):
+                self._remove(mesh_id)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.last_access = self.clock()
+            self._entries.move_to_end(mesh_id)
+            return entry
+
+    def get_or_load(self, data, parse):
+        """Return (entry, cached) for raw STL bytes, parsing only on a miss"""
+        mesh_id = content_hash(data)
+        entry = self.get(mesh_id)
+        if entry is not None:
+            return entry, True
+        return self.put(mesh_id, parse(data)), False
+
+    def put(self, mesh_id, mesh):
+        entry = mesh if isinstance(mesh, MeshEntry) else MeshEntry(mesh_id, mesh)
+        entry.last_access = self.clock()
+        with self._lock:
+            if mesh_id in self._entries:
+                self._remove(mesh_id)
+            entry._on_grow = self._grown
+            self._entries[mesh_id] = entry
+            self.total_bytes += entry.nbytes
+            self._evict(keep=mesh_id)
+        return entry
+
+    def discard(self, mesh_id):
+        with self._lock:
+            if mesh_id in self._entries:
+                self._remove(mesh_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _expired(self, entry):
+        return self.ttl is not None and self.clock() - entry.last_access > self.ttl
+
+    def _grown(self, entry, nbytes):
+        with self._lock:
+            if self._entries.get(entry.mesh_id) is entry:
+                self.total_bytes += nbytes
+                self._evict(keep=entry.mesh_id)
+
+    def _remove(self, mesh_id):
+        entry = self._entries.pop(mesh_id)
+        entry._on_grow = None
+        self.total_bytes -= entry.nbytes
+
+    def _evict(self, keep=None):
+        # Expired entries first, then least recently used until under budget
+        for mesh_id in [k for k, e in self._entries.items() if k != keep and self._expired(e)]:
+            self._remove(mesh_id)
+            self.evictions += 1
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            mesh_id = next(iter(self._entries))
+            if mesh_id == keep:
+                self._entries.move_to_end(mesh_id)
+                mesh_id = next(iter(self._entries))
+            self._remove(mesh_id)
+            self.evictions += 1
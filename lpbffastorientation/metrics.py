@@ -0,0 +1,301 @@
+# metrics.py
+import bisect
+import contextvars
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+from collections import OrderedDict
+
+# Metrics are cheap enough to stay on; METRICS_ENABLED=0 turns recording off
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Per-request profiling (?profile=1) is only honoured when this is set
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(float(1 << s) for s in range(10, 32, 2))
+RATE_BUCKETS = tuple(float(10 ** e) for e in range(2, 10))
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{v}"' for n, v in itertools.chain(zip(names, values), extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Counter incremented directly, or read from function() at scrape time"""
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1.0, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        if self.function is not None:
+            return [(self.name, (), (), float(self.function()))]
+        with self._lock:
+            return [(self.name, labels, (), value) for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def dec(self, amount=1.0, *labels):
+        self.inc(-amount, *labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=TIME_BUCKETS, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for labels, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    out.append((self.name + "_bucket", labels, (("le", le),), cumulative))
+                out.append((self.name + "_sum", labels, (), total))
+                out.append((self.name + "_count", labels, (), count))
+        return out
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, extra, value in metric.samples():
+            lines.append(f"{name}{_format_labels(metric.labelnames, labels, extra)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("thinkadd_stage_seconds", "Time spent per pipeline stage", labelnames=("stage",))
+HTTP_SECONDS = Histogram("thinkadd_http_request_seconds", "HTTP request latency",
+                         labelnames=("method", "path", "status"))
+UPLOAD_BYTES = Histogram("thinkadd_upload_bytes", "Uploaded STL size", buckets=SIZE_BUCKETS)
+PARSE_TRIANGLES_PER_SECOND = Histogram("thinkadd_parse_triangles_per_second", "STL parse throughput",
+                                       buckets=RATE_BUCKETS)
+CANDIDATES_PER_SECOND = Histogram("thinkadd_optimize_candidates_per_second",
+                                  "Orientation search throughput per run", buckets=RATE_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram("thinkadd_queue_wait_seconds",
+                               "Time a scoring chunk waits for a pool worker", labelnames=("pool",))
+ACTIVE_OPTIMIZATIONS = Gauge("thinkadd_active_optimizations", "Running orientation searches")
+
+
+# Spans and per-request traces
+
+_trace = contextvars.ContextVar("thinkadd_trace", default=None)
+
+
+class Trace:
+    """Stage timings (and optionally cProfile stats) collected for one request"""
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.spans = []
+        self.stats = None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, stage, seconds):
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def add_profile(self, profiler):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        totals = OrderedDict()
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return ", ".join(f"{stage};dur={seconds * 1e3:.2f}" for stage, seconds in totals.items())
+
+    def report(self, top=30):
+        report = {
+            "elapsed": time.perf_counter() - self.started,
+            "spans": [{"stage": stage, "seconds": seconds} for stage, seconds in self.spans],
+        }
+        if self.stats is not None:
+            rows = []
+            for (filename, line, function), (_, calls, tottime, cumtime, _) in self.stats.stats.items():
+                rows.append({"function": f"{os.path.basename(filename)}:{line}({function})",
+                             "calls": calls, "tottime": tottime, "cumtime": cumtime})
+            rows.sort(key=lambda r: r["cumtime"], reverse=True)
+            report["profile"] = rows[:top]
+        return report
+
+
+def start_trace(profile=False):
+    """Begin collecting spans for the current context; returns (trace, reset token)"""
+    trace = Trace(profile and PROFILING_ENABLED)
+    return trace, _trace.set(trace)
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+# One cProfile per thread at a time; nested spans are timed but not re-profiled
+_profiling = threading.local()
+
+
+class _Span:
+    __slots__ = ("stage", "trace", "start", "profiler")
+
+    def __init__(self, stage, trace):
+        self.stage, self.trace = stage, trace
+        self.profiler = None
+
+    def __enter__(self):
+        if (self.trace is not None and self.trace.profile and self.stage in PROFILED_STAGES
+                and not getattr(_profiling, "active", False)):
+            _profiling.active = True
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profiling.active = False
+            self.trace.add_profile(self.profiler)
+        STAGE_SECONDS.observe(seconds, self.stage)
+        if self.trace is not None:
+            self.trace.add_span(self.stage, seconds)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# Stages that run synchronously in one thread and are worth profiling
+PROFILED_STAGES = {"parse", "serialize", "face_features", "symmetry", "raycaster", "overhang"}
+
+
+def span(stage):
+    """Context manager timing a stage into STAGE_SECONDS and the current trace"""
+    trace = _trace.get()
+    if not ENABLED and trace is None:
+        return _NULL_SPAN
+    return _Span(stage, trace)
+
+
+def traced(fn, *args):
+    """fn bound to the current context, for executors that do not copy it"""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args)
+
+
+# Recent profiling reports, fetched by id
+_reports = OrderedDict()
+_report_ids = itertools.count(1)
+_reports_lock = threading.Lock()
+
+
+def store_report(trace, keep=32):
+    with _reports_lock:
+        report_id = str(next(_report_ids))
+        _reports[report_id] = trace.report()
+        while len(_reports) > keep:
+            _reports.popitem(last=False)
+    return report_id
+
+
+def get_report(report_id):
+    with _reports_lock:
+        return _reports.get(report_id)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency histogram and opt-in per-request traces.
+
+    A request with ?profile=1 (honoured only with PROFILING_ENABLED=1) gets
+    a Server-Timing header with its stage timings and an X-Profile-Id whose
+    cProfile breakdown is served from /profile/{id}. Other requests only pay
+    for one histogram observation.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+        trace = token = None
+        if PROFILING_ENABLED and b"profile=1" in scope.get("query_string", b""):
+            trace, token = start_trace(profile=True)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if trace is not None:
+                    report_id = store_report(trace)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                    headers.append((b"x-profile-id", report_id.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                end_trace(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - start, scope["method"], path, str(status[0]))
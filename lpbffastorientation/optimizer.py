@@ -0,0 +1,479 @@
+# optimizer.py
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import metrics
+from analyzer import (OBJECTIVES, SAMPLING_METHODS, SCORE_DTYPE, generate_orientations, pareto_front, rank_weighted,
+                      score_bounds, score_orientations)
+from meshkernel import direction_euler, direction_matrix
+
+_pool = None
+_scheduler = None
+
+
+def pool_workers():
+    return int(os.environ.get("OPTIMIZER_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def get_pool():
+    """Shared process pool for orientation scoring, created on first use"""
+    global _pool
+    if _pool is None:
+        # spawn: the API process runs threads, which do not survive fork
+        _pool = ProcessPoolExecutor(max_workers=pool_workers(),
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def get_scheduler():
+    """FairScheduler over the shared pool, created on first use"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FairScheduler(get_pool(), pool_workers())
+    return _scheduler
+
+
+class FairScheduler:
+    """Round-robin dispatch of pool tasks across lanes.
+
+    A process pool runs tasks in submission order, so a search that queues
+    hundreds of chunks starves every search started after it. Each client
+    (a websocket, a batch request) submits through its own lane() instead;
+    at most limit tasks are handed to the pool at a time and the next one
+    is taken from the lanes in turn. Lanes have the executor interface
+    run_in_executor expects, and cancelling a task still queued in a lane
+    drops it.
+    """
+
+    def __init__(self, executor, limit):
+        self.executor = executor
+        self.limit = limit
+        self.running = 0
+        self._ready = deque()
+        # Reentrant: a task that completes immediately runs _finished inside _dispatch
+        self._lock = threading.RLock()
+
+    def lane(self):
+        return Lane(self)
+
+    @property
+    def queued(self):
+        with self._lock:
+            return sum(len(lane.pending) for lane in self._ready)
+
+    def _enqueue(self, lane, task):
+        with self._lock:
+            if not lane.pending:
+                self._ready.append(lane)
+            lane.pending.append(task)
+            self._dispatch()
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self.running < self.limit and self._ready:
+            lane = self._ready.popleft()
+            future, fn, args = lane.pending.popleft()
+            if lane.pending:
+                self._ready.append(lane)
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.running += 1
+            try:
+                inner = self.executor.submit(fn, *args)
+            except BaseException as e:
+                self.running -= 1
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(partial(self._finished, future))
+
+    def _finished(self, future, inner):
+        with self._lock:
+            self.running -= 1
+            self._dispatch()
+        if inner.cancelled():
+            future.set_exception(asyncio.CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+
+
+class Lane:
+    """One client's queue in a FairScheduler"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.pending = deque()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.scheduler._enqueue(self, (future, fn, args))
+        return future
+
+
+def score_chunk(features, directions, overhang_angle):
+    """Process pool task: score a chunk of directions on precomputed features"""
+    return score_orientations(None, directions, overhang_angle, features=features)
+
+
+def bounded_score_chunk(features, cos_radius, directions, overhang_angle):
+    """score_chunk plus analyzer.score_bounds (None when cos_radius is None, i.e. exact features)"""
+    scores = score_chunk(features, directions, overhang_angle)
+    if cos_radius is None:
+        return scores, None
+    return scores, score_bounds(features, cos_radius, directions, overhang_angle)
+
+
+def timed_score_chunk(features, cos_radius, directions, overhang_angle):
+    """bounded_score_chunk plus the worker's wall-clock start and end, for queue-wait metrics"""
+    started = time.time()
+    scores, bounds = bounded_score_chunk(features, cos_radius, directions, overhang_angle)
+    return started, time.time(), scores, bounds
+
+
+def cap_directions(center, radius, n, rng):
+    """n random directions within angular radius (radians) of center"""
+    cos_theta = rng.uniform(np.cos(radius), 1.0, n)
+    sin_theta = np.sqrt(1.0 - cos_theta ** 2)
+    phi = rng.uniform(0, 2 * np.pi, n)
+    local = np.column_stack([sin_theta * np.cos(phi), sin_theta * np.sin(phi), cos_theta])
+    # direction_matrix maps center onto +Z, its transpose maps +Z onto center
+    return local @ direction_matrix(center)
+
+
+class OrientationSearch:
+    """Coarse uniform sphere sweep followed by local refinement of the minima.
+
+    stages() yields (stage, directions) batches; scores for each batch must be
+    passed to add() before the next batch is requested, because refinement
+    rounds are centred on the best candidates found so far. The sweep uses
+    generate_orientations' deterministic sampling and, given the mesh's
+    symmetry group, skips directions equivalent to ones already sampled.
+    Given candidates (e.g. analyzer.shortlist) instead, those replace the
+    coarse sweep and refinement starts from their minima.
+
+    Scores added with error bounds (coarsened features, see promote) are
+    approximate; once promote has replaced them, the best, the Pareto front
+    and minima(exact=True) only consider exactly scored rows.
+    """
+
+    def __init__(self, objective="support_volume", coarse_samples=1024, seeds=8,
+                 rounds=4, samples_per_seed=32, seed=0, method="fibonacci", symmetry=None,
+                 candidates=None):
+        self.objective = objective
+        self.candidates = candidates
+        self.coarse_samples = coarse_samples if candidates is None else len(candidates)
+        self.method = method
+        self.symmetry = symmetry
+        self.seed = seed
+        self.seeds = seeds
+        self.rounds = rounds
+        self.samples_per_seed = samples_per_seed
+        self.rng = np.random.default_rng(seed)
+        self.results = []
+        # Per row: score_bounds of the objectives (zero where exact) and exactness
+        self.bounds = []
+        self.exact = []
+        self.evaluated = 0
+        self.best = None
+        self.best_bound = 0.0
+
+    def add(self, scores, bounds=None):
+        """Record scored directions; bounds (analyzer.score_bounds) mark them approximate"""
+        if len(scores) == 0:
+            return
+        self.results.append(scores)
+        self.bounds.append(np.zeros_like(scores) if bounds is None else bounds)
+        self.exact.append(np.full(len(scores), bounds is None))
+        self.evaluated += len(scores)
+        i = int(np.argmin(scores[self.objective]))
+        if self.best is None or scores[self.objective][i] < self.best[self.objective]:
+            self.best = scores[i].copy()
+            self.best_bound = 0.0 if bounds is None else float(bounds[self.objective][i])
+
+    def replace(self, scores, bounds, exact):
+        """Swap in promoted results; the best is taken among the exact rows (a mask)"""
+        self.results, self.bounds, self.exact = [scores], [bounds], [exact]
+        pool = scores[exact]
+        self.best = pool[int(np.argmin(pool[self.objective]))].copy() if len(pool) else None
+        self.best_bound = 0.0
+
+    def scored(self, exact=False):
+        """Every scored row, or only the exactly scored ones"""
+        if not self.results:
+            return np.zeros(0, SCORE_DTYPE)
+        scores = np.concatenate(self.results)
+        return scores[np.concatenate(self.exact)] if exact else scores
+
+    def minima(self, k, separation, exact=False):
+        """Up to k best directions at least separation radians apart"""
+        scores = self.scored(exact)
+        order = np.argsort(scores[self.objective], kind="stable")
+        chosen = []
+        min_cos = np.cos(separation)
+        for i in order:
+            d = scores["direction"][i]
+            if all(np.dot(d, c) < min_cos for c in chosen):
+                chosen.append(d)
+                if len(chosen) == k:
+                    break
+        return chosen
+
+    def pareto(self, objectives=OBJECTIVES, weights=None, limit=32):
+        """Non-dominated exactly scored rows, best weighted (or best objective) first"""
+        scores = self.scored(exact=True)
+        front = scores[pareto_front(scores, objectives)]
+        if weights:
+            front = front[rank_weighted(front, weights, objectives)]
+        else:
+            front = front[np.argsort(front[self.objective], kind="stable")]
+        return front[:limit]
+
+    def stages(self):
+        if self.candidates is not None:
+            yield "coarse", self.candidates
+        else:
+            directions = generate_orientations(self.coarse_samples, self.method, self.seed, self.symmetry)
+            if len(directions) == 0:
+                # Too few samples to survive symmetry reduction; score them all
+                directions = generate_orientations(self.coarse_samples, self.method, self.seed)
+            yield "coarse", directions
+        # Start at roughly twice the coarse sample spacing and halve each round
+        radius = 2.0 * np.sqrt(4 * np.pi / max(self.coarse_samples, 1))
+        for _ in range(self.rounds):
+            centers = self.minima(self.seeds, radius)
+            if not centers:
+                # Nothing scored (e.g. an empty candidate list); no minima to refine
+                return
+            yield "refine", np.vstack([cap_directions(c, radius, self.samples_per_seed, self.rng)
+                                       for c in centers])
+            radius *= 0.5
+
+
+# Upper bound on coarse sweep samples a client may request (each one is scored)
+MAX_SAMPLES = int(os.environ.get("MAX_SAMPLES", 1 << 16))
+
+
+def parse_weights(text):
+    """Objective weights from "support_volume=1,build_height=0.5"; ValueError if invalid"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {name}")
+        weights[name] = float(value) if value.strip() else 1.0
+    return weights
+
+
+def optimization_params(overhang_angle, objective, samples, sampling, weights, prune=False, lod=True):
+    """Validated search parameters (also the result cache key); ValueError if invalid.
+
+    overhang_angle must lie in (0, 90] degrees, samples in 1..MAX_SAMPLES
+    and sampling be one of analyzer.SAMPLING_METHODS.
+    """
+    if not 0 < overhang_angle <= 90:
+        raise ValueError("overhang_angle must be between 0 (exclusive) and 90 degrees")
+    if objective not in SCORE_DTYPE.names or objective == "direction":
+        raise ValueError(f"Unknown objective: {objective}")
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {sampling}")
+    return {
+        "overhang_angle": overhang_angle,
+        "objective": objective,
+        "samples": samples,
+        "sampling": sampling,
+        "weights": parse_weights(weights),
+        "prune": prune,
+        "lod": lod,
+    }
+
+
+def describe(score, objectives=OBJECTIVES):
+    """JSON-friendly record for one SCORE_DTYPE entry"""
+    return {
+        "direction": score["direction"].tolist(),
+        "orientation": list(direction_euler(score["direction"])),
+        "objectives": {name: float(score[name]) for name in objectives},
+    }
+
+
+def summarize(search, stage, started, iteration, iteration_time, best=None):
+    """JSON-friendly progress record for the best orientation so far (or the scored row best)"""
+    best = search.best if best is None else best
+    elapsed = time.perf_counter() - started
+    direction = best["direction"]
+    return {
+        "iteration": iteration,
+        "stage": stage,
+        "orientation": list(direction_euler(direction)),
+        "direction": direction.tolist(),
+        "support_volume": float(best["support_volume"]),
+        "overhang_area": float(best["overhang_area"]),
+        "contact_area": float(best["contact_area"]),
+        "build_height": float(best["build_height"]),
+        "downskin_area": float(best["downskin_area"]),
+        "error_bound": search.best_bound,
+        "evaluated": search.evaluated,
+        "elapsed": elapsed,
+        "iteration_time": iteration_time,
+        "candidates_per_second": search.evaluated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+async def promote(search, levels, features, score):
+    """Rescore, level by level, the candidates that may still beat the best.
+
+    search holds scores and their error bounds on the coarsest of levels
+    ((features, cos_radius) pairs from analyzer.feature_levels). A candidate
+    is promoted to the next finer level (features itself after the last)
+    while its objective minus its error bound is at most the lowest objective
+    plus bound, so the result is the one a full-resolution search of the same
+    candidates would pick. score(level, directions) returns (scores, bounds),
+    bounds None on exact features. Only the rows promoted to full resolution
+    are exact afterwards.
+
+    Returns the "lod" progress record: rows per level, candidates promoted
+    into each finer level and, per coarse level, the largest objective error
+    bound among the candidates scored on it.
+    """
+    objective = search.objective
+    scores = np.concatenate(search.results)
+    bounds = np.concatenate(search.bounds)
+    bound = bounds[objective].astype(np.float64)
+    at = np.zeros(len(scores), dtype=np.int64)
+    finer = levels[1:] + [(features, None)]
+    promoted = []
+    level_bounds = [float(bound.max())]
+    for i, (level, cos_radius) in enumerate(finer):
+        values = scores[objective]
+        keep = (at == i) & (values - bound <= (values + bound).min())
+        scores[keep], kept_bounds = await score((level, cos_radius), scores["direction"][keep])
+        if kept_bounds is None:
+            bounds[keep] = np.zeros(1, SCORE_DTYPE)
+        else:
+            bounds[keep] = kept_bounds
+            level_bounds.append(float(kept_bounds[objective].max()))
+        bound[keep] = bounds[objective][keep]
+        at[keep] = i + 1
+        search.evaluated += int(keep.sum())
+        promoted.append(int(keep.sum()))
+    search.replace(scores, bounds, at == len(finer))
+    return {
+        "rows": [len(level[0]) for level, _ in levels] + [len(features[0])],
+        "promoted": promoted,
+        "bounds": level_bounds,
+    }
+
+
+async def run_search(search, features, overhang_angle=45.0, executor=None,
+                     chunk_size=256, report=None, min_interval=0.1,
+                     rescore=None, rescore_top=8, weights=None, pareto_limit=32, levels=None):
+    """Drive an OrientationSearch on a process pool.
+
+    Every stage is split into chunks scored in parallel. report(progress) is
+    awaited with the best-so-far summary at most once per min_interval
+    seconds (and always after the last chunk). Cancelling the task cancels
+    the chunks that have not started yet.
+
+    If rescore (e.g. SupportRaycaster.score) is given and the objective is
+    support_volume, the rescore_top best distinct minima are re-evaluated
+    with it in a thread and the final result switches to the one with the
+    lowest rescored support volume; for other objectives only the best is
+    rescored. rescore(directions, overhang_angle) returns rows with
+    "direction" and "support_volume" for all or some of the directions (e.g.
+    raster.HeightMapScorer.rescore). Either way the result's scores are the
+    picked direction's own and its rescored row is reported under "support".
+
+    The final progress also lists the Pareto front over OBJECTIVES of every
+    evaluated direction (at most pareto_limit entries), ranked by weights
+    when given.
+
+    With levels (coarsened features from analyzer.feature_levels) the
+    stages are scored on the coarsest level, each candidate with its error
+    bound ("error_bound" of the best so far), and only candidates within
+    their bound of the best are promoted to finer ones (see promote); the
+    final progress reports this under "lod". Rescoring and the Pareto front
+    then use the exactly scored candidates only.
+    """
+    executor = executor or get_pool()
+    loop = asyncio.get_running_loop()
+    sweep = levels[0] if levels else (features, None)
+
+    async def score(level, directions):
+        futures = [loop.run_in_executor(executor, bounded_score_chunk, *level,
+                                        directions[i:i + chunk_size], overhang_angle)
+                   for i in range(0, len(directions), chunk_size)]
+        chunks = await asyncio.gather(*futures)
+        scores = np.concatenate([c[0] for c in chunks]) if chunks else np.zeros(0, SCORE_DTYPE)
+        if level[1] is None:
+            return scores, None
+        return scores, np.concatenate([c[1] for c in chunks]) if chunks else np.zeros(0, SCORE_DTYPE)
+
+    started = time.perf_counter()
+    last_report = 0.0
+    iteration = 0
+    stage = None
+    for stage, directions in search.stages():
+        queued = time.time()
+        futures = [loop.run_in_executor(executor, timed_score_chunk, *sweep,
+                                        directions[i:i + chunk_size], overhang_angle)
+                   for i in range(0, len(directions), chunk_size)]
+        submitted = time.perf_counter()
+        try:
+            for future in asyncio.as_completed(futures):
+                chunk_started, chunk_finished, scores, bounds = await future
+                metrics.QUEUE_WAIT_SECONDS.observe(max(chunk_started - queued, 0.0), "optimizer")
+                metrics.STAGE_SECONDS.observe(chunk_finished - chunk_started, "score_chunk")
+                iteration += 1
+                search.add(scores, bounds)
+                now = time.perf_counter()
+                if report is not None and now - last_report >= min_interval:
+                    last_report = now
+                    await report(summarize(search, stage, started, iteration, now - submitted))
+                submitted = now
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    lod = None
+    if levels and search.best is not None:
+        with metrics.span("promote"):
+            lod = await promote(search, levels, features, score)
+    best, support = None, None
+    if rescore is not None and search.best is not None:
+        candidates = np.array(search.minima(rescore_top, 1e-3, exact=True))
+        if search.objective != "support_volume":
+            # The rescore measures support volume only; keep the objective's best
+            candidates = candidates[:1]
+        with metrics.span("rescore"):
+            rescored = await loop.run_in_executor(None, rescore, candidates, overhang_angle)
+        pick = int(np.argmin(rescored["support_volume"]))
+        support = rescored[pick]
+        # Report the picked direction's own scores (the nearest exactly scored row)
+        scores = search.scored(exact=True)
+        best = scores[int(np.argmax(scores["direction"] @ support["direction"]))]
+    progress = summarize(search, stage, started, iteration, 0.0, best)
+    if lod is not None:
+        progress["lod"] = lod
+    if support is not None:
+        progress["support"] = {name: support[name].item() for name in support.dtype.names
+                               if name != "direction"}
+    if search.best is not None:
+        progress["pareto"] = [describe(score) for score in search.pareto(weights=weights,
+                                                                          limit=pareto_limit)]
+    metrics.CANDIDATES_PER_SECOND.observe(progress["candidates_per_second"])
+    progress["done"] = True
+    if report is not None:
+        await report(progress)
+    return progress
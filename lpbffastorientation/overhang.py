@@ -0,0 +1,161 @@
+# overhang.py
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from raster import scan_fragments
+
+
+class OverhangView:
+    """Per-orientation sort orders: any overhang angle is then a binary search.
+
+    Faces are sorted by build-space normal Z, so the faces with normal Z
+    below a threshold are a prefix of face_order. An adjacency edge joins two
+    overhang faces exactly when the larger normal Z of its faces is below the
+    threshold, so edges sorted by that key are a prefix as well.
+    """
+
+    def __init__(self, index, direction):
+        self.direction = direction
+        nz = index.normals @ direction
+        self.face_order = np.argsort(nz, kind="stable")
+        self.sorted_nz = nz[self.face_order]
+        edge_key = np.maximum(nz[index.adjacency[:, 0]], nz[index.adjacency[:, 1]])
+        self.edge_order = np.argsort(edge_key, kind="stable")
+        self.sorted_edge_key = edge_key[self.edge_order]
+        heights = index.vertices @ direction
+        self.z_min = heights.min() if len(heights) else 0.0
+        # Faces lying on the plate are printed on it and need no support
+        self.on_plate = heights[index.faces].max(axis=1) - self.z_min < index.epsilon
+        self.centroid_heights = heights[index.faces].mean(axis=1) - self.z_min
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.face_order, self.sorted_nz, self.edge_order,
+                                      self.sorted_edge_key, self.on_plate, self.centroid_heights))
+
+
+class OverhangIndex:
+    """Cached overhang classification and connectivity for one mesh.
+
+    The face adjacency graph is built once per mesh; sort orders are kept
+    for the max_views most recently used orientations, so scrubbing the
+    angle slider never re-sorts.
+    """
+
+    def __init__(self, mesh, max_views=4, adjacency=None):
+        self.vertices = np.asarray(mesh.vertices, dtype=np.float64)
+        self.faces = np.asarray(mesh.faces, dtype=np.int64)
+        self.normals = np.asarray(mesh.face_normals, dtype=np.float64)
+        self.areas = np.asarray(mesh.area_faces, dtype=np.float64)
+        self.centroids = np.asarray(mesh.triangles_center, dtype=np.float64)
+        # Precomputed face adjacency (e.g. from the disk cache) may be passed in
+        adjacency = np.asarray(mesh.face_adjacency if adjacency is None else adjacency, dtype=np.int64)
+        self.adjacency = adjacency.reshape(-1, 2)
+        size = np.ptp(self.vertices, axis=0).max() if len(self.vertices) else 1.0
+        self.epsilon = 1e-6 * max(size, 1e-9)
+        self.max_views = max_views
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.vertices, self.faces, self.normals, self.areas,
+                                      self.centroids, self.adjacency))
+
+    def view(self, direction):
+        """OverhangView for a build direction, from the cache when possible"""
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / np.linalg.norm(direction)
+        key = tuple(np.round(direction, 9))
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        view = OverhangView(self, direction)
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view
+
+    def classify(self, direction, overhang_angle=45.0):
+        """(overhang face indices, region label per face) for one orientation.
+
+        Faces are overhangs when their build-space normal Z is below
+        -cos(overhang_angle), as in analyzer.score_orientations; faces lying
+        on the plate are left out. Regions are connected components of the
+        overhang faces over shared edges, labelled 0..n-1 by size.
+        """
+        view = self.view(direction)
+        threshold = -np.cos(np.radians(overhang_angle))
+        count = int(np.searchsorted(view.sorted_nz, threshold, side="left"))
+        faces = view.face_order[:count]
+        faces = np.sort(faces[~view.on_plate[faces]])
+        if len(faces) == 0:
+            return faces, np.empty(0, dtype=np.int64)
+
+        edges = self.adjacency[view.edge_order[:int(np.searchsorted(view.sorted_edge_key, threshold,
+                                                                    side="left"))]]
+        # Relabel to 0..len(faces)-1; edges touching plate faces drop out
+        local = np.full(len(self.faces), -1, dtype=np.int64)
+        local[faces] = np.arange(len(faces))
+        a, b = local[edges[:, 0]], local[edges[:, 1]]
+        keep = (a >= 0) & (b >= 0)
+        graph = coo_matrix((np.ones(np.count_nonzero(keep), dtype=np.int8), (a[keep], b[keep])),
+                           shape=(len(faces), len(faces)))
+        _, labels = connected_components(graph, directed=False)
+        # Largest region first
+        sizes = np.bincount(labels)
+        rank = np.empty(len(sizes), dtype=np.int64)
+        rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+        return faces, rank[labels]
+
+    def anchors(self, rotation, faces, labels, spacing, max_cells=1 << 22):
+        """Support anchor points on an XY grid of the given spacing.
+
+        rotation maps the part to build coordinates as points @ rotation
+        (the GUI convention, build direction rotation[:, 2]), with the lowest
+        point of the part at z=0. The overhang faces are rasterized
+        (raster.scan_fragments) and, in every grid cell, each region's
+        fragments less than spacing apart in z form one layer with an anchor
+        at its lowest point, so regions stacked above others are anchored
+        too (as in SupportRaycaster.columns). Overhangs smaller than a cell
+        get one at their centroid. Returns (points (K, 3), region label per
+        point).
+        """
+        view = self.view(rotation[:, 2])
+        if len(faces) == 0:
+            return np.empty((0, 3)), np.empty(0, dtype=np.int64)
+        triangles = self.vertices[self.faces[faces]] @ rotation
+        triangles[:, :, 2] -= view.z_min
+        origin = triangles[:, :, :2].reshape(-1, 2).min(axis=0)
+        extent = np.ptp(triangles[:, :, :2].reshape(-1, 2), axis=0)
+        # Coarsen the grid rather than allocate more than max_cells
+        spacing = max(spacing, np.sqrt(np.prod(extent + spacing) / max_cells))
+        shape = tuple(np.ceil(extent / spacing).astype(int) + 1)
+        chunks = list(scan_fragments(triangles, spacing, origin, shape))
+        cell = np.concatenate([pixels for pixels, _, _ in chunks])
+        z = np.concatenate([depth for _, depth, _ in chunks])
+        region = labels[np.concatenate([tri for _, _, tri in chunks])]
+        order = np.lexsort((z, region, cell))
+        cell, z, region = cell[order], z[order], region[order]
+        # A new layer starts in a new cell or region, or after a gap of at least spacing
+        layer = np.r_[True, (cell[1:] != cell[:-1]) | (region[1:] != region[:-1])
+                      | (z[1:] - z[:-1] >= spacing)]
+        i, j = np.divmod(cell[layer], shape[1])
+        points = np.column_stack([origin[0] + (i + 0.5) * spacing, origin[1] + (j + 0.5) * spacing, z[layer]])
+        return points, region[layer]
+
+def encode_faces(faces, face_count, encoding="indices"):
+    """Face set as an index list or a base64 little-endian bitset"""
+    if encoding == "bitset":
+        mask = np.zeros(face_count, dtype=bool)
+        mask[faces] = True
+        return base64.b64encode(np.packbits(mask, bitorder="little").tobytes()).decode("ascii")
+    return faces.tolist()
@@ -0,0 +1,246 @@
+# raster.py
+import os
+
+import numpy as np
+
+from meshkernel import direction_matrix
+
+# Height-map estimate for one build direction
+RASTER_DTYPE = np.dtype([
+    ("direction", np.float64, (3,)),
+    ("support_volume", np.float64),
+    ("shadow_area", np.float64),
+    ("build_height", np.float64),
+    ("pitch", np.float64),
+])
+
+# Meshes with more faces are rescored on height maps instead of by ray casting
+RASTER_MIN_FACES = int(os.environ.get("RASTER_MIN_FACES", 1 << 20))
+# Candidates ranked on coarse maps before the best are rendered at full pitch
+RASTER_RESCORE_TOP = 32
+
+
+def _expand(counts):
+    """(owner, local index) pairs for a ragged range expansion"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, local
+
+
+def scan_fragments(triangles, pitch, origin, shape, max_pairs=1 << 22):
+    """(pixel, z, triangle) chunks of triangles scan-converted onto an XY grid.
+
+    triangles is (F, 3, 3) in build coordinates, origin the XY of the grid
+    corner and shape (nx, ny); pixel is the flat index i * ny + j. Triangles
+    are scan-converted row by row, so the work is proportional to the pixels
+    they actually cover, and every covered pixel centre yields one fragment
+    at the triangle's depth there. Triangles too small to cover a pixel
+    centre are splatted into the pixel under their centroid (their lowest
+    and highest z) so thin struts are not lost.
+    """
+    nx, ny = shape
+    # Pixel units: pixel (i, j) has its centre at (i, j)
+    xy = (triangles[:, :, :2] - origin) / pitch - 0.5
+    z = triangles[:, :, 2]
+    # Plane z = z0 + gx * (x - x0) + gy * (y - y0)
+    e1, e2 = xy[:, 1] - xy[:, 0], xy[:, 2] - xy[:, 0]
+    dz1, dz2 = z[:, 1] - z[:, 0], z[:, 2] - z[:, 0]
+    det = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+    flat = np.abs(det) < 1e-12
+    det[flat] = 1.0
+    gx = (dz1 * e2[:, 1] - dz2 * e1[:, 1]) / det
+    gy = (dz2 * e1[:, 0] - dz1 * e2[:, 0]) / det
+
+    row_lo = np.clip(np.ceil(xy[:, :, 1].min(axis=1)), 0, ny).astype(np.int64)
+    row_hi = np.clip(np.floor(xy[:, :, 1].max(axis=1)), -1, ny - 1).astype(np.int64)
+    rows = np.where(flat, 0, np.maximum(row_hi - row_lo + 1, 0))
+
+    # Scanline spans, in chunks of triangles so pair arrays stay bounded
+    cumulative = np.cumsum(rows)
+    start = 0
+    while start < len(rows):
+        done = cumulative[start - 1] if start else 0
+        stop = max(int(np.searchsorted(cumulative, done + max_pairs // 8, side="right")), start + 1)
+        tri = np.arange(start, stop)
+        start = stop
+        owner, local = _expand(rows[tri])
+        tri = tri[owner]
+        y = (row_lo[tri] + local).astype(np.float64)
+        # x where the row crosses each edge that spans it
+        a, b = xy[tri], np.roll(xy[tri], -1, axis=1)
+        ya, yb = a[:, :, 1], b[:, :, 1]
+        crosses = (np.minimum(ya, yb) <= y[:, None]) & (np.maximum(ya, yb) >= y[:, None]) & (ya != yb)
+        t = np.where(crosses, (y[:, None] - ya) / np.where(ya != yb, yb - ya, 1.0), 0.0)
+        x = a[:, :, 0] + t * (b[:, :, 0] - a[:, :, 0])
+        x_lo = np.ceil(np.where(crosses, x, np.inf).min(axis=1) - 1e-9)
+        x_hi = np.floor(np.where(crosses, x, -np.inf).max(axis=1) + 1e-9)
+        x_lo = np.clip(x_lo, 0, nx).astype(np.int64)
+        x_hi = np.clip(x_hi, -1, nx - 1).astype(np.int64)
+        span = np.maximum(x_hi - x_lo + 1, 0)
+
+        owner, local = _expand(span)
+        ids = tri[owner]
+        px = x_lo[owner] + local
+        py = y[owner]
+        depth = (z[ids, 0] + gx[ids] * (px - xy[ids, 0, 0]) + gy[ids] * (py - xy[ids, 0, 1]))
+        yield px * ny + py.astype(np.int64), depth, ids
+        covered = np.zeros(len(rows), dtype=bool)
+        covered[ids] = True
+        rows[tri[~covered[tri]]] = 0
+
+    # Splat triangles that cover no pixel centre at their centroid
+    small = np.flatnonzero(rows == 0)
+    if len(small):
+        centre = np.clip(np.rint(xy[small].mean(axis=1)).astype(np.int64), 0, [nx - 1, ny - 1])
+        pixels = centre[:, 0] * ny + centre[:, 1]
+        zs = z[small]
+        yield np.r_[pixels, pixels], np.r_[zs.min(axis=1), zs.max(axis=1)], np.r_[small, small]
+
+
+def depth_maps(triangles, pitch, origin, shape, face_ids=None, points=None, point_ids=None,
+               max_pairs=1 << 22):
+    """Orthographic min/max Z maps of triangles on an XY grid.
+
+    Triangles are rasterized with scan_fragments (same arguments). Extra
+    surface samples can be splatted directly via points. Returns (z_min,
+    z_max, face) where face is the id (face_ids / point_ids, default the
+    triangle index) that gave z_min, -1 for empty pixels.
+    """
+    nx, ny = shape
+    z_min = np.full(nx * ny, np.inf)
+    z_max = np.full(nx * ny, -np.inf)
+    face = np.full(nx * ny, -1, dtype=np.int64)
+
+    if face_ids is None:
+        face_ids = np.arange(len(triangles))
+
+    def merge(pixels, z, ids):
+        order = np.lexsort((z, pixels))
+        pixels, z, ids = pixels[order], z[order], ids[order]
+        first = np.r_[True, pixels[1:] != pixels[:-1]]
+        last = np.r_[pixels[1:] != pixels[:-1], True]
+        lower = z[first] < z_min[pixels[first]]
+        z_min[pixels[first][lower]] = z[first][lower]
+        face[pixels[first][lower]] = ids[first][lower]
+        np.maximum.at(z_max, pixels[last], z[last])
+
+    for pixels, z, tri in scan_fragments(triangles, pitch, origin, shape, max_pairs):
+        merge(pixels, z, face_ids[tri])
+
+    if points is not None and len(points):
+        centre = np.rint((points[:, :2] - origin) / pitch - 0.5).astype(np.int64)
+        centre = np.clip(centre, 0, [nx - 1, ny - 1])
+        merge(centre[:, 0] * ny + centre[:, 1], points[:, 2], point_ids)
+
+    return z_min.reshape(nx, ny), z_max.reshape(nx, ny), face.reshape(nx, ny)
+
+
+class HeightMapScorer:
+    """Support volume, shadowed area and build height from depth maps.
+
+    The rotated part is rendered from below onto an XY grid of the given
+    pitch (mm). A pixel needs support when its lowest surface is an
+    overhang face; the column runs from that surface to the plate.
+
+    Meshes with up to max_faces faces are scan-converted exactly. Larger
+    meshes (lattices, scans) scan-convert only faces of at least one pixel
+    and splat area-weighted surface samples, about four per pixel of
+    surface, for the rest. The per-direction cost then follows the grid
+    size rather than the triangle count.
+    """
+
+    def __init__(self, mesh, max_faces=50000, max_splats=1000000, seed=0):
+        vertices = np.asarray(mesh.vertices, dtype=np.float64)
+        faces = np.asarray(mesh.faces, dtype=np.int64)
+        areas = np.asarray(mesh.area_faces, dtype=np.float64)
+        self.normals = np.asarray(mesh.face_normals, dtype=np.float64)
+        try:
+            self.extremes = np.asarray(mesh.convex_hull.vertices, dtype=np.float64)
+        except Exception:
+            self.extremes = vertices
+        self.size = max(np.ptp(self.extremes, axis=0).max(), 1e-9) if len(self.extremes) else 1.0
+        self.max_faces = max_faces
+        self.total_area = areas.sum()
+
+        # Largest faces first, so faces covering at least a pixel are a prefix
+        self.face_ids = np.argsort(-areas, kind="stable")
+        self.face_areas = areas[self.face_ids]
+        self.triangles = vertices[faces[self.face_ids]]
+
+        self.points = np.empty((0, 3))
+        self.point_ids = np.empty(0, dtype=np.int64)
+        self.point_rank = np.empty(0, dtype=np.int64)
+        if len(areas) > max_faces:
+            # Area-weighted samples in random order: any prefix is uniform
+            rng = np.random.default_rng(seed)
+            rank = rng.choice(len(areas), size=max_splats, p=self.face_areas / self.total_area)
+            u, v = rng.random((2, max_splats))
+            flip = u + v > 1
+            u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+            tri = self.triangles[rank]
+            self.points = tri[:, 0] + u[:, None] * (tri[:, 1] - tri[:, 0]) + v[:, None] * (tri[:, 2] - tri[:, 0])
+            self.point_ids = self.face_ids[rank]
+            self.point_rank = rank
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.normals, self.extremes, self.face_ids, self.face_areas,
+                                      self.triangles, self.points, self.point_ids, self.point_rank))
+
+    def render(self, direction, pitch):
+        """(z_min, z_max, face, grid origin) for one build direction"""
+        rotation = direction_matrix(direction)
+        extremes = self.extremes @ rotation.T
+        origin = extremes[:, :2].min(axis=0)
+        z0 = extremes[:, 2].min()
+        shape = tuple(np.maximum(np.ceil(np.ptp(extremes[:, :2], axis=0) / pitch).astype(int), 1))
+
+        scanned = len(self.triangles)
+        points = point_ids = None
+        if scanned > self.max_faces:
+            scanned = min(int(np.searchsorted(-self.face_areas, -pitch ** 2, side="right")), self.max_faces)
+            count = min(len(self.points), int(4 * self.total_area / pitch ** 2))
+            keep = np.flatnonzero(self.point_rank[:count] >= scanned)
+            points = self.points[keep] @ rotation.T
+            points[:, 2] -= z0
+            point_ids = self.point_ids[keep]
+
+        triangles = self.triangles[:scanned] @ rotation.T
+        triangles[:, :, 2] -= z0
+        z_min, z_max, face = depth_maps(triangles, pitch, origin, shape, self.face_ids[:scanned],
+                                        points, point_ids)
+        return z_min, z_max, face, origin
+
+    def score(self, directions, pitch=None, overhang_angle=45.0, resolution=128):
+        """RASTER_DTYPE record per direction; pitch defaults to size / resolution"""
+        directions = np.atleast_2d(np.asarray(directions, dtype=np.float64))
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        pitch = pitch or self.size / resolution
+        threshold = -np.cos(np.radians(overhang_angle))
+        result = np.zeros(len(directions), dtype=RASTER_DTYPE)
+        result["direction"] = directions
+        result["pitch"] = pitch
+        for i, d in enumerate(directions):
+            z_min, z_max, face, _ = self.render(d, pitch)
+            covered = face >= 0
+            overhang = covered & (self.normals[np.maximum(face, 0)] @ d < threshold)
+            result[i]["support_volume"] = z_min[overhang].sum() * pitch ** 2
+            result[i]["shadow_area"] = np.count_nonzero(covered) * pitch ** 2
+            result[i]["build_height"] = z_max[covered].max() if covered.any() else 0.0
+        return result
+
+    def score_coarse_to_fine(self, directions, objective="support_volume", top_k=16,
+                             coarse_resolution=32, resolution=128, overhang_angle=45.0):
+        """The top_k directions by a coarse score, re-scored at full resolution.
+
+        Directions are ranked against each other at the coarse pitch only;
+        every returned row is at the full pitch, best first.
+        """
+        coarse = self.score(directions, overhang_angle=overhang_angle, resolution=coarse_resolution)
+        best = np.argsort(coarse[objective], kind="stable")[:top_k]
+        fine = self.score(coarse["direction"][best], overhang_angle=overhang_angle, resolution=resolution)
+        return fine[np.argsort(fine[objective], kind="stable")]
+
+    def rescore(self, directions, overhang_angle=45.0, top_k=8):
+        """run_search rescore: support volume of the top_k directions, coarse to fine"""
+        return self.score_coarse_to_fine(directions, top_k=top_k, overhang_angle=overhang_angle)
@@ -0,0 +1,269 @@
+# supports.py
+import os
+
+import numpy as np
+
+from ingest import write_3mf, write_stl
+from raster import scan_fragments
+
+# Ray-cast support estimate for one build direction
+RAY_SUPPORT_DTYPE = np.dtype([
+    ("direction", np.float64, (3,)),
+    ("support_volume", np.float64),
+    ("plate_volume", np.float64),
+    ("part_volume", np.float64),
+    ("plate_contact_area", np.float64),
+    ("part_contact_area", np.float64),
+    ("rays", np.int64),
+])
+
+# Support geometry: vertical box columns on an XY grid (one per overhang
+# layer in a cell), in build coordinates with the plate at z=0; radius is
+# the half width of the box
+SUPPORT_DTYPE = np.dtype([
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("z_bottom", "<f4"),
+    ("z_top", "<f4"),
+    ("radius", "<f4"),
+])
+
+# Unit column: corners at x, y = +/-1 and z = 0 (bottom) or 1 (top), outward triangles
+BOX_CORNERS = np.array([[x, y, z] for z in (0, 1) for y in (-1, 1) for x in (-1, 1)], dtype=np.float32)
+BOX_FACES = np.array([
+    [0, 2, 1], [1, 2, 3],  # bottom
+    [4, 5, 6], [5, 7, 6],  # top
+    [0, 1, 4], [1, 5, 4],
+    [1, 3, 5], [3, 7, 5],
+    [3, 2, 7], [2, 6, 7],
+    [2, 0, 6], [0, 4, 6],
+], dtype=np.uint32)
+
+
+def column_volume(columns):
+    """Total volume of SUPPORT_DTYPE box columns"""
+    heights = columns["z_top"].astype(np.float64) - columns["z_bottom"]
+    return float(np.sum((2.0 * columns["radius"].astype(np.float64)) ** 2 * heights))
+
+
+def column_mesh(columns):
+    """(vertices (8K, 3) float32, faces (12K, 3) int64) of the box columns, for export"""
+    corners = np.empty((len(columns), len(BOX_CORNERS), 3), dtype=np.float32)
+    radius = columns["radius"][:, None]
+    corners[:, :, 0] = columns["x"][:, None] + BOX_CORNERS[:, 0] * radius
+    corners[:, :, 1] = columns["y"][:, None] + BOX_CORNERS[:, 1] * radius
+    corners[:, :, 2] = np.where(BOX_CORNERS[:, 2] > 0, columns["z_top"][:, None], columns["z_bottom"][:, None])
+    offsets = np.arange(len(columns), dtype=np.int64)[:, None, None] * len(BOX_CORNERS)
+    faces = BOX_FACES.astype(np.int64)[None] + offsets
+    return corners.reshape(-1, 3), faces.reshape(-1, 3)
+
+
+# Export formats by file extension
+SUPPORT_WRITERS = {".stl": write_stl, ".3mf": write_3mf}
+
+
+def write_supports(path, columns):
+    """Export box columns as .stl or .3mf (by extension); ValueError otherwise"""
+    writer = SUPPORT_WRITERS.get(os.path.splitext(path)[1].lower())
+    if writer is None:
+        raise ValueError(f"Unsupported support export format: {path}")
+    writer(path, *column_mesh(columns))
+
+
+class SupportRaycaster:
+    """Support heights from downward rays cast against the part itself.
+
+    Sample points are spread over every face once (about max_points in
+    total, at least one per face) and the mesh's ray intersector (an
+    Embree/rtree BVH, built lazily by trimesh and cached on the mesh) is
+    reused for every orientation: rotating the part is the same as casting
+    along -direction in the original frame. A support column starts at each
+    sample on an overhang face and ends at the first surface below it
+    (part-to-part) or at the build plate (part-to-plate).
+    """
+
+    def __init__(self, mesh, max_points=100000, seed=0, samples=None):
+        self.mesh = mesh
+        self.intersector = mesh.ray
+        normals = np.asarray(mesh.face_normals, dtype=np.float64)
+        areas = np.asarray(mesh.area_faces, dtype=np.float64)
+
+        if samples is None:
+            triangles = np.asarray(mesh.triangles, dtype=np.float64)
+            spacing2 = max(areas.sum() / max(max_points, 1), 1e-12)
+            counts = np.maximum(np.rint(areas / spacing2).astype(np.int64), 1)
+            self.face_index = np.repeat(np.arange(len(areas)), counts)
+            # Uniform barycentric samples on each face
+            rng = np.random.default_rng(seed)
+            u, v = rng.random((2, len(self.face_index)))
+            flip = u + v > 1
+            u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+            tri = triangles[self.face_index]
+            self.points = tri[:, 0] + u[:, None] * (tri[:, 1] - tri[:, 0]) + v[:, None] * (tri[:, 2] - tri[:, 0])
+        else:
+            # (face_index, points) of an earlier instance, e.g. from the disk cache
+            self.face_index, self.points = samples
+            counts = np.bincount(self.face_index, minlength=len(areas))
+        self.point_normals = normals[self.face_index]
+        self.point_areas = (areas / counts)[self.face_index]
+
+        try:
+            self.extremes = np.asarray(mesh.convex_hull.vertices, dtype=np.float64)
+        except Exception:
+            self.extremes = np.asarray(mesh.vertices, dtype=np.float64)
+        self.epsilon = 1e-6 * max(np.ptp(self.extremes, axis=0).max(), 1e-9)
+
+    @classmethod
+    def cached(cls, mesh, disk, key, max_points=100000, seed=0):
+        """SupportRaycaster whose ray samples are kept in a DiskCache (or None) under key"""
+        name = f"ray_samples_{max_points}_{seed}"
+        arrays = disk.load_arrays(key, name) if disk is not None else None
+        samples = (arrays["face_index"], arrays["points"]) if arrays is not None else None
+        raycaster = cls(mesh, max_points, seed, samples=samples)
+        if disk is not None and arrays is None:
+            disk.save_arrays(key, name, {"face_index": raycaster.face_index, "points": raycaster.points})
+        return raycaster
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.points, self.point_normals, self.point_areas,
+                                      self.face_index, self.extremes))
+
+    def cast(self, direction, overhang_angle=45.0):
+        """Per-ray support columns for one build direction.
+
+        Returns a dict with the ray origins (original frame), projected area
+        per ray, column height and whether the column lands on the part.
+        """
+        return self._cast_many(np.atleast_2d(direction), overhang_angle)[0]
+
+    def score(self, directions, overhang_angle=45.0, max_rays=500000):
+        """RAY_SUPPORT_DTYPE record per direction, casting rays in large batches"""
+        directions = np.atleast_2d(np.asarray(directions, dtype=np.float64))
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        result = np.zeros(len(directions), dtype=RAY_SUPPORT_DTYPE)
+        threshold = -np.cos(np.radians(overhang_angle))
+        # Group directions so each intersector call gets about max_rays rays
+        per_direction = np.array([np.count_nonzero(self.point_normals @ d < threshold) for d in directions])
+        start = 0
+        while start < len(directions):
+            stop = start + 1
+            while stop < len(directions) and per_direction[start:stop + 1].sum() <= max_rays:
+                stop += 1
+            for i, columns in enumerate(self._cast_many(directions[start:stop], overhang_angle), start):
+                weights, heights, on_part = columns["weights"], columns["heights"], columns["on_part"]
+                result[i]["direction"] = columns["direction"]
+                result[i]["plate_volume"] = weights[~on_part] @ heights[~on_part]
+                result[i]["part_volume"] = weights[on_part] @ heights[on_part]
+                result[i]["support_volume"] = weights @ heights
+                result[i]["plate_contact_area"] = weights[~on_part].sum()
+                result[i]["part_contact_area"] = weights[on_part].sum()
+                result[i]["rays"] = len(weights)
+            start = stop
+        return result
+
+    def columns(self, rotation, overhang_angle=45.0, spacing=1.0, radius=None, max_cells=1 << 22):
+        """Merged support columns on an XY grid, as a SUPPORT_DTYPE array.
+
+        rotation maps the part to build coordinates as points @ rotation
+        (the GUI convention, build direction rotation[:, 2]); columns are in
+        those coordinates with the lowest point of the part at z=0. The
+        overhang faces are rasterized (raster.scan_fragments) and, in every
+        grid cell they cover, fragments less than spacing apart in z form
+        one overhang layer, however many faces fall in it. Each layer gets
+        a column from its lowest point down to the first surface below or
+        the plate, so stacked overhangs are all supported; columns of a cell
+        are only merged where their spans overlap. Memory and rendering
+        therefore scale with the overhang area over spacing^2 (times the
+        layers), not with the face count. radius defaults to half the
+        spacing (columns fill their cells).
+        """
+        rotation = np.asarray(rotation, dtype=np.float64)
+        direction = rotation[:, 2] / np.linalg.norm(rotation[:, 2])
+        radius = 0.5 * spacing if radius is None else radius
+        normals = np.asarray(self.mesh.face_normals, dtype=np.float64)
+        faces = np.flatnonzero(normals @ direction < -np.cos(np.radians(overhang_angle)))
+        z_min = (self.extremes @ direction).min() if len(self.extremes) else 0.0
+        triangles = np.asarray(self.mesh.triangles, dtype=np.float64)[faces] @ rotation
+        triangles[:, :, 2] -= z_min
+        # Faces lying on the plate are printed on it and need no support
+        triangles = triangles[triangles[:, :, 2].max(axis=1) >= self.epsilon]
+        if len(triangles) == 0:
+            return np.zeros(0, dtype=SUPPORT_DTYPE)
+
+        corners = triangles[:, :, :2].reshape(-1, 2)
+        origin, extent = corners.min(axis=0), np.ptp(corners, axis=0)
+        # Coarsen the grid rather than allocate more than max_cells
+        spacing = max(spacing, np.sqrt(np.prod(extent + spacing) / max_cells))
+        shape = tuple(np.ceil(extent / spacing).astype(int) + 1)
+        chunks = list(scan_fragments(triangles, spacing, origin, shape))
+        cell = np.concatenate([pixels for pixels, _, _ in chunks])
+        z = np.concatenate([depth for _, depth, _ in chunks])
+        order = np.lexsort((z, cell))
+        cell, z = cell[order], z[order]
+        # A new layer starts in a new cell or after a gap of at least spacing
+        layer = np.r_[True, (cell[1:] != cell[:-1]) | (z[1:] - z[:-1] >= spacing)]
+        cell, top = cell[layer], z[layer]
+        i, j = np.divmod(cell, shape[1])
+        tops = np.column_stack([origin[0] + (i + 0.5) * spacing, origin[1] + (j + 0.5) * spacing, top])
+        # Drop along -direction in the original frame; rotation is orthonormal
+        origins = (tops + [0.0, 0.0, z_min]) @ rotation.T
+        distance = self._drop(origins, np.repeat(-direction[None], len(origins), axis=0))
+        bottom = np.maximum(top - distance, 0.0)
+
+        # Merge the columns of a cell whose spans overlap (e.g. one ending on
+        # the overhang of the layer below); columns are sorted by cell, then z
+        span = top.max() + 1.0
+        rank = np.cumsum(np.r_[False, cell[1:] != cell[:-1]]) * span
+        reach = np.maximum.accumulate(top + rank) - rank
+        start = np.flatnonzero(np.r_[True, (cell[1:] != cell[:-1]) | (bottom[1:] > reach[:-1] + self.epsilon)])
+        columns = np.empty(len(start), dtype=SUPPORT_DTYPE)
+        columns["x"], columns["y"] = tops[start, 0], tops[start, 1]
+        columns["z_bottom"] = np.minimum.reduceat(bottom, start)
+        columns["z_top"] = np.maximum.reduceat(top, start)
+        columns["radius"] = radius
+        return columns
+
+    def _drop(self, origins, rays):
+        """Distance from each origin along its (unit) ray to the part, inf on a miss"""
+        hit_distance = np.full(len(origins), np.inf)
+        if len(origins):
+            # Start just below the surface so a ray does not hit its own face
+            offset = origins + rays * self.epsilon
+            _, index_ray, locations = self.intersector.intersects_id(
+                offset, rays, multiple_hits=False, return_locations=True)
+            if len(index_ray):
+                hit_distance[index_ray] = np.einsum("ij,ij->i", offset[index_ray] - locations,
+                                                    -rays[index_ray]) + self.epsilon
+        return hit_distance
+
+    def _cast_many(self, directions, overhang_angle):
+        threshold = -np.cos(np.radians(overhang_angle))
+        batches = []
+        for d in directions:
+            d = np.asarray(d, dtype=np.float64)
+            d = d / np.linalg.norm(d)
+            nz = self.point_normals @ d
+            selected = np.flatnonzero(nz < threshold)
+            batches.append((d, selected, self.point_areas[selected] * -nz[selected]))
+
+        origins = np.concatenate([self.points[s] for _, s, _ in batches]) if batches else np.empty((0, 3))
+        rays = np.concatenate([np.repeat(-d[None], len(s), axis=0) for d, s, _ in batches]) if batches else np.empty((0, 3))
+        hit_distance = self._drop(origins, rays)
+
+        columns = []
+        offset = 0
+        for d, selected, weights in batches:
+            points = self.points[selected]
+            distance = hit_distance[offset:offset + len(selected)]
+            offset += len(selected)
+            plate_height = points @ d - (self.extremes @ d).min()
+            on_part = distance < plate_height
+            columns.append({
+                "direction": d,
+                "points": points,
+                "weights": weights,
+                "heights": np.where(on_part, distance, plate_height),
+                "on_part": on_part,
+            })
+        return columns
@@ -0,0 +1,126 @@
+# synthetic.py
+import numpy as np
+
+from ingest import write_stl  # noqa: F401 (re-exported for the benchmarks)
+
+
+def _grid_faces(rows, columns, wrap=False):
+    """Two triangles per cell of a (rows + 1) x columns vertex grid"""
+    count = columns if wrap else columns - 1
+    i, j = np.meshgrid(np.arange(rows), np.arange(count), indexing="ij")
+    a = i * columns + j
+    b = i * columns + (j + 1) % columns
+    c, d = a + columns, b + columns
+    return np.concatenate([np.stack([a, b, d], -1).reshape(-1, 3),
+                           np.stack([a, d, c], -1).reshape(-1, 3)])
+
+
+def _box(size, origin, divisions):
+    """Closed box surface with each side split into divisions x divisions quads"""
+    t = np.linspace(0.0, 1.0, divisions + 1)
+    u, v = np.meshgrid(t, t, indexing="ij")
+    u, v = u.ravel(), v.ravel()
+    grid = _grid_faces(divisions, divisions + 1)
+    vertices, faces = [], []
+    for axis in range(3):
+        a, b = (axis + 1) % 3, (axis + 2) % 3
+        for side in (0.0, 1.0):
+            points = np.empty((len(u), 3))
+            points[:, axis] = side
+            points[:, a], points[:, b] = u, v
+            quad = grid[:, ::-1] if side else grid
+            faces.append(quad + sum(len(p) for p in vertices))
+            vertices.append(points)
+    return np.vstack(vertices) * size + origin, np.vstack(faces)
+
+
+def _combine(parts):
+    vertices, faces, offset = [], [], 0
+    for v, f in parts:
+        vertices.append(v)
+        faces.append(f + offset)
+        offset += len(v)
+    return np.vstack(vertices).astype(np.float32), np.vstack(faces).astype(np.int32)
+
+
+def tube(triangles, radius=10.0, inner=7.0, height=40.0):
+    """Thick-walled tube along Z (like basictube.stl)"""
+    # 4 * segments * rings triangles on the walls plus 4 * segments on the rims
+    segments = max(8, int(np.sqrt(triangles / 4)))
+    rings = max(1, int(round(triangles / (4 * segments))) - 1)
+    angle = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    z = np.linspace(0.0, height, rings + 1)
+    circle = np.column_stack([np.cos(angle), np.sin(angle)])
+
+    def wall(r):
+        points = np.empty((rings + 1, segments, 3))
+        points[:, :, :2] = r * circle
+        points[:, :, 2] = z[:, None]
+        return points.reshape(-1, 3)
+
+    outer_wall, inner_wall = wall(radius), wall(inner)
+    grid = _grid_faces(rings, segments, wrap=True)
+    rim = _grid_faces(1, segments, wrap=True)
+    # Rims join the outer and inner circles at the bottom and the top
+    top = np.vstack([outer_wall[-segments:], inner_wall[-segments:]])
+    bottom = np.vstack([inner_wall[:segments], outer_wall[:segments]])
+    return _combine([(outer_wall, grid), (inner_wall, grid[:, ::-1]), (top, rim), (bottom, rim)])
+
+
+def lattice(triangles, cell=5.0, radius=0.4):
+    """Cubic strut lattice: prisms along every edge of a k x k x k cell grid"""
+    # About 28 triangles per strut (8-sided prisms) and 3 k (k + 1)^2 struts
+    k = max(1, int(round((triangles / 84) ** (1 / 3))))
+    struts = 3 * k * (k + 1) ** 2
+    sides = max(3, int(round((triangles / struts + 4) / 4)))
+
+    angle = np.linspace(0, 2 * np.pi, sides, endpoint=False)
+    ring = np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+    template = np.zeros((2 * sides, 3))
+    template[:sides, :2] = ring
+    template[sides:, :2] = ring
+    template[sides:, 2] = cell
+    fan = np.column_stack([np.zeros(sides - 2, dtype=np.int64), np.arange(1, sides - 1),
+                           np.arange(2, sides)])
+    template_faces = np.vstack([_grid_faces(1, sides, wrap=True), fan[:, ::-1], fan + sides])
+
+    parts = []
+    for axis in range(3):
+        # Struts along axis start at every grid node with coordinate < k on that axis
+        ranges = [np.arange(k + 1)] * 3
+        ranges[axis] = np.arange(k)
+        starts = np.stack(np.meshgrid(*ranges, indexing="ij"), -1).reshape(-1, 3) * cell
+        # Rotate the Z-aligned template onto the axis by cycling coordinates
+        oriented = np.roll(template, axis + 1, axis=1)
+        vertices = (starts[:, None, :] + oriented[None]).reshape(-1, 3)
+        faces = (template_faces[None] + (np.arange(len(starts)) * len(template))[:, None, None]).reshape(-1, 3)
+        parts.append((vertices, faces))
+    return _combine(parts)
+
+
+def bracket(triangles, width=30.0, thickness=4.0, height=40.0, depth=25.0):
+    """Overhang-heavy L-bracket: wall, cantilevered shelf and a 45 degree gusset"""
+    # Three boxes of 12 * divisions^2 triangles each
+    divisions = max(1, int(round(np.sqrt(triangles / 36))))
+    wall = _box(np.array([width, thickness, height]), np.zeros(3), divisions)
+    shelf = _box(np.array([width, depth, thickness]), np.array([0.0, thickness, height - thickness]),
+                 divisions)
+    gusset_vertices, gusset_faces = _box(np.array([thickness, depth * np.sqrt(2), thickness]),
+                                         np.zeros(3), divisions)
+    # Tilt the gusset 45 degrees about X so it runs from the wall up to the shelf
+    c = s = np.sqrt(0.5)
+    rotation = np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+    gusset_vertices = gusset_vertices @ rotation.T + np.array([(width - thickness) / 2, thickness,
+                                                              height - thickness - depth])
+    return _combine([wall, shelf, (gusset_vertices, gusset_faces)])
+
+
+KINDS = {"tube": tube, "lattice": lattice, "bracket": bracket}
+
+
+def generate(kind, triangles):
+    """Deterministic (vertices float32, faces int32) of roughly the given size"""
+    try:
+        return KINDS[kind](triangles)
+    except KeyError:
+        raise ValueError(f"Unknown mesh kind: {kind}") from None
@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The modules import each other by bare name, as when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+# test_analyzer.py
+import numpy as np
+import pytest
+import trimesh
+
+from analyzer import (OBJECTIVES, SCORE_DTYPE, canonical_mask, face_features, generate_orientations,
+                      pareto_front, score_orientations, shortlist, symmetry_group)
+
+
+def reference_scores(mesh, direction, overhang_angle):
+    """score_orientations' fields for one direction, face by face"""
+    d = direction / np.linalg.norm(direction)
+    z_min = (mesh.vertices @ d).min()
+    totals = dict.fromkeys(("overhang_area", "contact_area", "support_volume", "downskin_area"), 0.0)
+    for normal, area, center in zip(mesh.face_normals, mesh.area_faces, mesh.triangles_center):
+        nz = normal @ d
+        if nz < 0:
+            totals["downskin_area"] += area
+        if nz < -np.cos(np.radians(overhang_angle)):
+            totals["overhang_area"] += area
+            totals["contact_area"] += area * -nz
+            totals["support_volume"] += area * -nz * (center @ d - z_min)
+    totals["build_height"] = np.ptp(mesh.vertices @ d)
+    return totals
+
+
+@pytest.fixture(scope="module")
+def part():
+    # Flat faces sharing normals (merged feature rows) and a curved, offset region
+    box = trimesh.creation.box((30.0, 20.0, 10.0))
+    sphere = trimesh.creation.icosphere(subdivisions=2, radius=6.0)
+    sphere.apply_translation((20.0, 5.0, 12.0))
+    return trimesh.util.concatenate([box, sphere])
+
+
+@pytest.mark.parametrize("overhang_angle", [30.0, 45.0, 60.0])
+def test_scores_match_per_face_reference(part, overhang_angle):
+    directions = generate_orientations(64, method="random", seed=1)
+    scores = score_orientations(part, directions, overhang_angle, face_chunk=100, direction_chunk=16)
+    for row, direction in zip(scores, directions):
+        expected = reference_scores(part, direction, overhang_angle)
+        for name, value in expected.items():
+            assert row[name] == pytest.approx(value, rel=1e-4, abs=1e-3), name
+
+
+def test_features_are_reusable(part):
+    directions = generate_orientations(32)
+    features = face_features(part)
+    assert len(features[0]) < len(part.faces)
+    np.testing.assert_array_equal(score_orientations(part, directions),
+                                  score_orientations(None, directions, features=features))
+
+
+def brute_force_front(values):
+    return {i for i, v in enumerate(values)
+            if not any(np.all(w <= v) and np.any(w < v) for w in values)}
+
+
+def test_pareto_front_matches_brute_force():
+    rng = np.random.default_rng(0)
+    scores = np.zeros(300, dtype=SCORE_DTYPE)
+    for name in OBJECTIVES:
+        # Few distinct values, so ties and duplicates occur
+        scores[name] = rng.integers(0, 6, len(scores))
+    values = np.column_stack([scores[name] for name in OBJECTIVES])
+    front = pareto_front(scores)
+    # Of identical rows only the first is kept
+    unique_front = {tuple(values[i]) for i in brute_force_front(values)}
+    assert {tuple(values[i]) for i in front} == unique_front
+    assert len(front) == len(unique_front)
+
+
+def test_pareto_front_objectives_subset():
+    scores = np.zeros(4, dtype=SCORE_DTYPE)
+    scores["support_volume"] = [3.0, 1.0, 2.0, 1.0]
+    scores["build_height"] = [1.0, 3.0, 2.0, 4.0]
+    front = pareto_front(scores, ("support_volume", "build_height"))
+    assert sorted(front.tolist()) == [0, 1, 2]
+    assert pareto_front(scores[:0]).tolist() == []
+
+
+def test_shortlisted_poses_are_canonical():
+    # A box is symmetric under the mirror planes, so most poses have several images
+    box = trimesh.creation.box((30.0, 20.0, 10.0))
+    symmetry = symmetry_group(box)
+    assert len(symmetry) > 1
+    candidates = shortlist(box, keep=8, global_samples=8, bound_samples=64, symmetry=symmetry)
+    assert canonical_mask(candidates, symmetry, eps=1e-6).all()
@@ -0,0 +1,67 @@
+# test_app.py
+import json
+
+import pytest
+import trimesh
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def server():
+    # The app opens its disk cache on import; keep tests off the user's cache
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DISK_CACHE", "0")
+        import app
+    return app
+
+
+@pytest.fixture(scope="module")
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def mesh_id(client):
+    data = trimesh.creation.box((20.0, 10.0, 5.0)).export(file_type="stl")
+    response = client.post("/upload_stl", files={"file": ("box.stl", data)})
+    assert response.status_code == 200
+    return response.json()["mesh_id"]
+
+
+def optimize(client, mesh_id, query="", message=None):
+    with client.websocket_connect(f"/ws/optimize_orientation/{mesh_id}?samples=64{query}") as websocket:
+        if message is not None:
+            websocket.send_text(message)
+        while True:
+            progress = websocket.receive_json()
+            if "error" in progress or progress.get("done"):
+                return progress
+
+
+def test_client_messages_do_not_cancel_the_search(client, mesh_id):
+    progress = optimize(client, mesh_id, message="ping")
+    assert progress["done"] and progress["evaluated"] > 0
+
+
+@pytest.mark.parametrize("angle", ["nan", "0", "91"])
+def test_bad_overhang_angle_is_rejected(client, mesh_id, angle):
+    assert "overhang_angle" in optimize(client, mesh_id, f"&overhang_angle={angle}")["error"]
+
+
+def test_failed_search_reports_an_error(server, client, mesh_id, monkeypatch):
+    async def broken(entry, params, executor, report=None):
+        raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(server, "optimize_entry", broken)
+    assert optimize(client, mesh_id) == {"error": "scoring failed"}
+
+
+def test_batch_optimizes_a_repeated_part_once(client):
+    data = trimesh.creation.cylinder(radius=5.0, height=20.0).export(file_type="stl")
+    files = [("files", ("a.stl", data)), ("files", ("b.stl", data))]
+    response = client.post("/optimize_batch?samples=64", files=files)
+    assert response.status_code == 200
+    *parts, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert summary["done"] and summary["failed"] == 0 and summary["cached"] == 1
+    assert parts[0]["result"] == parts[1]["result"]
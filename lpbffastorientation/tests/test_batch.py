@@ -0,0 +1,108 @@
+# test_batch.py
+import asyncio
+import threading
+
+import pytest
+
+from batch import ResultCache, as_completed, result_key
+
+
+class RecordingDisk:
+    """DiskCache stand-in that records which thread touches it"""
+
+    def __init__(self, stored=None):
+        self.stored = dict(stored or {})
+        self.threads = set()
+
+    def load_json(self, key, name):
+        self.threads.add(threading.get_ident())
+        return self.stored.get((key, name))
+
+    def save_json(self, key, name, value):
+        self.threads.add(threading.get_ident())
+        self.stored[key, name] = value
+
+
+class Calls:
+    def __init__(self):
+        self.computed = self.released = 0
+
+    async def compute(self, delay=0.01):
+        self.computed += 1
+        await asyncio.sleep(delay)
+        return {"best": 1}
+
+    def release(self):
+        self.released += 1
+
+
+KEY = result_key("mesh", {"samples": 64})
+
+
+def test_disk_io_stays_off_the_event_loop():
+    async def run():
+        disk = RecordingDisk()
+        calls = Calls()
+        first = await ResultCache(disk=disk).get_or_compute(KEY, calls.compute, calls.release)
+        # A fresh cache (e.g. after a restart) finds it on disk
+        second = await ResultCache(disk=disk).get_or_compute(KEY, calls.compute, calls.release)
+        return disk, calls, first, second, threading.get_ident()
+
+    disk, calls, first, second, loop_thread = asyncio.run(run())
+    assert first == ({"best": 1}, False) and second == ({"best": 1}, True)
+    assert (calls.computed, calls.released) == (1, 1)
+    assert disk.threads and loop_thread not in disk.threads
+
+
+def test_concurrent_requests_share_one_computation():
+    async def run():
+        cache = ResultCache()
+        calls = Calls()
+        results = await asyncio.gather(*(cache.get_or_compute(KEY, calls.compute, calls.release)
+                                         for _ in range(3)))
+        again = await cache.get_or_compute(KEY, calls.compute, calls.release)
+        return cache, calls, results, again
+
+    cache, calls, results, again = asyncio.run(run())
+    assert [cached for _, cached in results] == [False, True, True] and again[1]
+    assert (calls.computed, calls.released) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cancelled_caller_still_caches_the_result():
+    async def run():
+        cache = ResultCache(disk=RecordingDisk())
+        calls = Calls()
+        caller = asyncio.ensure_future(cache.get_or_compute(KEY, lambda: calls.compute(delay=0.05),
+                                                            calls.release))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.1)
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert (calls.computed, calls.released) == (1, 0)
+    assert cache.get(KEY) == {"best": 1}
+
+
+def test_as_completed_cancels_the_rest_when_closed():
+    async def run():
+        slow = asyncio.Event()
+
+        async def part(delay):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                slow.set()
+                raise
+            return delay
+
+        results = as_completed([part(0.0), part(10.0)])
+        first = await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0)
+        return first, slow.is_set()
+
+    assert asyncio.run(run()) == (0.0, True)
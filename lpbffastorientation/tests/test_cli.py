@@ -0,0 +1,81 @@
+# test_cli.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import trimesh
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+
+
+def run_cli(*args, cache, **env):
+    env = dict(os.environ, DISK_CACHE="1", DISK_CACHE_DIR=str(cache), OMP_NUM_THREADS="1",
+               **env)
+    return subprocess.run([sys.executable, CLI, *map(str, args), "--jobs", "2", "--samples", "64"],
+                          capture_output=True, text=True, env=env, timeout=300)
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def parts(tmp_path):
+    folder = tmp_path / "parts"
+    (folder / "nested").mkdir(parents=True)
+    trimesh.creation.box((20.0, 10.0, 5.0)).export(str(folder / "box.stl"))
+    trimesh.creation.cylinder(radius=5.0, height=20.0).export(str(folder / "nested" / "cylinder.stl"))
+    return folder
+
+
+def test_resume_skips_finished_parts(tmp_path, parts):
+    out = tmp_path / "results.jsonl"
+    box, cylinder = str(parts / "box.stl"), str(parts / "nested" / "cylinder.stl")
+    first = run_cli(parts / "box.stl", "--out", out, cache=tmp_path / "cache")
+    assert first.returncode == 0, first.stderr
+    [record] = read_records(out)
+    assert record["path"] == box and record["result"]["done"]
+
+    # A run killed mid-write leaves a partial line; the next one starts on a fresh line
+    with open(out, "a") as f:
+        f.write('{"path": "' + cylinder)
+    resumed = run_cli(parts, "--out", out, "--resume", cache=tmp_path / "cache")
+    assert resumed.returncode == 0, resumed.stderr
+    assert "1 parts done, 1 left" in resumed.stderr
+    with open(out) as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[0]) == record
+    assert json.loads(lines[2])["path"] == cylinder and "result" in json.loads(lines[2])
+
+    again = run_cli(parts, "--out", out, "--resume", cache=tmp_path / "cache")
+    assert again.returncode == 0 and "2 parts done, 0 left" in again.stderr
+    with open(out) as f:
+        assert f.read().splitlines() == lines
+
+
+def test_results_are_cached_across_runs(tmp_path, parts):
+    cold = run_cli(parts, "--out", tmp_path / "cold.jsonl", cache=tmp_path / "cache")
+    warm = run_cli(parts, "--out", tmp_path / "warm.jsonl", cache=tmp_path / "cache")
+    assert cold.returncode == warm.returncode == 0, cold.stderr + warm.stderr
+    cold_records = {r["path"]: r for r in read_records(tmp_path / "cold.jsonl")}
+    warm_records = {r["path"]: r for r in read_records(tmp_path / "warm.jsonl")}
+    assert len(cold_records) == 2 and cold_records.keys() == warm_records.keys()
+    for path, record in warm_records.items():
+        assert record["cached"] and not cold_records[path]["cached"]
+        assert record["result"] == cold_records[path]["result"]
+
+
+def test_resume_requires_out(tmp_path, parts):
+    result = run_cli(parts, "--resume", cache=tmp_path / "cache")
+    assert result.returncode == 2 and "--resume requires --out" in result.stderr
+
+
+def test_large_meshes_are_rescored_on_height_maps(tmp_path, parts):
+    out = tmp_path / "results.jsonl"
+    result = run_cli(parts / "box.stl", "--out", out, cache=tmp_path / "cache", RASTER_MIN_FACES="0")
+    assert result.returncode == 0, result.stderr
+    [record] = read_records(out)
+    assert record["result"]["support"]["pitch"] > 0 and "height_maps" in record["timings"]
@@ -0,0 +1,48 @@
+# test_diskcache.py
+import os
+
+import numpy as np
+
+from diskcache import DiskCache, _tree_size
+
+# 1152 bytes on disk with the .npy header
+KB = np.zeros(1024, dtype=np.uint8)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=3500)
+    for key in ("aa1", "bb2", "cc3"):
+        cache.save_arrays(key, "data", {"x": KB})
+    assert cache.load_arrays("aa1", "data") is not None
+    cache.save_arrays("dd4", "data", {"x": KB})
+    # bb2 was the least recently used once aa1 was read
+    assert cache.load_arrays("bb2", "data") is None
+    assert all(cache.load_arrays(key, "data") is not None for key in ("aa1", "cc3", "dd4"))
+    assert cache.total_bytes == _tree_size(cache.root) <= cache.max_bytes
+
+
+def test_size_survives_reopening(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.save_arrays("aa1", "data", {"x": KB})
+    cache.save_json("aa1", "result", {"best": 1})
+    assert DiskCache(tmp_path).total_bytes == cache.total_bytes == _tree_size(cache.root)
+
+
+def test_path_index_files_are_evicted(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=2300)
+    part = tmp_path / "part.stl"
+    part.write_bytes(b"solid part")
+    key = cache.file_key(str(part))
+    assert cache.file_key(str(part)) == key and len(os.listdir(os.path.join(cache.root, "paths"))) == 1
+    for other in ("aa1", "bb2"):
+        cache.save_arrays(other, "data", {"x": KB})
+    assert os.listdir(os.path.join(cache.root, "paths")) == []
+    assert cache.total_bytes == _tree_size(cache.root)
+
+
+def test_resaving_replaces_the_old_size(tmp_path):
+    cache = DiskCache(tmp_path)
+    for best in range(20):
+        cache.save_json("aa1", "result", {"best": best, "pad": "x" * (100 - best)})
+    assert cache.load_json("aa1", "result")["best"] == 19
+    assert cache.total_bytes == _tree_size(cache.root)
@@ -0,0 +1,47 @@
+# test_ingest.py
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from ingest import BodyLimitMiddleware
+
+
+def make_client():
+    app = FastAPI()
+    received = []
+
+    @app.post("/upload")
+    @app.post("/batch")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            received.append(len(chunk))
+        return {"bytes": size}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=100, limits={"/batch": 1000})
+    return TestClient(app), received
+
+
+def test_within_limit():
+    client, _ = make_client()
+    assert client.post("/upload", content=b"x" * 100).json() == {"bytes": 100}
+    assert client.post("/batch", content=b"x" * 500).json() == {"bytes": 500}
+
+
+def test_content_length_rejected_before_reading():
+    client, received = make_client()
+    response = client.post("/upload", content=b"x" * 101)
+    assert response.status_code == 413 and "100 bytes" in response.json()["error"]
+    assert received == []
+
+
+def test_streamed_body_stops_at_limit():
+    client, received = make_client()
+
+    def chunks():
+        for _ in range(50):
+            yield b"x" * 40
+
+    response = client.post("/upload", content=chunks())
+    assert response.status_code == 413
+    assert sum(received) <= 100
@@ -0,0 +1,45 @@
+# test_materials.py
+import numpy as np
+import pytest
+
+from materials import IACS_MS_PER_M, parse_composition, parse_range
+
+
+@pytest.mark.parametrize("text, unit, expected", [
+    ("270 MPa", "MPa", (270.0, 270.0)),
+    ("6-10", None, (6.0, 10.0)),
+    ("10–6 %", "%", (6.0, 10.0)),
+    ("~8.9 g/cm³", "g/cm³", (8.9, 8.9)),
+    ("≥14.6 MS/m", "MS/m", (14.6, np.inf)),
+    ("≤0.55", None, (0.0, 0.55)),
+    ("100 % IACS", "MS/m", (IACS_MS_PER_M, IACS_MS_PER_M)),
+    ("320 HV (150 HB)", "HV", (320.0, 320.0)),
+])
+def test_parse_range(text, unit, expected):
+    assert parse_range(text, unit) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text, unit", [(None, None), ("n/a", None), ("150 HB", "HV")])
+def test_parse_range_without_value(text, unit):
+    assert np.isnan(parse_range(text, unit)).all()
+
+
+def test_parse_composition_balance():
+    bounds = parse_composition("Al balance, 9–11% Si, ≤0.55% Fe, impurities <0.15%")
+    assert bounds["Si"] == (9.0, 11.0)
+    assert bounds["Fe"] == (0.0, 0.55)
+    assert bounds["Al"] == pytest.approx((88.45, 91.0))
+    assert set(bounds) == {"Al", "Si", "Fe"}
+
+
+def test_parse_composition_shared_value():
+    bounds = parse_composition("Ni balance, 4.75-5.5% Nb+Ta, 17-21% Cr")
+    assert bounds["Nb"] == bounds["Ta"] == pytest.approx((2.375, 2.75))
+    assert bounds["Ni"] == pytest.approx((73.5, 78.25))
+
+
+def test_parse_composition_each():
+    assert parse_composition("~25% each of Co, Cr, minor Cu") == {"Co": (25.0, 25.0), "Cr": (25.0, 25.0)}
+    # A part with its own value ends the list
+    bounds = parse_composition("~20% each of Co and Cr, Mo, 5% Fe, W")
+    assert bounds == {"Co": (20.0, 20.0), "Cr": (20.0, 20.0), "Mo": (20.0, 20.0), "Fe": (5.0, 5.0)}
@@ -0,0 +1,71 @@
+# test_meshstore.py
+import numpy as np
+import trimesh
+
+from meshstore import MeshEntry, MeshStore, content_hash
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def box_entry(mesh_id):
+    return MeshEntry(mesh_id, trimesh.creation.box())
+
+
+def test_get_or_load_dedups_by_content():
+    store = MeshStore()
+    parsed = []
+
+    def parse(data):
+        parsed.append(data)
+        return trimesh.creation.box()
+
+    entry, cached = store.get_or_load(b"solid a", parse)
+    again, cached_again = store.get_or_load(b"solid a", parse)
+    assert (cached, cached_again) == (False, True)
+    assert again is entry and entry.mesh_id == content_hash(b"solid a")
+    assert len(parsed) == 1
+
+
+def test_lru_eviction_keeps_budget():
+    size = box_entry("size").nbytes
+    store = MeshStore(max_bytes=int(2.5 * size))
+    for mesh_id in "abc":
+        store.put(mesh_id, box_entry(mesh_id))
+    assert "a" not in store and store.evictions == 1
+    # Touching b makes c the least recently used
+    assert store.get("b") is not None
+    store.put("d", box_entry("d"))
+    assert "c" not in store and "b" in store and "d" in store
+    assert store.total_bytes == 2 * size <= store.max_bytes
+
+
+def test_derived_data_counts_towards_budget():
+    size = box_entry("size").nbytes
+    store = MeshStore(max_bytes=int(2.5 * size))
+    store.put("a", box_entry("a"))
+    entry = store.put("b", box_entry("b"))
+    entry.cached("big", lambda: np.zeros(size // 8 + 1))
+    assert "a" not in store and "b" in store
+    assert store.total_bytes == entry.nbytes
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    store = MeshStore(ttl=10.0, clock=clock)
+    store.put("a", box_entry("a"))
+    clock.now = 5.0
+    store.put("b", box_entry("b"))
+    clock.now = 12.0
+    assert store.get("a") is None
+    assert store.get("b") is not None
+    # Expired entries are also dropped when another one is added
+    clock.now = 30.0
+    store.put("c", box_entry("c"))
+    assert "b" not in store and len(store) == 1
+    assert store.stats()["evictions"] == 2
@@ -0,0 +1,84 @@
+# test_optimizer.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import trimesh
+
+from analyzer import (coarsen_features, face_features, feature_levels, generate_orientations, score_bounds,
+                      score_orientations)
+from optimizer import OrientationSearch, optimization_params, run_search
+
+FIELDS = ("overhang_area", "contact_area", "support_volume", "downskin_area")
+
+
+@pytest.fixture(scope="module")
+def features():
+    # A scanned-looking, elongated part: a normal per face
+    mesh = trimesh.creation.icosphere(subdivisions=4, radius=10.0)
+    rng = np.random.default_rng(0)
+    noise = rng.uniform(0.9, 1.1, (len(mesh.vertices), 1))
+    mesh.vertices = mesh.vertices * noise * (3.0, 1.0, 0.5) + (5.0, -3.0, 20.0)
+    return face_features(mesh)
+
+
+@pytest.mark.parametrize("rows", [50, 400])
+def test_score_bounds_cover_coarsening_error(features, rows):
+    level, cos_radius = coarsen_features(features, rows)
+    assert len(level[0]) < len(features[0])
+    directions = generate_orientations(200, method="random", seed=2)
+    for angle in (30.0, 45.0):
+        exact = score_orientations(None, directions, angle, features=features)
+        coarse = score_orientations(None, directions, angle, features=level)
+        bounds = score_bounds(level, cos_radius, directions, angle)
+        for name in FIELDS:
+            error = np.abs(coarse[name] - exact[name])
+            assert np.all(error <= bounds[name] + 1e-3 * (1 + np.abs(exact[name]))), name
+
+
+def test_promote_picks_the_exact_best(features):
+    levels = feature_levels(features, min_rows=50)
+    assert len(levels) == 2
+    search = OrientationSearch(coarse_samples=256, rounds=2)
+    with ThreadPoolExecutor(2) as executor:
+        progress = asyncio.run(run_search(search, features, executor=executor, levels=levels))
+
+    assert progress["lod"]["rows"] == [len(level[0]) for level, _ in levels] + [len(features[0])]
+    scores = search.scored()
+    exact = score_orientations(None, scores["direction"], features=features)
+    # Same pick as scoring every candidate at full resolution
+    assert search.best["support_volume"] == pytest.approx(exact["support_volume"].min(), rel=1e-6)
+    assert progress["support_volume"] == pytest.approx(exact["support_volume"].min(), rel=1e-6)
+    # Rows marked exact carry full-resolution scores, and the Pareto front only uses those
+    rows = np.concatenate(search.exact)
+    assert 0 < rows.sum() < len(rows)
+    np.testing.assert_allclose(scores["support_volume"][rows], exact["support_volume"][rows], rtol=1e-6)
+    exact_directions = {tuple(d) for d in scores["direction"][rows]}
+    assert all(tuple(entry["direction"]) in exact_directions for entry in progress["pareto"])
+
+
+@pytest.mark.parametrize("samples, sampling", [(0, "fibonacci"), (1 << 30, "fibonacci"), (64, "grid")])
+def test_optimization_params_rejects_bad_sampling(samples, sampling):
+    with pytest.raises(ValueError):
+        optimization_params(45.0, "support_volume", samples, sampling, "")
+
+
+
+@pytest.mark.parametrize("objective", ["support_volume", "build_height"])
+def test_rescored_result_reports_its_own_scores(features, objective):
+    def rescore(directions, overhang_angle):
+        # Disagrees with the moment scores: the last candidate wins
+        scores = score_orientations(None, directions, overhang_angle, features=features)
+        scores["support_volume"] = np.arange(len(directions), 0, -1)
+        return scores
+
+    search = OrientationSearch(objective=objective, coarse_samples=128, rounds=1)
+    with ThreadPoolExecutor(2) as executor:
+        progress = asyncio.run(run_search(search, features, executor=executor, rescore=rescore))
+    [own] = score_orientations(None, [progress["direction"]], features=features)
+    for name in ("support_volume", "build_height", "downskin_area", "contact_area"):
+        assert progress[name] == pytest.approx(float(own[name]), rel=1e-5), name
+    assert progress["support"]["support_volume"] == 1
+    # Only a support volume search switches to the rescored minimum
+    assert (progress["direction"] == search.best["direction"].tolist()) == (objective == "build_height")
@@ -0,0 +1,50 @@
+# test_overhang.py
+import numpy as np
+import pytest
+import trimesh
+
+from overhang import OverhangIndex, encode_faces
+
+
+def boxes(*bounds):
+    return trimesh.util.concatenate([trimesh.creation.box(bounds=b) for b in bounds])
+
+
+@pytest.fixture(scope="module")
+def shelves():
+    # Two 10 x 10 shelves stacked over the plate, which a small post touches
+    return OverhangIndex(boxes(((20, 0, 0), (21, 1, 1)), ((0, 0, 5), (10, 10, 6)), ((0, 0, 10), (10, 10, 11))))
+
+
+def test_classify_leaves_out_plate_faces(shelves):
+    faces, labels = shelves.classify((0, 0, 1))
+    # Two triangles under each shelf; the post's bottom lies on the plate
+    assert len(faces) == 4 and sorted(np.bincount(labels)) == [2, 2]
+    assert np.all(shelves.normals[faces, 2] < 0)
+    assert shelves.classify((0, 0, 1), overhang_angle=0.0)[0].size == 0
+
+
+def test_stacked_regions_each_get_anchors(shelves):
+    faces, labels = shelves.classify((0, 0, 1))
+    points, regions = shelves.anchors(np.eye(3), faces, labels, 1.0)
+    # Each shelf's region is anchored in all of its cells, at its own height
+    heights = sorted(np.unique(np.round(points[regions == region, 2], 6)).tolist() for region in (0, 1))
+    assert heights == [[5.0], [10.0]]
+    assert np.all(np.bincount(regions) == 100)
+
+
+def test_small_overhang_under_a_larger_one_is_anchored():
+    # A 0.2 wide tab under the shelf, inside one grid cell of the shelf's
+    index = OverhangIndex(boxes(((20, 0, 0), (21, 1, 1)), ((0, 0, 5), (10, 10, 6)),
+                                ((4.4, 4.4, 2), (4.6, 4.6, 5))))
+    faces, labels = index.classify((0, 0, 1))
+    points, regions = index.anchors(np.eye(3), faces, labels, 1.0)
+    tab = points[np.isclose(points[:, 2], 2.0)]
+    assert len(tab) == 1 and np.allclose(tab[0, :2], 4.5, atol=0.5)
+    assert len(np.unique(regions)) == len(np.unique(labels))
+
+
+def test_encode_faces():
+    faces = np.array([0, 3, 9])
+    assert encode_faces(faces, 10) == [0, 3, 9]
+    assert encode_faces(faces, 10, "bitset") == "CQI="
@@ -0,0 +1,47 @@
+# test_raster.py
+import numpy as np
+import pytest
+import trimesh
+
+from raster import HeightMapScorer, depth_maps
+from supports import SupportRaycaster
+
+DIRECTIONS = [(0.0, 0.0, 1.0), (0.1, 0.0, 1.0), (1.0, 0.0, 0.2), (0.0, -1.0, 0.3)]
+
+
+@pytest.fixture(scope="module")
+def shelf():
+    # A 10 x 10 shelf 5 above the plate, which a small post touches
+    parts = [((20, 0, 0), (21, 1, 1)), ((0, 0, 5), (10, 10, 6))]
+    return trimesh.util.concatenate([trimesh.creation.box(bounds=b) for b in parts])
+
+
+def test_support_volume_matches_ray_cast(shelf):
+    scores = HeightMapScorer(shelf).score(DIRECTIONS)
+    expected = SupportRaycaster(shelf).score(DIRECTIONS)["support_volume"]
+    np.testing.assert_allclose(scores["support_volume"], expected, rtol=0.05)
+    assert HeightMapScorer(shelf).score([(0, 0, 1)], pitch=0.25)["support_volume"][0] == pytest.approx(500.0)
+
+
+def test_splatted_mesh_matches_scanned(shelf):
+    dense = shelf.subdivide().subdivide().subdivide()
+    scanned = HeightMapScorer(dense).score(DIRECTIONS)
+    splatted = HeightMapScorer(dense, max_faces=100).score(DIRECTIONS)
+    np.testing.assert_allclose(splatted["support_volume"], scanned["support_volume"], rtol=0.1)
+
+
+def test_coarse_to_fine_returns_full_pitch_rows(shelf):
+    scorer = HeightMapScorer(shelf)
+    result = scorer.score_coarse_to_fine(DIRECTIONS, top_k=2, coarse_resolution=16, resolution=64)
+    assert len(result) == 2 and np.all(result["pitch"] == scorer.size / 64)
+    assert np.all(np.diff(result["support_volume"]) >= 0)
+    fine = scorer.score(DIRECTIONS, resolution=64)
+    np.testing.assert_allclose(result["support_volume"], np.sort(fine["support_volume"])[:2])
+
+
+def test_depth_maps_keep_the_lowest_face():
+    triangles = np.array([[[0, 0, 2], [4, 0, 2], [0, 4, 2]], [[0, 0, 1], [4, 0, 1], [0, 4, 1]]], dtype=float)
+    z_min, z_max, face = depth_maps(triangles, 1.0, np.zeros(2), (4, 4))
+    covered = face >= 0
+    assert covered.sum() == 10
+    assert np.all(face[covered] == 1) and np.all(z_min[covered] == 1) and np.all(z_max[covered] == 2)
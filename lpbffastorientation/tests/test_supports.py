@@ -0,0 +1,51 @@
+# test_supports.py
+import numpy as np
+import pytest
+import trimesh
+
+from supports import SupportRaycaster, column_mesh, column_volume
+
+
+@pytest.fixture(scope="module")
+def shelves():
+    # Two 10 x 10 shelves stacked over the plate, which a small post touches
+    parts = [((20, 0, 0), (21, 1, 1)), ((0, 0, 5), (10, 10, 6)), ((0, 0, 10), (10, 10, 11))]
+    return SupportRaycaster(trimesh.util.concatenate([trimesh.creation.box(bounds=b) for b in parts]))
+
+
+def test_stacked_overhangs_each_get_columns(shelves):
+    columns = shelves.columns(np.eye(3), spacing=1.0)
+    lower = columns[columns["z_top"] < 7]
+    upper = columns[columns["z_top"] > 7]
+    assert len(lower) == len(upper) == 100
+    # The lower shelf stands on the plate, the upper one on the lower shelf
+    np.testing.assert_allclose(lower["z_bottom"], 0.0, atol=1e-4)
+    np.testing.assert_allclose(lower["z_top"], 5.0, atol=1e-4)
+    np.testing.assert_allclose(upper["z_bottom"], 6.0, atol=1e-4)
+    np.testing.assert_allclose(upper["z_top"], 10.0, atol=1e-4)
+    assert column_volume(columns) == pytest.approx(900.0, rel=1e-4)
+    assert column_volume(columns) == pytest.approx(shelves.score([(0, 0, 1)])["support_volume"][0], rel=1e-2)
+    vertices, faces = column_mesh(columns)
+    assert vertices.shape == (8 * len(columns), 3) and faces.shape == (12 * len(columns), 3)
+
+
+def test_columns_follow_the_rotation(shelves):
+    # Quarter turn about Z: same supports, moved in XY
+    rotation = np.array([[0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    columns = shelves.columns(rotation, spacing=1.0)
+    assert len(columns) == 200
+    assert column_volume(columns) == pytest.approx(900.0, rel=1e-4)
+    # points @ rotation maps (x, y) to (-y, x)
+    assert columns["x"].min() == pytest.approx(-9.5) and columns["y"].max() <= 10.0
+
+
+def test_upside_down(shelves):
+    # The upper shelf now lies on the plate and carries the lower one; the post overhangs alone
+    columns = shelves.columns(np.diag([1.0, -1.0, -1.0]), spacing=1.0)
+    shelf = columns[columns["x"] < 15]
+    post = columns[columns["x"] > 15]
+    assert len(shelf) == 100 and len(post)
+    np.testing.assert_allclose(shelf["z_bottom"], 1.0, atol=1e-4)
+    np.testing.assert_allclose(shelf["z_top"], 5.0, atol=1e-4)
+    np.testing.assert_allclose(post["z_bottom"], 0.0, atol=1e-4)
+    np.testing.assert_allclose(post["z_top"], 10.0, atol=1e-4)
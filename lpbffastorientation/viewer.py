@@ -0,0 +1,345 @@
+# viewer.py
+import ctypes
+
+import numpy as np
+import PyQt5.QtCore as qtc
+import PyQt5.QtGui as qtg
+import PyQt5.QtWidgets as qtw
+from OpenGL import GL
+
+from meshkernel import cluster_decimate
+from supports import BOX_CORNERS, BOX_FACES
+
+MESH_VERTEX = """
+#version 330 core
+layout(location = 0) in vec3 position;
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+out vec3 view_position;
+void main() {
+    vec4 eye = view * model * vec4(position, 1.0);
+    view_position = eye.xyz;
+    gl_Position = projection * eye;
+}
+"""
+
+# One unit box per support column, placed and scaled per instance
+BOX_VERTEX = """
+#version 330 core
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec4 column;
+layout(location = 2) in float radius;
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+out vec3 view_position;
+void main() {
+    vec3 p = vec3(column.xy + position.xy * radius, mix(column.z, column.w, position.z));
+    vec4 eye = view * model * vec4(p, 1.0);
+    view_position = eye.xyz;
+    gl_Position = projection * eye;
+}
+"""
+
+# Flat shading from screen-space derivatives, so no normals are uploaded
+FLAT_FRAGMENT = """
+#version 330 core
+in vec3 view_position;
+uniform vec3 color;
+out vec4 frag_color;
+void main() {
+    vec3 n = normalize(cross(dFdx(view_position), dFdy(view_position)));
+    frag_color = vec4(color * (0.3 + 0.7 * abs(n.z)), 1.0);
+}
+"""
+
+
+def perspective(fov, aspect, near, far):
+    f = 1.0 / np.tan(np.radians(fov) / 2)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+
+def look_at(eye, target, up):
+    forward = target - eye
+    forward /= np.linalg.norm(forward)
+    side = np.cross(forward, up)
+    side /= np.linalg.norm(side)
+    up = np.cross(side, forward)
+    matrix = np.eye(4)
+    matrix[0, :3], matrix[1, :3], matrix[2, :3] = side, up, -forward
+    matrix[:3, 3] = -matrix[:3, :3] @ eye
+    return matrix
+
+
+def lod_levels(vertices, faces, area, min_faces=100000, factor=4):
+    """Display levels of detail: the full mesh, then each about factor times coarser"""
+    levels = [(vertices, faces)]
+    while len(levels[-1][1]) > min_faces * factor:
+        target = len(levels[-1][1]) / factor
+        # About two faces per grid cell on the surface
+        cell = np.sqrt(2 * area / target)
+        decimated = cluster_decimate(vertices, faces, cell)
+        if len(decimated[1]) >= len(levels[-1][1]):
+            break
+        levels.append(decimated)
+    return levels
+
+
+def compile_program(vertex_source, fragment_source):
+    program = GL.glCreateProgram()
+    for kind, source in ((GL.GL_VERTEX_SHADER, vertex_source), (GL.GL_FRAGMENT_SHADER, fragment_source)):
+        shader = GL.glCreateShader(kind)
+        GL.glShaderSource(shader, source)
+        GL.glCompileShader(shader)
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            raise RuntimeError(GL.glGetShaderInfoLog(shader).decode())
+        GL.glAttachShader(program, shader)
+        GL.glDeleteShader(shader)
+    GL.glLinkProgram(program)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        raise RuntimeError(GL.glGetProgramInfoLog(program).decode())
+    return program
+
+
+class MeshViewer(qtw.QOpenGLWidget):
+    """OpenGL viewport: the mesh is uploaded once, orientation is a uniform.
+
+    set_orientation only changes the model matrix, so redrawing a rotated
+    part costs the same as redrawing the unrotated one. Support columns
+    (x, y, z_bottom, z_top, radius rows) are drawn as one instanced box.
+    Meshes above lod_faces triangles get cluster-decimated levels; the
+    coarsest level with at least interactive_faces is drawn while the
+    user drags or scrubs, the finest within budget once they stop.
+    Left drag orbits the camera, the wheel zooms.
+    """
+
+    def __init__(self, parent=None, lod_faces=1000000, interactive_faces=200000):
+        super().__init__(parent)
+        fmt = qtg.QSurfaceFormat()
+        fmt.setVersion(3, 3)
+        fmt.setProfile(qtg.QSurfaceFormat.CoreProfile)
+        fmt.setDepthBufferSize(24)
+        fmt.setSamples(4)
+        self.setFormat(fmt)
+
+        self.lod_faces = lod_faces
+        self.interactive_faces = interactive_faces
+        self.levels = []
+        self.extremes = np.zeros((1, 3))
+        self.center = np.zeros(3)
+        self.radius = 1.0
+        self.model = np.eye(4)
+        self.columns = np.zeros((0, 5), dtype=np.float32)
+        self.yaw, self.pitch, self.zoom = -60.0, 25.0, 1.0
+        self.interacting = False
+        self._last_mouse = None
+        self._mesh_dirty = False
+        self._columns_dirty = False
+        self._gpu_levels = []
+        self._mesh_buffers = []
+        self._settle = qtc.QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.timeout.connect(self._stop_interacting)
+
+    def coarse_levels(self, vertices, faces):
+        """Decimated display levels below the full mesh (empty up to lod_faces triangles)"""
+        if len(faces) <= self.lod_faces:
+            return []
+        vertices = np.asarray(vertices, dtype=np.float32)
+        tri = vertices[faces].astype(np.float64)
+        area = 0.5 * np.linalg.norm(np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]), axis=1).sum()
+        return lod_levels(vertices, faces, area, min_faces=self.interactive_faces)[1:]
+
+    def set_mesh(self, vertices, faces, extremes=None, coarse=None):
+        """Replace the mesh; uploaded to the GPU on the next paint.
+
+        coarse, if given, are precomputed coarse_levels (e.g. from a cache).
+        """
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        faces = np.ascontiguousarray(faces, dtype=np.uint32)
+        levels = [(vertices, faces)] + list(self.coarse_levels(vertices, faces) if coarse is None else coarse)
+        self.levels = [(np.ascontiguousarray(v, dtype=np.float32), np.ascontiguousarray(f, dtype=np.uint32))
+                       for v, f in levels]
+        self.extremes = np.asarray(extremes if extremes is not None else vertices, dtype=np.float64)
+        self.radius = max(np.linalg.norm(np.ptp(self.extremes, axis=0)) / 2, 1e-6)
+        self._mesh_dirty = True
+        self.set_orientation(np.eye(3), interactive=False)
+
+    def set_orientation(self, rotation, interactive=True):
+        """Place the part as points @ rotation (GUI convention) with its lowest point on the plate"""
+        rotated = self.extremes @ rotation
+        low, high = rotated.min(axis=0), rotated.max(axis=0)
+        self.model = np.eye(4)
+        self.model[:3, :3] = rotation.T
+        self.model[2, 3] = -low[2]
+        self.center = np.array([(low[0] + high[0]) / 2, (low[1] + high[1]) / 2, (high[2] - low[2]) / 2])
+        if interactive:
+            self._interact()
+        self.update()
+
+    def set_supports(self, columns):
+        """Support columns (supports.SUPPORT_DTYPE) in the rotated frame, one instance each"""
+        # SUPPORT_DTYPE is five packed float32s, i.e. exactly the instance layout
+        self.columns = np.ascontiguousarray(columns).view(np.float32).reshape(-1, 5)
+        self._columns_dirty = True
+        self.update()
+
+    def initializeGL(self):
+        self.mesh_program = compile_program(MESH_VERTEX, FLAT_FRAGMENT)
+        self.box_program = compile_program(BOX_VERTEX, FLAT_FRAGMENT)
+        GL.glEnable(GL.GL_DEPTH_TEST)
+        GL.glClearColor(0.95, 0.95, 0.97, 1.0)
+
+        # Unit box shared by the support instances and the plate (one instance)
+        self.box_vbo, self.box_ebo, self.column_vbo, self.plate_vbo = GL.glGenBuffers(4)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.box_vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, BOX_CORNERS.nbytes, BOX_CORNERS, GL.GL_STATIC_DRAW)
+        self.box_vao = self._box_vao(self.column_vbo)
+        self.plate_vao = self._box_vao(self.plate_vbo)
+        self._columns_dirty = True
+
+    def paintGL(self):
+        if self._mesh_dirty:
+            self._upload_mesh()
+        if self._columns_dirty:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.column_vbo)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, max(self.columns.nbytes, 4), self.columns, GL.GL_DYNAMIC_DRAW)
+            self._columns_dirty = False
+
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+        if not self._gpu_levels:
+            return
+        view, projection = self.camera()
+
+        GL.glUseProgram(self.mesh_program)
+        self._set_matrices(self.mesh_program, self.model, view, projection)
+        GL.glUniform3f(GL.glGetUniformLocation(self.mesh_program, "color"), 0.55, 0.75, 0.95)
+        vao, count = self._gpu_levels[self._level()]
+        GL.glBindVertexArray(vao)
+        GL.glDrawElements(GL.GL_TRIANGLES, count, GL.GL_UNSIGNED_INT, None)
+
+        # Supports are in the rotated frame: same lift onto the plate, no rotation
+        shift = self.model.copy()
+        shift[:3, :3] = np.eye(3)
+        GL.glUseProgram(self.box_program)
+        color = GL.glGetUniformLocation(self.box_program, "color")
+        if len(self.columns):
+            self._set_matrices(self.box_program, shift, view, projection)
+            GL.glUniform3f(color, 0.85, 0.2, 0.2)
+            GL.glBindVertexArray(self.box_vao)
+            GL.glDrawElementsInstanced(GL.GL_TRIANGLES, BOX_FACES.size, GL.GL_UNSIGNED_INT, None,
+                                       len(self.columns))
+
+        # Plate: a thin box just below z=0 under the part
+        half = 1.5 * self.radius
+        plate = np.array([[self.center[0], self.center[1], -0.01 * half, 0.0, half]], dtype=np.float32)
+        self._set_matrices(self.box_program, np.eye(4), view, projection)
+        GL.glUniform3f(color, 0.6, 0.6, 0.6)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.plate_vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, plate.nbytes, plate, GL.GL_DYNAMIC_DRAW)
+        GL.glBindVertexArray(self.plate_vao)
+        GL.glDrawElementsInstanced(GL.GL_TRIANGLES, BOX_FACES.size, GL.GL_UNSIGNED_INT, None, 1)
+        GL.glBindVertexArray(0)
+
+    def camera(self):
+        aspect = max(self.width(), 1) / max(self.height(), 1)
+        distance = 3.0 * self.radius / self.zoom
+        yaw, pitch = np.radians(self.yaw), np.radians(self.pitch)
+        target = self.center
+        eye = target + distance * np.array([np.cos(pitch) * np.cos(yaw), np.cos(pitch) * np.sin(yaw),
+                                            np.sin(pitch)])
+        return (look_at(eye, target, np.array([0.0, 0.0, 1.0])),
+                perspective(35.0, aspect, distance / 100, distance + 4 * self.radius))
+
+    def mousePressEvent(self, event):
+        self._last_mouse = event.pos()
+        self.interacting = True
+
+    def mouseMoveEvent(self, event):
+        if self._last_mouse is None:
+            return
+        delta = event.pos() - self._last_mouse
+        self._last_mouse = event.pos()
+        self.yaw -= delta.x() * 0.4
+        self.pitch = float(np.clip(self.pitch + delta.y() * 0.4, -89.0, 89.0))
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._last_mouse = None
+        self._stop_interacting()
+
+    def wheelEvent(self, event):
+        self.zoom *= 1.1 ** (event.angleDelta().y() / 120)
+        self._interact()
+        self.update()
+
+    def _interact(self):
+        self.interacting = True
+        self._settle.start(250)
+
+    def _stop_interacting(self):
+        if self.interacting and self._last_mouse is None:
+            self.interacting = False
+            self.update()
+
+    def _level(self):
+        """Finest level while idle, coarsest adequate level while interacting"""
+        if not self.interacting:
+            return 0
+        for i in range(len(self.levels) - 1, -1, -1):
+            if len(self.levels[i][1]) >= self.interactive_faces:
+                return i
+        return 0
+
+    def _box_vao(self, instance_vbo):
+        vao = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.box_vbo)
+        GL.glVertexAttribPointer(0, 3, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+        GL.glEnableVertexAttribArray(0)
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.box_ebo)
+        GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, BOX_FACES.nbytes, BOX_FACES, GL.GL_STATIC_DRAW)
+        # Per instance: (x, y, z_bottom, z_top) then radius
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, instance_vbo)
+        stride = 5 * 4
+        GL.glVertexAttribPointer(1, 4, GL.GL_FLOAT, GL.GL_FALSE, stride, None)
+        GL.glVertexAttribDivisor(1, 1)
+        GL.glEnableVertexAttribArray(1)
+        GL.glVertexAttribPointer(2, 1, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(16))
+        GL.glVertexAttribDivisor(2, 1)
+        GL.glEnableVertexAttribArray(2)
+        GL.glBindVertexArray(0)
+        return vao
+
+    def _upload_mesh(self):
+        for vao, _ in self._gpu_levels:
+            GL.glDeleteVertexArrays(1, [vao])
+        if self._mesh_buffers:
+            GL.glDeleteBuffers(len(self._mesh_buffers), self._mesh_buffers)
+        self._gpu_levels = []
+        self._mesh_buffers = []
+        for vertices, faces in self.levels:
+            vao = GL.glGenVertexArrays(1)
+            GL.glBindVertexArray(vao)
+            vbo, ebo = GL.glGenBuffers(2)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL.GL_STATIC_DRAW)
+            GL.glVertexAttribPointer(0, 3, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+            GL.glEnableVertexAttribArray(0)
+            GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, ebo)
+            GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, faces.nbytes, faces, GL.GL_STATIC_DRAW)
+            GL.glBindVertexArray(0)
+            self._gpu_levels.append((vao, faces.size))
+            self._mesh_buffers += [vbo, ebo]
+        self._mesh_dirty = False
+
+    def _set_matrices(self, program, model, view, projection):
+        for name, matrix in (("model", model), ("view", view), ("projection", projection)):
+            GL.glUniformMatrix4fv(GL.glGetUniformLocation(program, name), 1, GL.GL_TRUE,
+                                  np.ascontiguousarray(matrix, dtype=np.float32))